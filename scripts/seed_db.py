@@ -13,7 +13,9 @@ from time import time
 from sqlmodel import Session
 
 from src.db import create_db, engine
-from src.scrapers.jobs import buscacursos, catalogo, initialize_log
+from src.scrapers import request
+from src.scrapers.jobs import buscacursos, catalogo, initialize_log, quota
+from src.scrapers.jobs.report import report
 
 # Start script
 initialize_log()
@@ -22,13 +24,53 @@ create_db(clean=False)  # clean resetea la BD
 # Remove production flag
 sys.argv.remove("-p")
 
+# Recorrer todos los prefijos, en vez de planificarlos desde la BD
+discovery = "--discovery" in sys.argv
+if discovery:
+    sys.argv.remove("--discovery")
+
+
+def run(job):
+    "Corre el job registrando su progreso, y guarda su reporte (ver src/scrapers/jobs/report.py)"
+
+    async def tracked():
+        async with report.track(engine, sys.argv[1], args=sys.argv[2:], discovery=discovery):
+            await job
+
+    asyncio.run(tracked())
+
+
 with Session(engine) as session:
     init_time = time()
 
     if sys.argv[1] in ("buscacursos", "bc"):
-        asyncio.run(buscacursos.get_full_buscacursos(session, int(sys.argv[2]), int(sys.argv[3])))
+        concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else buscacursos.BC_CONCURRENCY
+        run(
+            buscacursos.get_full_buscacursos(
+                session,
+                int(sys.argv[2]),
+                int(sys.argv[3]),
+                concurrency=concurrency,
+                discovery=discovery,
+            )
+        )
+
+    elif sys.argv[1] in ("quota", "vacantes"):
+        # Uso: seed_db.py quota <año> <semestre> [intervalo en segundos] [concurrencia]
+        # Sin intervalo se actualiza una sola vez
+        year, semester = int(sys.argv[2]), int(sys.argv[3])
+        concurrency = int(sys.argv[5]) if len(sys.argv) > 5 else buscacursos.BC_CONCURRENCY
+        if len(sys.argv) > 4:
+            run(
+                quota.refresh_quotas_loop(
+                    session, year, semester, float(sys.argv[4]), concurrency=concurrency
+                )
+            )
+        else:
+            run(quota.refresh_quotas(session, year, semester, concurrency=concurrency))
 
     elif sys.argv[1] == "catalogo":
-        asyncio.run(catalogo.get_full_catalogo(session))
+        run(catalogo.get_full_catalogo(session, discovery=discovery))
 
+    request.report_stats()
     print(f"Time elapsed: {(time() - init_time) / 60:1f} minutes")
@@ -0,0 +1,207 @@
+"""
+Cache de respuestas de la API
+-----------------------------
+
+Los datos sólo cambian cuando corre un scraper, y cada job incrementa la versión
+de los datos (`DataVersion`) al terminar. Las respuestas exitosas de las rutas GET
+se guardan por versión, ruta y parámetros, por lo que una nueva versión invalida
+todas las anteriores sin tener que borrarlas (el LRU las descarta).
+
+Cada respuesta lleva un `ETag` (hash del cuerpo) y `Cache-Control`, para que los
+clientes y nginx puedan revalidar con `If-None-Match` y recibir un 304.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+from fastapi import Request, Response
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..config import config
+from ..db import engine, get_data_version
+from .profiling import PROFILE_HEADER
+
+UNCACHED_PATHS = ("/graphql", "/metrics")
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    content_type: Optional[str]
+    etag: str
+
+
+class MemoryCache:
+    "LRU en memoria, propio de cada proceso"
+
+    blocking = False
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SQLiteCache:
+    "LRU en un archivo SQLite, compartido por todos los workers de un servidor"
+
+    blocking = True
+
+    def __init__(self, path: Path, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS response ("
+                "key TEXT PRIMARY KEY, body BLOB, content_type TEXT, etag TEXT, used_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS response_used_at ON response (used_at)")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT body, content_type, etag FROM response WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE response SET used_at = ? WHERE key = ?", (time.time(), key))
+        return CachedResponse(*row)
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?)",
+                (key, entry.body, entry.content_type, entry.etag, time.time()),
+            )
+            connection.execute(
+                "DELETE FROM response WHERE key IN "
+                "(SELECT key FROM response ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+def create_backend() -> Union[MemoryCache, SQLiteCache]:
+    if config.api_cache_backend == "sqlite":
+        return SQLiteCache(config.api_cache_path, config.api_cache_max_entries)
+    return MemoryCache(config.api_cache_max_entries)
+
+
+class DataVersionTracker:
+    "Versión de los datos, consultada a lo más una vez cada `ttl` segundos"
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.version = 0
+        self.checked_at: Optional[float] = None
+
+    def _query(self) -> int:
+        with Session(engine) as session:
+            return get_data_version(session)
+
+    def _is_stale(self) -> bool:
+        return self.checked_at is None or time.monotonic() - self.checked_at > self.ttl
+
+    async def get(self) -> int:
+        if self._is_stale():
+            self.version = await run_in_threadpool(self._query)
+            self.checked_at = time.monotonic()
+        return self.version
+
+    def get_with(self, session: Session) -> int:
+        "Como `get`, pero consultando con una sesión ya abierta (desde el threadpool)"
+        if self._is_stale():
+            self.version = get_data_version(session)
+            self.checked_at = time.monotonic()
+        return self.version
+
+
+backend = create_backend()
+data_version = DataVersionTracker(config.api_cache_version_ttl)
+
+
+def cache_key(version: int, request: Request) -> str:
+    params = sorted(request.query_params.multi_items())
+    raw_key = json.dumps([version, request.url.path, params])
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def _call_backend(method, *args):
+    if backend.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+async def cache_responses(request: Request, call_next) -> Response:
+    "Middleware de cache de las respuestas GET"
+    if (
+        not config.api_cache_enabled
+        or request.method != "GET"
+        # Sin `root_path`, que `request.url.path` sí incluye
+        or request.scope["path"].startswith(UNCACHED_PATHS)
+        or (config.api_profiling_enabled and PROFILE_HEADER in request.headers)
+    ):
+        return await call_next(request)
+
+    key = cache_key(await data_version.get(), request)
+    entry: Optional[CachedResponse] = await _call_backend(backend.get, key)
+    cache_status = "HIT"
+
+    if entry is None:
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])  # type: ignore
+        entry = CachedResponse(
+            body=body,
+            content_type=response.headers.get("content-type"),
+            etag=f'"{hashlib.sha1(body).hexdigest()}"',
+        )
+        await _call_backend(backend.set, key, entry)
+        cache_status = "MISS"
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age={config.api_cache_max_age}",
+        "X-Cache": cache_status,
+    }
+    if etag_matches(entry.etag, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if entry.content_type is not None:
+        headers["Content-Type"] = entry.content_type
+    return Response(entry.body, headers=headers)
@@ -0,0 +1,226 @@
+"""
+Prueba de carga de la API
+-------------------------
+
+Manda peticiones a `/courses/`, `/subjects/{code}/` y `/graphql` con distintos niveles
+de concurrencia y reporta la latencia (p50, p95 y p99) y las peticiones por segundo de
+cada endpoint:
+
+    python -m src.db.synthetic --clean          # datos con la forma de los reales
+    uvicorn src.api.main:app --workers 4
+    python -m src.api.loadtest http://127.0.0.1:8000/api --concurrency 1 8 32
+
+Las siglas, semestres y textos de búsqueda se toman de la misma API al comenzar. Con
+el cache de la API activado, la columna `cached` muestra la fracción de respuestas
+que vinieron del cache (cabecera `X-Cache`).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import aiohttp
+
+GRAPHQL_QUERY = "{ allSubjects { id name } }"
+SEARCH_WORDS = ["calculo", "programacion", "historia", "taller", "diseño", "gonzalez", "datos"]
+
+
+@dataclass
+class Sample:
+    "Valores reales con los que se arman las peticiones"
+
+    subject_codes: list[str]
+    term_ids: list[int]
+    words: list[str] = field(default_factory=lambda: list(SEARCH_WORDS))
+
+
+# Una petición: método, ruta, parámetros y cuerpo JSON
+Request = tuple[str, str, Optional[dict], Optional[dict]]
+
+
+def courses_request(rng: random.Random, sample: Sample) -> Request:
+    "Búsquedas como las de la página: por sigla parcial o por texto, con o sin semestre"
+    params: dict = {"size": 25}
+    if rng.random() < 0.5:
+        params["q"] = rng.choice(sample.subject_codes)[: rng.randint(3, 7)]
+    else:
+        params["q"] = rng.choice(sample.words)
+    if sample.term_ids and rng.random() < 0.8:
+        params["term_id"] = rng.choice(sample.term_ids)
+    return "GET", "/courses/", params, None
+
+
+def subject_request(rng: random.Random, sample: Sample) -> Request:
+    return "GET", f"/subjects/{rng.choice(sample.subject_codes)}/", None, None
+
+
+def graphql_request(rng: random.Random, sample: Sample) -> Request:
+    return "POST", "/graphql", None, {"query": GRAPHQL_QUERY}
+
+
+ENDPOINTS: dict[str, Callable[[random.Random, Sample], Request]] = {
+    "/courses/": courses_request,
+    "/subjects/{code}/": subject_request,
+    "/graphql": graphql_request,
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    "Percentil `p` (0 a 100) por el método del rango más cercano"
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = math.ceil(p / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+@dataclass
+class EndpointResult:
+    endpoint: str
+    concurrency: int
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    cached: int = 0
+    elapsed: float = 0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0
+
+    def as_dict(self) -> dict:
+        return {
+            "endpoint": self.endpoint,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "cached": self.cached,
+            "rps": round(self.throughput, 1),
+            **{f"p{p}_ms": round(percentile(self.latencies, p) * 1000, 2) for p in (50, 95, 99)},
+        }
+
+
+async def fetch_sample(session: aiohttp.ClientSession, base_url: str) -> Sample:
+    async with session.get(f"{base_url}/subjects/", params={"size": 100}) as response:
+        response.raise_for_status()
+        subjects = (await response.json())["items"]
+    async with session.get(f"{base_url}/terms/") as response:
+        response.raise_for_status()
+        terms = await response.json()
+    if not subjects:
+        raise RuntimeError("The API has no subjects, fill the DB with src.db.synthetic")
+    return Sample([s["code"] for s in subjects], [t["id"] for t in terms])
+
+
+async def run_endpoint(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    endpoint: str,
+    sample: Sample,
+    concurrency: int,
+    requests: int,
+    seed: int = 0,
+) -> EndpointResult:
+    "Manda `requests` peticiones a un endpoint, con `concurrency` clientes a la vez"
+    make_request = ENDPOINTS[endpoint]
+    rng = random.Random(seed)
+    pending = [make_request(rng, sample) for _ in range(requests)]
+    result = EndpointResult(endpoint, concurrency)
+
+    async def client():
+        while pending:
+            method, path, params, body = pending.pop()
+            start = time.perf_counter()
+            try:
+                async with session.request(
+                    method, base_url + path, params=params, json=body
+                ) as response:
+                    await response.read()
+                    ok = response.status < 400
+                    cached = response.headers.get("X-Cache") == "HIT"
+            except aiohttp.ClientError:
+                ok = cached = False
+            if ok:
+                result.latencies.append(time.perf_counter() - start)
+                result.cached += cached
+            else:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def run(
+    base_url: str,
+    endpoints: list[str],
+    concurrency_levels: list[int],
+    requests: int,
+    warmup: int = 10,
+) -> list[EndpointResult]:
+    base_url = base_url.rstrip("/")
+    connector = aiohttp.TCPConnector(limit=max(concurrency_levels))
+    async with aiohttp.ClientSession(connector=connector) as session:
+        sample = await fetch_sample(session, base_url)
+        results = []
+        for endpoint in endpoints:
+            await run_endpoint(session, base_url, endpoint, sample, 1, warmup, seed=-1)
+            for concurrency in concurrency_levels:
+                results.append(
+                    await run_endpoint(session, base_url, endpoint, sample, concurrency, requests)
+                )
+    return results
+
+
+def report(results: list[EndpointResult]) -> None:
+    print(
+        f"{'endpoint':20} {'conc':>5} {'reqs':>6} {'errors':>6} {'cached':>7} "
+        f"{'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for result in results:
+        row = result.as_dict()
+        cached = result.cached / result.requests if result.requests else 0
+        print(
+            f"{row['endpoint']:20} {row['concurrency']:>5} {row['requests']:>6} "
+            f"{row['errors']:>6} {cached:>7.0%} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} "
+            f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+        )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API")
+    parser.add_argument("url", help="URL base de la API, p. ej. http://127.0.0.1:8000/api")
+    parser.add_argument("--endpoint", action="append", choices=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="por endpoint y nivel")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--json", type=argparse.FileType("w"), help="guarda los resultados")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(
+        run(
+            args.url,
+            args.endpoint or list(ENDPOINTS),
+            args.concurrency,
+            args.requests,
+            args.warmup,
+        )
+    )
+    report(results)
+    if args.json:
+        json.dump([result.as_dict() for result in results], args.json, indent=2)
+    return 1 if any(result.errors for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,11 @@
 from fastapi import FastAPI
 
 from ..config import config
-from ..db import create_db
+from ..db import async_engine, create_db, engine
+from .cache import cache_responses
 from .graphql import graphql_app
+from .metrics import collect_metrics, instrument_engine, metrics_router
+from .profiling import profile_requests, profiling_router
 from .routes.campus import campus_router
 from .routes.courses import course_router
 from .routes.events import event_router
@@ -13,6 +16,19 @@ from .routes.teachers import teacher_router
 from .routes.terms import terms_router
 
 app = FastAPI(root_path=str(config.api_base_path))
+app.middleware("http")(cache_responses)
+
+if config.api_profiling_enabled:
+    # Fuera del cache y dentro de las métricas, para incluir sus números de SQL
+    app.middleware("http")(profile_requests)
+    app.include_router(profiling_router)
+
+if config.api_metrics_enabled:
+    # Después del cache, para medir también las respuestas del cache
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+    app.middleware("http")(collect_metrics)
+    app.include_router(metrics_router)
 
 app.include_router(graphql_app, prefix="/graphql", tags=["GraphQL"])
 
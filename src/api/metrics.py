@@ -0,0 +1,220 @@
+"""
+Métricas de la API
+------------------
+
+`/metrics` expone, en el formato de texto de Prometheus, histogramas de:
+
+- la duración de cada petición, por ruta, método y estado;
+- la cantidad de sentencias SQL y el tiempo en SQL de cada petición, por ruta;
+- la espera por una conexión del pool, por engine.
+
+Las sentencias se cuentan con los eventos de SQLAlchemy de los engines instrumentados
+(`instrument_engine`), y se asignan a la petición en curso con una `ContextVar`, que
+se copia al threadpool de las rutas `def` y a los greenlets de las sesiones asíncronas.
+Los mismos números de cada petición van en la cabecera `Server-Timing`, por lo que se
+ven en las herramientas de desarrollo del navegador.
+
+Las rutas se identifican por su plantilla (`/subjects/{subject_code}/`), y no por la
+URL, para no crear una serie por sigla. Las métricas son de cada proceso: con varios
+workers de uvicorn, Prometheus debe leer cada uno o sumarlas.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+from fastapi import APIRouter, Request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+POOL_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Histogram:
+    "Histograma con una serie por combinación de etiquetas"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Por serie: cantidad en cada bucket (el último es +Inf) y la suma
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {
+                labels: (list(counts), total[0]) for labels, (counts, total) in self._series.items()
+            }
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                bucket_labels = _format_labels([*self.labels, "le"], [*labels, str(bound)])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "api_request_duration_seconds",
+    "Duración de las peticiones",
+    ["method", "route", "status"],
+    LATENCY_BUCKETS,
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "api_request_sql_statements",
+    "Sentencias SQL por petición",
+    ["route"],
+    STATEMENT_BUCKETS,
+)
+REQUEST_SQL_DURATION = Histogram(
+    "api_request_sql_seconds",
+    "Tiempo en SQL por petición",
+    ["route"],
+    LATENCY_BUCKETS,
+)
+POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_seconds",
+    "Espera por una conexión del pool (incluye abrir conexiones nuevas)",
+    ["engine"],
+    POOL_BUCKETS,
+)
+HISTOGRAMS = (
+    REQUEST_DURATION,
+    REQUEST_SQL_STATEMENTS,
+    REQUEST_SQL_DURATION,
+    POOL_CHECKOUT_DURATION,
+)
+
+
+@dataclass
+class RequestTimings:
+    statements: int = 0
+    sql_seconds: float = 0
+    pool_seconds: float = 0
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.statements} queries", '
+            f"pool;dur={self.pool_seconds * 1000:.1f}, "
+            f"app;dur={total_seconds * 1000:.1f}"
+        )
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    "Números de la petición en curso, o `None` si las métricas están desactivadas"
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current.get() is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    started = getattr(context, "_metrics_started", None)
+    if timings is not None and started is not None:
+        timings.statements += 1
+        timings.sql_seconds += time.perf_counter() - started
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    "Cuenta las sentencias de `engine` y mide la espera por sus conexiones"
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    # SQLAlchemy no tiene un evento antes de pedir una conexión al pool
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            elapsed = time.perf_counter() - started
+            POOL_CHECKOUT_DURATION.observe(elapsed, name)
+            timings = _current.get()
+            if timings is not None:
+                timings.pool_seconds += elapsed
+
+    pool.connect = timed_connect  # type: ignore
+
+
+def route_template(request: Request) -> str:
+    "Plantilla de la ruta de la petición, también si la respondió el cache"
+    partial = None
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+
+async def collect_metrics(request: Request, call_next) -> Response:
+    "Middleware que mide cada petición y agrega la cabecera `Server-Timing`"
+    timings = RequestTimings()
+    token = _current.set(timings)
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+    finally:
+        _current.reset(token)
+        elapsed = time.perf_counter() - started
+        route = route_template(request)
+        REQUEST_DURATION.observe(elapsed, request.method, route, status)
+        REQUEST_SQL_STATEMENTS.observe(timings.statements, route)
+        REQUEST_SQL_DURATION.observe(timings.sql_seconds, route)
+
+    response.headers["Server-Timing"] = timings.server_timing(elapsed)
+    return response
+
+
+def render() -> str:
+    return "\n".join(line for histogram in HISTOGRAMS for line in histogram.render()) + "\n"
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(render(), media_type=CONTENT_TYPE)
@@ -1,8 +1,21 @@
 from typing import List, Optional
 
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import SQLModel
 
-from ..db import Campus, ClassSchedule, Teacher
+from ..db import (
+    Campus,
+    ClassSchedule,
+    Course,
+    Subject,
+    SubjectEquivalencies,
+    SubjectPrerequisites,
+    Teacher,
+)
+
+# Cada modelo con relaciones define `load_options`, las estrategias de carga de las
+# relaciones que serializa. Así una página se obtiene con un número fijo de consultas
+# en vez de cargar cada relación de forma perezosa (N+1).
 
 
 class TermMinimal(SQLModel):
@@ -42,6 +55,13 @@ class SubjectResponse(SQLModel):
     prerequisites: List[PrerequisteResponse]
     need_all_requirements: bool
 
+    @staticmethod
+    def load_options():
+        return [
+            joinedload(Subject.school),
+            selectinload(Subject.prerequisites).joinedload(SubjectPrerequisites.prerequisite),
+        ]
+
 
 class SubjectFullResponse(SubjectResponse):
     is_active: Optional[bool]
@@ -50,6 +70,23 @@ class SubjectFullResponse(SubjectResponse):
     equivalencies: List[EquivalencyResponse]
     unlocks: List[SubjectMinimal]
 
+    @staticmethod
+    def load_options():
+        return SubjectResponse.load_options() + [
+            selectinload(Subject.equivalencies).joinedload(SubjectEquivalencies.equivalence),
+            selectinload(Subject.unlocks),
+        ]
+
+
+class GraphPrerequisite(SQLModel):
+    group: int
+    is_corequisite: bool
+    code: str
+
+
+class PrerequisiteNodeResponse(SubjectMinimal):
+    prerequisites: List[GraphPrerequisite]
+
 
 class CourseResponse(SQLModel):
     id: int
@@ -63,6 +100,15 @@ class CourseResponse(SQLModel):
     total_quota: Optional[int]
     teachers: List[Teacher]
 
+    @staticmethod
+    def load_options():
+        return [
+            joinedload(Course.subject),
+            joinedload(Course.term),
+            joinedload(Course.campus),
+            selectinload(Course.teachers),
+        ]
+
 
 class CourseFullResponse(SQLModel):
     id: int
@@ -82,3 +128,13 @@ class CourseFullResponse(SQLModel):
     available_quota: Optional[int]
     total_quota: Optional[int]
     teachers: List[Teacher]
+
+    @staticmethod
+    def load_options():
+        return [
+            joinedload(Course.subject).options(*SubjectResponse.load_options()),
+            joinedload(Course.term),
+            joinedload(Course.campus),
+            selectinload(Course.schedule),
+            selectinload(Course.teachers),
+        ]
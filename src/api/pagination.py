@@ -0,0 +1,123 @@
+"""
+Paginación de las rutas de listas
+---------------------------------
+
+Extiende la paginación de `fastapi_pagination` con un modo por cursor (keyset),
+que se activa al enviar el parámetro `cursor`. En ese modo los elementos se
+ordenan por id y cada página filtra por `id > último id`, por lo que una página
+profunda cuesta lo mismo que la primera. Con `count_total=false` además se evita
+el `COUNT(*)` de cada consulta.
+"""
+
+import base64
+import binascii
+import json
+from typing import Generic, Optional, Sequence, TypeVar, Union
+
+from fastapi import HTTPException, Query
+from fastapi_pagination import Params as OffsetParams
+from fastapi_pagination.api import create_page, resolve_params
+from fastapi_pagination.bases import AbstractParams, BasePage
+from pydantic import conint
+from sqlmodel import Session, SQLModel, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import Select, SelectOfScalar
+
+T = TypeVar("T")
+M = TypeVar("M", bound=SQLModel)
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    "Retorna el último id visto, o `None` si el cursor está vacío (primera página)"
+    if not cursor:
+        return None
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+class Params(OffsetParams):
+    cursor: Optional[str] = Query(
+        None,
+        description="Paginate by cursor, using `next_cursor` of the previous page "
+        "(empty for the first page). Items are ordered by id and `page` is ignored",
+    )
+    count_total: bool = Query(True, description="Count the total of items")
+
+
+class Page(BasePage[T], Generic[T]):
+    total: Optional[conint(ge=0)]  # type: ignore
+    page: Optional[conint(ge=1)]  # type: ignore
+    size: conint(ge=1)  # type: ignore
+    next_cursor: Optional[str]
+
+    __params_type__ = Params
+
+    @classmethod
+    def create(cls, items: Sequence[T], total: Optional[int], params: AbstractParams) -> "Page[T]":
+        if not isinstance(params, Params):
+            raise ValueError("Page should be used with Params")
+
+        next_cursor = None
+        if items and len(items) == params.size:
+            next_cursor = encode_cursor(items[-1].id)  # type: ignore
+
+        return cls(
+            total=total,
+            items=items,
+            page=params.page if params.cursor is None else None,
+            size=params.size,
+            next_cursor=next_cursor,
+        )
+
+
+def _paginate_queries(query: Union[Select[M], SelectOfScalar[M]], params: Params):
+    "Consultas del total (si se pide) y de los elementos de la página"
+    entity = query.column_descriptions[0]["entity"]
+
+    total_query = None
+    if params.count_total:
+        total_query = select(func.count("*")).select_from(query.subquery())
+
+    if params.cursor is None:
+        query = query.order_by(entity.id).offset(params.size * (params.page - 1))
+    else:
+        last_id = decode_cursor(params.cursor)
+        query = query.order_by(None).order_by(entity.id)
+        if last_id is not None:
+            query = query.where(entity.id > last_id)
+
+    return total_query, query.limit(params.size)
+
+
+def paginate(
+    session: Session,
+    query: Union[Select[M], SelectOfScalar[M]],
+    params: Optional[Params] = None,
+) -> Page[M]:
+    "Pagina la consulta en SQL, por página o por cursor según los parámetros"
+    params = resolve_params(params)  # type: ignore
+    total_query, items_query = _paginate_queries(query, params)  # type: ignore
+
+    total = session.scalar(total_query) if total_query is not None else None
+    items = session.exec(items_query).unique().all()
+    return create_page(items, total, params)  # type: ignore
+
+
+async def paginate_async(
+    session: AsyncSession,
+    query: Union[Select[M], SelectOfScalar[M]],
+    params: Optional[Params] = None,
+) -> Page[M]:
+    "Como `paginate`, pero con una sesión asíncrona"
+    params = resolve_params(params)  # type: ignore
+    total_query, items_query = _paginate_queries(query, params)  # type: ignore
+
+    total = await session.scalar(total_query) if total_query is not None else None
+    items = (await session.exec(items_query)).unique().all()
+    return create_page(items, total, params)  # type: ignore
@@ -0,0 +1,171 @@
+"""
+Grafo de prerrequisitos
+-----------------------
+
+Se carga una vez desde la BD (y de nuevo cuando cambia la versión de los datos).
+Cada ramo recibe un id entero compacto, y cada grupo de prerrequisitos (DNF: basta
+cumplir todos los de algún grupo) se guarda como un bitset, usando los enteros de
+Python. Así las consultas recorren bitsets en memoria en vez de hacer una consulta
+por nivel del árbol.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from sqlmodel import Session, select
+
+from ..db import Subject, SubjectPrerequisites
+from .cache import data_version
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    "Índices de los bits encendidos de `mask`, de menor a mayor"
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+@dataclass
+class RequirementGroup:
+    group: int
+    required: int  # Deben estar aprobados
+    corequisites: int  # Pueden tomarse en el mismo semestre
+
+    @property
+    def mask(self) -> int:
+        return self.required | self.corequisites
+
+
+class PrerequisiteGraph:
+    def __init__(
+        self,
+        subjects: Iterable[tuple[str, str]],
+        prerequisites: Iterable[tuple[str, str, int, bool]],
+    ) -> None:
+        """`subjects` son pares (sigla, nombre) y `prerequisites` tuplas
+        (sigla, sigla del prerrequisito, grupo, es correquisito)"""
+        self.codes: list[str] = []
+        self.names: list[str] = []
+        self.index: dict[str, int] = {}
+        for code, name in subjects:
+            self.index[code] = len(self.codes)
+            self.codes.append(code)
+            self.names.append(name)
+
+        groups: dict[tuple[int, int], RequirementGroup] = {}
+        for code, prerequisite_code, group, is_corequisite in prerequisites:
+            subject, prerequisite = self.index[code], self.index[prerequisite_code]
+            requirement = groups.setdefault((subject, group), RequirementGroup(group, 0, 0))
+            if is_corequisite:
+                requirement.corequisites |= 1 << prerequisite
+            else:
+                requirement.required |= 1 << prerequisite
+
+        self.groups: list[list[RequirementGroup]] = [[] for _ in self.codes]
+        self.prerequisites = [0] * len(self.codes)  # Prerrequisitos directos
+        self.unlocks = [0] * len(self.codes)  # Ramos que lo tienen de prerrequisito directo
+        for (subject, _), requirement in sorted(groups.items()):
+            self.groups[subject].append(requirement)
+            self.prerequisites[subject] |= requirement.mask
+            for prerequisite in iter_bits(requirement.mask):
+                self.unlocks[prerequisite] |= 1 << subject
+
+        self.without_prerequisites = 0
+        for subject, subject_groups in enumerate(self.groups):
+            if not subject_groups:
+                self.without_prerequisites |= 1 << subject
+
+        self._ancestors: dict[int, int] = {}
+        self._descendants: dict[int, int] = {}
+
+    @classmethod
+    def load(cls, session: Session) -> "PrerequisiteGraph":
+        subjects = session.exec(select(Subject.code, Subject.name))
+        prerequisite = Subject.__table__.alias("prerequisite")
+        prerequisites = session.exec(
+            select(
+                Subject.code,
+                prerequisite.c.code,
+                SubjectPrerequisites.group,
+                SubjectPrerequisites.is_corequisite,
+            )
+            .join(SubjectPrerequisites, SubjectPrerequisites.subject_id == Subject.id)
+            .join(prerequisite, SubjectPrerequisites.prerequisite_id == prerequisite.c.id)
+        )
+        return cls(subjects, prerequisites)
+
+    def mask_of(self, codes: Iterable[str]) -> int:
+        "Bitset de las siglas, que deben existir en el grafo"
+        mask = 0
+        for code in codes:
+            mask |= 1 << self.index[code]
+        return mask
+
+    @staticmethod
+    def _closure(start: int, edges: list[int]) -> int:
+        "Nodos alcanzables desde `start` siguiendo `edges`, sin incluirlo (salvo en ciclos)"
+        reached = 0
+        frontier = edges[start]
+        while frontier:
+            reached |= frontier
+            following = 0
+            for node in iter_bits(frontier):
+                following |= edges[node]
+            frontier = following & ~reached
+        return reached
+
+    def ancestors(self, code: str) -> int:
+        "Bitset de todos los prerrequisitos, directos e indirectos, de un ramo"
+        subject = self.index[code]
+        if subject not in self._ancestors:
+            self._ancestors[subject] = self._closure(subject, self.prerequisites)
+        return self._ancestors[subject]
+
+    def descendants(self, code: str) -> int:
+        "Bitset de todos los ramos que dependen, directa o indirectamente, de un ramo"
+        subject = self.index[code]
+        if subject not in self._descendants:
+            self._descendants[subject] = self._closure(subject, self.unlocks)
+        return self._descendants[subject]
+
+    def is_eligible(self, subject: int, passed: int) -> bool:
+        groups = self.groups[subject]
+        return not groups or any(group.required & ~passed == 0 for group in groups)
+
+    def eligible(self, passed: int, include_without_prerequisites: bool = False) -> int:
+        """Bitset de los ramos no aprobados que se pueden tomar con los ramos `passed`.
+        Sólo considera los prerrequisitos: los correquisitos se pueden tomar en el mismo
+        semestre, y las restricciones no se pueden evaluar."""
+        candidates = 0
+        for subject in iter_bits(passed):
+            candidates |= self.unlocks[subject]
+        if include_without_prerequisites:
+            candidates |= self.without_prerequisites
+
+        eligible = 0
+        for subject in iter_bits(candidates & ~passed):
+            if self.is_eligible(subject, passed):
+                eligible |= 1 << subject
+        return eligible
+
+
+class PrerequisiteGraphLoader:
+    "Grafo de la versión actual de los datos, recargado cuando ésta cambia"
+
+    def __init__(self) -> None:
+        self.graph: Optional[PrerequisiteGraph] = None
+        self.version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def get(self, session: Session) -> PrerequisiteGraph:
+        version = data_version.get_with(session)
+        with self._lock:
+            if self.graph is None or self.version != version:
+                self.graph = PrerequisiteGraph.load(session)
+                self.version = version
+        return self.graph
+
+
+prerequisite_graph = PrerequisiteGraphLoader()
@@ -0,0 +1,185 @@
+"""
+Perfilado de peticiones
+-----------------------
+
+Con `api_profiling_enabled`, una petición con la cabecera `X-Profile` (con el valor de
+`api_profiling_token`, si se configuró) corre bajo un perfilador por muestreo: un hilo
+lee cada `api_profiling_interval` segundos las pilas de todos los hilos con
+`sys._current_frames()`, por lo que también ve las rutas `def` que corren en el
+threadpool. Con las muestras se arma un árbol de llamadas, que se guarda en
+`api_profiling_dir` y se sirve en `/profiles/{id}`; la respuesta trae el id en
+`X-Profile-Id`:
+
+    curl -H 'X-Profile: 1' -i 'http://127.0.0.1:8000/api/courses/?q=calculo'
+    curl http://127.0.0.1:8000/api/profiles/<id>
+
+Así se ve si el tiempo se va en armar la consulta, en SQL, en crear los objetos del
+ORM o en serializar la respuesta. Las peticiones perfiladas no usan el cache de
+respuestas. Las peticiones que corren a la vez en el mismo proceso también aparecen
+en las muestras, por lo que conviene perfilar en un worker sin carga. Mientras otro
+hilo usa CPU, el muestreo no es más frecuente que `sys.getswitchinterval()` (5 ms).
+
+Desactivado no se registra el middleware ni la ruta, y no agrega costo a las peticiones.
+"""
+
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from ..config import config
+from .metrics import current_timings
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_EXP = re.compile(r"^[0-9a-f]{32}$")
+# Hilos sin trabajo: esperando una tarea del threadpool o eventos del event loop
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+MIN_FRACTION = 0.01  # Ramas del árbol con menos muestras no se muestran
+TOP_FUNCTIONS = 15
+
+Stack = tuple[str, ...]
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    path = Path(code.co_filename)
+    return f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})"
+
+
+def frame_stack(frame) -> Stack:
+    "Funciones de la pila, desde la más externa"
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class Sampler:
+    "Hilo que cuenta las pilas de los demás hilos cada `interval` segundos"
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples: "Counter[Stack]" = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_filename.endswith(IDLE_FILES):
+                    continue
+                self.samples[frame_stack(frame)] += 1
+
+    def __enter__(self) -> "Sampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def call_tree(samples: "Counter[Stack]", min_fraction: float = MIN_FRACTION) -> list[str]:
+    "Árbol de llamadas con el porcentaje de muestras de cada rama"
+    total = sum(samples.values())
+    root: dict = {}
+    for stack, count in samples.items():
+        node = root
+        for label in stack:
+            entry = node.setdefault(label, [0, {}])
+            entry[0] += count
+            node = entry[1]
+
+    lines = []
+
+    def visit(node: dict, depth: int) -> None:
+        for label, (count, children) in sorted(node.items(), key=lambda item: -item[1][0]):
+            if count < total * min_fraction:
+                continue
+            lines.append(f"{100 * count / total:5.1f}% {count:>6}  {'  ' * depth}{label}")
+            visit(children, depth + 1)
+
+    visit(root, 0)
+    return lines
+
+
+def top_functions(samples: "Counter[Stack]", limit: int = TOP_FUNCTIONS) -> list[str]:
+    "Funciones con más muestras propias (la última de la pila)"
+    total = sum(samples.values())
+    own: "Counter[str]" = Counter()
+    for stack, count in samples.items():
+        own[stack[-1]] += count
+    return [
+        f"{100 * count / total:5.1f}% {count:>6}  {label}"
+        for label, count in own.most_common(limit)
+    ]
+
+
+def summary(request: Request, response: Response, sampler: Sampler, elapsed: float) -> str:
+    samples = sum(sampler.samples.values())
+    lines = [
+        f"{request.method} {request.url.path}"
+        + (f"?{request.url.query}" if request.url.query else ""),
+        f"Status {response.status_code}, {elapsed * 1000:.1f} ms, {samples} samples "
+        f"every {sampler.interval * 1000:g} ms",
+    ]
+    timings = current_timings()
+    if timings is not None:
+        lines.append(
+            f"SQL {timings.sql_seconds * 1000:.1f} ms in {timings.statements} statements, "
+            f"pool wait {timings.pool_seconds * 1000:.1f} ms"
+        )
+    if samples:
+        lines += ["", "Top functions (own samples):", *top_functions(sampler.samples)]
+        lines += ["", "Call tree:", *call_tree(sampler.samples)]
+    return "\n".join(lines) + "\n"
+
+
+def is_profiled(request: Request) -> bool:
+    value = request.headers.get(PROFILE_HEADER)
+    # Sin `root_path`, que `request.url.path` sí incluye
+    if value is None or request.scope["path"].startswith("/profiles/"):
+        return False
+    return not config.api_profiling_token or value == config.api_profiling_token
+
+
+async def profile_requests(request: Request, call_next) -> Response:
+    "Middleware que perfila las peticiones con la cabecera `X-Profile`"
+    if not is_profiled(request):
+        return await call_next(request)
+
+    started = time.perf_counter()
+    with Sampler(config.api_profiling_interval) as sampler:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    profile_id = uuid.uuid4().hex
+    config.api_profiling_dir.mkdir(parents=True, exist_ok=True)
+    (config.api_profiling_dir / f"{profile_id}.txt").write_text(
+        summary(request, response, sampler, elapsed)
+    )
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+profiling_router = APIRouter()
+
+
+@profiling_router.get("/profiles/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, request: Request) -> Response:
+    path = config.api_profiling_dir / f"{profile_id}.txt"
+    if not PROFILE_ID_EXP.match(profile_id) or not path.exists():
+        raise HTTPException(404)
+    if (
+        config.api_profiling_token
+        and request.headers.get(PROFILE_HEADER) != config.api_profiling_token
+    ):
+        raise HTTPException(403)
+    return Response(path.read_text(), media_type="text/plain; charset=utf-8")
@@ -1,24 +1,25 @@
 from typing import List
 
 from fastapi import APIRouter, Depends
-from fastapi_pagination import Page, add_pagination
-from fastapi_pagination.ext.sqlmodel import paginate
-from sqlmodel import Session, select
+from fastapi_pagination import add_pagination
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...db import Campus, Place
-from ..utils import get_db
+from ..pagination import Page, paginate_async
+from ..utils import get_async_db
 
 campus_router = APIRouter()
 
 
 @campus_router.get("/", response_model=List[Campus])
-async def get_campuses(db: Session = Depends(get_db)):
-    return db.exec(select(Campus)).all()
+async def get_campuses(db: AsyncSession = Depends(get_async_db)):
+    return (await db.exec(select(Campus))).all()
 
 
 @campus_router.get("/{campus_id}/places/", response_model=Page[Place])
-async def get_campus_places(campus_id: int, db: Session = Depends(get_db)):
-    return paginate(
+async def get_campus_places(campus_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await paginate_async(
         db,
         select(Place).join(Campus).where(Campus.id == campus_id),
     )
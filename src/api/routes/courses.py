@@ -2,12 +2,12 @@ import re
 from typing import Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi_pagination import Page, add_pagination
-from fastapi_pagination.ext.sqlmodel import paginate
-from sqlmodel import Session, col, select
+from fastapi_pagination import add_pagination
+from sqlmodel import Session, col, func, select
 
-from ...db import Course, Subject
+from ...db import Course, Subject, modules_mask, normalize_search_text
 from ..models import CourseFullResponse, CourseResponse
+from ..pagination import Page, paginate
 from ..utils import get_db
 
 course_router = APIRouter()
@@ -32,7 +32,7 @@ def get_courses(
     without_req: bool = Query(False, description="Discard courses with prerequisites"),
     with_quota: bool = Query(False, description="Discard courses without available quota"),
     blocked_schedule: list[str] = Query(
-        [], description="Discard courses colliding with this modules"
+        [], description="Discard courses colliding with this modules (e.g. L1, W3)"
     ),
     allow_ayu_and_lab_collisions: bool = Query(
         False, description="Ignore schedule collisions with AYU and LAB modules"
@@ -40,7 +40,7 @@ def get_courses(
 ):
     """Search like Buscacursos or RamosUC"""
 
-    query = select(Course).join(Subject)
+    query = select(Course).join(Subject).options(*CourseResponse.load_options())
     if q is not None:
         if NUMBERS_EXP.match(q):
             query = query.where(Course.nrc == q)
@@ -49,9 +49,11 @@ def get_courses(
             query = query.where(col(Subject.code).startswith(q.upper()))
 
         else:
+            # Sigla, nombre o profesores, sin importar mayúsculas ni tildes
+            search_text = normalize_search_text(q)
             query = query.where(
-                col(Subject.name).contains(q)
-            )  # TODO: match teachers (or), case-insensitive, unaccent
+                col(Course.search_text).contains(search_text, autoescape=True)
+            ).order_by(func.word_similarity(search_text, Course.search_text).desc(), Course.id)
 
     if term_id is not None:
         query = query.where(Course.term_id == term_id)
@@ -81,16 +83,22 @@ def get_courses(
         query = query.where(Course.available_quota != 0)
 
     if len(blocked_schedule) != 0:
-        # TODO: filter by schedule
+        try:
+            blocked_mask = modules_mask(blocked_schedule)
+        except ValueError:
+            raise HTTPException(422, "Invalid blocked_schedule modules")
+
+        occupied_mask = col(Course.schedule_mask)
         if allow_ayu_and_lab_collisions:
-            pass
+            occupied_mask = (occupied_mask - col(Course.ayu_lab_mask)).self_group()
+        query = query.where(occupied_mask.op("&")(blocked_mask) == 0)
 
     return paginate(db, query)
 
 
 @course_router.get("/{id}/", response_model=CourseFullResponse)
 def get_course(id: int, db: Session = Depends(get_db)) -> Course:
-    course = db.get(Course, id)
+    course = db.get(Course, id, options=CourseFullResponse.load_options())
     if course is None:
         raise HTTPException(404)
     return course
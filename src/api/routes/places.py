@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends
-from fastapi_pagination import Page, add_pagination, paginate
-from sqlmodel import Session, select
+from fastapi_pagination import add_pagination
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...db import Place
-from ..utils import get_db
+from ..pagination import Page, paginate_async
+from ..utils import get_async_db
 
 place_router = APIRouter()
 
 
 @place_router.get("/", response_model=Page[Place])
-async def get_places(db: Session = Depends(get_db)):
-    return paginate(db, select(Place))
+async def get_places(db: AsyncSession = Depends(get_async_db)):
+    return await paginate_async(db, select(Place))
 
 
 add_pagination(place_router)
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi_pagination import Page, add_pagination
-from fastapi_pagination.ext.sqlmodel import paginate
+from fastapi_pagination import add_pagination
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ...db import School, Subject
 from ..models import SubjectMinimal
-from ..utils import get_db
+from ..pagination import Page, paginate, paginate_async
+from ..utils import get_async_db, get_db
 
 school_router = APIRouter()
 
@@ -25,8 +26,8 @@ def get_school(id: int, db: Session = Depends(get_db)) -> School:
 
 
 @school_router.get("/{school_id}/subjects/", response_model=Page[SubjectMinimal])
-async def get_school_subjects(school_id: int, db: Session = Depends(get_db)):
-    return paginate(db, select(Subject).where(Subject.school_id == school_id))
+async def get_school_subjects(school_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await paginate_async(db, select(Subject).where(Subject.school_id == school_id))
 
 
 add_pagination(school_router)
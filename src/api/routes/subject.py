@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi_pagination import Page, add_pagination
-from fastapi_pagination.ext.sqlmodel import paginate
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi_pagination import add_pagination
 from sqlmodel import Session, select
 
 from ...db import Course, Subject, Term
-from ..models import CourseResponse, SubjectFullResponse, SubjectResponse
+from ..models import (
+    CourseResponse,
+    PrerequisiteNodeResponse,
+    SubjectFullResponse,
+    SubjectMinimal,
+    SubjectResponse,
+)
+from ..pagination import Page, paginate
+from ..prerequisites import PrerequisiteGraph, iter_bits, prerequisite_graph
 from ..utils import get_db
 
 subject_router = APIRouter()
@@ -12,12 +21,43 @@ subject_router = APIRouter()
 
 @subject_router.get("/", response_model=Page[SubjectResponse])
 def get_subjects(db: Session = Depends(get_db)):
-    return paginate(db, select(Subject))
+    return paginate(db, select(Subject).options(*SubjectResponse.load_options()))
+
+
+def get_graph_subject(graph: PrerequisiteGraph, subject_code: str) -> int:
+    if subject_code not in graph.index:
+        raise HTTPException(404)
+    return graph.index[subject_code]
+
+
+def graph_subjects(graph: PrerequisiteGraph, mask: int) -> list[SubjectMinimal]:
+    return [
+        SubjectMinimal(code=graph.codes[subject], name=graph.names[subject])
+        for subject in iter_bits(mask)
+    ]
+
+
+@subject_router.get("/eligible/", response_model=List[SubjectMinimal])
+def get_eligible_subjects(
+    passed: List[str] = Query([], description="Codes of the passed subjects"),
+    include_without_prerequisites: bool = False,
+    db: Session = Depends(get_db),
+):
+    """Subjects whose prerequisites are met by the passed subjects.
+    Corequisites and restrictions are not considered"""
+    graph = prerequisite_graph.get(db)
+    unknown = [code for code in passed if code not in graph.index]
+    if unknown:
+        raise HTTPException(422, f"Unknown subjects: {', '.join(unknown)}")
+
+    eligible = graph.eligible(graph.mask_of(passed), include_without_prerequisites)
+    return graph_subjects(graph, eligible)
 
 
 @subject_router.get("/{subject_code}/", response_model=SubjectFullResponse)
 def get_subject(subject_code: str, db: Session = Depends(get_db)):
-    s = db.exec(select(Subject).where(Subject.code == subject_code)).one_or_none()
+    query = select(Subject).where(Subject.code == subject_code)
+    s = db.exec(query.options(*SubjectFullResponse.load_options())).one_or_none()
     if s is None:
         raise HTTPException(404)
     return s
@@ -27,7 +67,12 @@ def get_subject(subject_code: str, db: Session = Depends(get_db)):
 def get_subject_sections(
     subject_code: str, year: int = None, period: str = None, db: Session = Depends(get_db)
 ):
-    query = select(Course).join(Subject).where(Subject.code == subject_code)
+    query = (
+        select(Course)
+        .join(Subject)
+        .where(Subject.code == subject_code)
+        .options(*CourseResponse.load_options())
+    )
     if year is not None:
         query = query.join(Term).where(Term.year == year)
 
@@ -37,4 +82,36 @@ def get_subject_sections(
     return paginate(db, query)
 
 
+@subject_router.get(
+    "/{subject_code}/prerequisites/tree/", response_model=List[PrerequisiteNodeResponse]
+)
+def get_prerequisite_tree(subject_code: str, db: Session = Depends(get_db)):
+    "The subject and all of its direct and indirect prerequisites, with their groups"
+    graph = prerequisite_graph.get(db)
+    subject = get_graph_subject(graph, subject_code)
+
+    nodes = [subject] + [s for s in iter_bits(graph.ancestors(subject_code)) if s != subject]
+    return [
+        PrerequisiteNodeResponse(
+            code=graph.codes[node],
+            name=graph.names[node],
+            prerequisites=[
+                {"group": group.group, "is_corequisite": is_corequisite, "code": graph.codes[p]}
+                for group in graph.groups[node]
+                for is_corequisite, mask in ((False, group.required), (True, group.corequisites))
+                for p in iter_bits(mask)
+            ],
+        )
+        for node in nodes
+    ]
+
+
+@subject_router.get("/{subject_code}/unlocks/all/", response_model=List[SubjectMinimal])
+def get_all_unlocks(subject_code: str, db: Session = Depends(get_db)):
+    "All the subjects that depend, directly or indirectly, on the subject"
+    graph = prerequisite_graph.get(db)
+    subject = get_graph_subject(graph, subject_code)
+    return graph_subjects(graph, graph.descendants(subject_code) & ~(1 << subject))
+
+
 add_pagination(subject_router)
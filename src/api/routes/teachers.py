@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends
-from fastapi_pagination import Page, add_pagination
-from fastapi_pagination.ext.sqlmodel import paginate
+from fastapi_pagination import add_pagination
 from sqlmodel import Session, select
 
 from ...db import Teacher
+from ..pagination import Page, paginate
 from ..utils import get_db
 
 teacher_router = APIRouter()
@@ -1,14 +1,25 @@
-from typing import Iterator
+from typing import AsyncIterator, Iterator
 
+from sqlalchemy import text
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..db import engine
+from ..db import async_engine, engine
 
 
 def get_db() -> Iterator[Session]:
+    "Sesión síncrona, para rutas `def` (corren en el threadpool de FastAPI)"
     db = Session(engine)
     try:
         yield db
-        db.commit()
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    "Sesión asíncrona de sólo lectura, para rutas `async def`"
+    async with AsyncSession(async_engine) as db:
+        async with db.begin():
+            if db.bind.dialect.name == "postgresql":
+                await db.execute(text("SET TRANSACTION READ ONLY"))
+            yield db
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Dict, Optional
 
 from pydantic import BaseSettings
 
@@ -8,8 +9,57 @@ class Config(BaseSettings):
     db_user: str = "user"
     db_password: str = "password"
     db_host: str = "localhost"
+    # Pool de conexiones de cada engine (sync y async), por proceso
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30  # segundos esperando una conexión libre
+    db_pool_recycle: int = 1800  # segundos antes de reemplazar una conexión
     api_base_path: Path = Path("/api")
 
+    # Cache de respuestas de la API (ver src/api/cache.py)
+    api_cache_enabled: bool = True
+    api_cache_backend: str = "memory"  # "memory" (por proceso) o "sqlite" (compartido)
+    api_cache_path: Path = Path(".cache/api.sqlite")
+    api_cache_max_entries: int = 1024
+    api_cache_max_age: int = 60  # segundos que clientes y proxies pueden reutilizar una respuesta
+    api_cache_version_ttl: float = 5  # segundos entre consultas de la versión de los datos
+    # Ruta /metrics y cabecera Server-Timing (ver src/api/metrics.py)
+    api_metrics_enabled: bool = True
+    # Perfilado de las peticiones con la cabecera X-Profile (ver src/api/profiling.py)
+    api_profiling_enabled: bool = False
+    api_profiling_token: str = ""  # Si se indica, la cabecera debe traer este valor
+    api_profiling_interval: float = 0.001  # segundos entre muestras
+    api_profiling_dir: Path = Path(".cache/profiles")
+
+    # Parser de las páginas de los scrapers: "bs4" o "lxml" (ver src/scrapers/lxml_parser.py)
+    scraper_parser: str = "bs4"
+    # Sitios de los scrapers, se pueden reemplazar por el servidor de src/scrapers/replay.py
+    buscacursos_url: str = "https://buscacursos.uc.cl/"
+    catalogo_url: str = "https://catalogo.uc.cl/"
+    scraper_record_dir: Optional[Path] = None  # Graba las respuestas en este corpus
+    # Cache HTTP de los scrapers (ver src/scrapers/cache.py)
+    scraper_cache_enabled: bool = True
+    scraper_cache_dir: Path = Path(".cache")
+    scraper_cache_max_mb: int = 512  # por sitio
+    # TTL en segundos por política, p. ej. '{"catalogo_syllabus": -1}'
+    scraper_cache_ttl: Dict[str, int] = {}
+    # Peticiones a cada sitio (ver src/scrapers/governor.py)
+    scraper_rate: float = 10  # peticiones por segundo
+    scraper_burst: int = 10
+    scraper_concurrency: int = 4  # peticiones simultáneas iniciales, se ajusta solo
+    scraper_max_concurrency: int = 32
+    scraper_retries: int = 3
+    scraper_backoff: float = 0.5  # segundos antes del primer reintento, se duplica en cada uno
+    scraper_max_backoff: float = 30
+    # Conexiones de cada sesión
+    scraper_connection_limit: int = 32
+    scraper_keepalive_timeout: float = 30
+    scraper_dns_cache_ttl: int = 300
+    scraper_timeout: float = 60  # segundos por petición
+    # Reporte de cada ejecución de los jobs (ver src/scrapers/jobs/report.py)
+    scraper_report_dir: Path = Path("log")
+    scraper_progress_interval: float = 30  # segundos entre líneas de progreso, 0 las desactiva
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,4 +1,7 @@
-from sqlmodel import SQLModel
+from sqlalchemy import bindparam, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine as _create_async_engine
+from sqlmodel import Session, SQLModel
 from sqlmodel import create_engine as _create_engine
 
 from ..config import config
@@ -15,13 +18,38 @@ from .subject import (
     SubjectEquivalencies,
     SubjectPrerequisites,
     Teacher,
+    module_bit,
+    modules_mask,
+    normalize_search_text,
+    schedule_masks,
 )
 from .term import PeriodEnum, Term
+from .version import DataVersion, bump_data_version, get_data_version
+
+
+def pool_options() -> dict:
+    return {
+        "pool_size": config.db_pool_size,
+        "max_overflow": config.db_max_overflow,
+        "pool_timeout": config.db_pool_timeout,
+        "pool_recycle": config.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
 
 
 def create_engine(*, user: str, password: str, db_name: str, host: str, driver: str = "postgresql"):
     return _create_engine(
         f"{driver}://{user}:{password}@{host}/{db_name}",
+        **pool_options(),
+    )
+
+
+def create_async_engine(
+    *, user: str, password: str, db_name: str, host: str, driver: str = "postgresql+asyncpg"
+):
+    return _create_async_engine(
+        f"{driver}://{user}:{password}@{host}/{db_name}",
+        **pool_options(),
     )
 
 
@@ -32,8 +60,85 @@ engine = create_engine(
     db_name=config.db_name,
 )
 
+# Para las rutas `async` de la API, que no deben bloquear el event loop
+async_engine = create_async_engine(
+    user=config.db_user,
+    password=config.db_password,
+    host=config.db_host,
+    db_name=config.db_name,
+)
+
+
+# `create_all` no modifica las tablas que ya existen. Columnas e índices agregados después
+# de crear la BD, que no se crean de nuevo si ya existen. Los índices únicos tienen el
+# nombre que PostgreSQL le da a las restricciones `UNIQUE` de `create_all`
+SCHEMA_UPGRADES = [
+    "ALTER TABLE course ADD COLUMN IF NOT EXISTS schedule_mask BIGINT NOT NULL DEFAULT 0",
+    "ALTER TABLE course ADD COLUMN IF NOT EXISTS ayu_lab_mask BIGINT NOT NULL DEFAULT 0",
+    "ALTER TABLE course ADD COLUMN IF NOT EXISTS search_text VARCHAR NOT NULL DEFAULT ''",
+    "ALTER TABLE course ADD COLUMN IF NOT EXISTS content_hash VARCHAR",
+    # Destinos de los `INSERT ... ON CONFLICT` de los scrapers
+    "CREATE UNIQUE INDEX IF NOT EXISTS course_subject_id_term_id_section_key "
+    "ON course (subject_id, term_id, section)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS subject_code_key ON subject (code)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS teacher_name_key ON teacher (name)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS school_name_key ON school (name)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS campus_name_key ON campus (name)",
+    "CREATE INDEX IF NOT EXISTS course_term_schedule_index "
+    "ON course (term_id, schedule_mask, ayu_lab_mask)",
+    "CREATE INDEX IF NOT EXISTS course_search_text_index "
+    "ON course USING gin (search_text gin_trgm_ops)",
+]
+
 
 def create_db(clean: bool = False):
+    """Crea las tablas, y agrega a las existentes las columnas e índices nuevos. Los cursos
+    guardados antes tienen las máscaras de horario en 0 hasta que se vuelvan a buscar, lo
+    que ocurre en la siguiente búsqueda completa ya que no tienen `content_hash`"""
+    with engine.begin() as connection:
+        # Índices de trigramas para la búsqueda de cursos
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
     if clean:
         SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
+    if backfill_search_text(engine):
+        with Session(engine) as session:
+            bump_data_version(session)
+
+
+SEARCH_TEXT_BATCH = 1000  # Cursos por cada `UPDATE`
+
+
+def backfill_search_text(bind: Engine) -> int:
+    """Completa `Course.search_text` de los cursos guardados antes de que existiera, con la
+    sigla y el nombre del ramo y los profesores, sin esperar a que se vuelvan a buscar.
+    Retorna cuántos cursos actualizó"""
+    query = (
+        select(Course.id, Subject.code, Subject.name, Teacher.name)
+        .join(Subject, Course.subject_id == Subject.id)
+        .outerjoin(CoursesTeachers, CoursesTeachers.course_id == Course.id)
+        .outerjoin(Teacher, CoursesTeachers.teacher_id == Teacher.id)
+        .where(Course.search_text == "")
+        .order_by(Course.id, Teacher.name)
+    )
+    stmt = (
+        update(Course.__table__)
+        .where(Course.__table__.c.id == bindparam("course_id"))
+        .values(search_text=bindparam("new_search_text"))
+    )
+    with bind.begin() as connection:
+        words: dict[int, list[str]] = {}
+        for course_id, code, name, teacher in connection.execute(query):
+            words.setdefault(course_id, [code, name])
+            if teacher is not None:
+                words[course_id].append(teacher)
+        rows = [
+            {"course_id": course_id, "new_search_text": normalize_search_text(" ".join(parts))}
+            for course_id, parts in words.items()
+        ]
+        for start in range(0, len(rows), SEARCH_TEXT_BATCH):
+            connection.execute(stmt, rows[start : start + SEARCH_TEXT_BATCH])
+    return len(rows)
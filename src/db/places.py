@@ -10,7 +10,7 @@ from sqlmodel import Field, Relationship, SQLModel
 
 class Campus(SQLModel, table=True):  # type: ignore  # noqa # type: ignore  # noqa
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(sa_column_kwargs={"unique": True})
     places: List["Place"] = Relationship()
 
 
@@ -1,7 +1,8 @@
 import enum
-from typing import List, Optional
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
 
-from sqlalchemy import Column
+from sqlalchemy import BigInteger, Column, Index, String, UniqueConstraint
 
 # sqlalchemy debería ser evitado, pero la API de sqlmodel no es tan completa aún
 from sqlalchemy.sql.sqltypes import Enum as SQLEnum
@@ -53,7 +54,7 @@ class Subject(SQLModel, table=True):  # type: ignore  # noqa
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     credits: int
-    code: str
+    code: str = Field(sa_column_kwargs={"unique": True})
     courses: List["Course"] = Relationship(back_populates="subject")
     school_id: Optional[int] = Field(default=None, foreign_key="school.id")
     school: Optional["School"] = Relationship(back_populates="subjects")
@@ -98,6 +99,19 @@ class Course(SQLModel, table=True):  # type: ignore  # noqa
     """Instance of a Subject dictated in a Term and specific section.
     Represents a course from Buscacursos."""
 
+    __table_args__ = (
+        UniqueConstraint("subject_id", "term_id", "section"),
+        # Permite filtrar por tope de horario leyendo sólo el índice
+        Index("course_term_schedule_index", "term_id", "schedule_mask", "ayu_lab_mask"),
+        # Requiere la extensión pg_trgm (ver `create_db`)
+        Index(
+            "course_search_text_index",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     subject_id: Optional[int] = Field(default=None, foreign_key="subject.id")
     subject: Subject = Relationship(back_populates="courses")
@@ -115,9 +129,31 @@ class Course(SQLModel, table=True):  # type: ignore  # noqa
     is_english: Optional[bool]
     need_special_aproval: Optional[bool]
     schedule: List["ClassSchedule"] = Relationship(back_populates="course")
+    # Módulos que ocupa el curso en la semana, y los que ocupa sólo con AYU o LAB
+    # (ver `schedule_masks`)
+    schedule_mask: int = Field(
+        default=0, sa_column=Column(BigInteger, nullable=False, default=0, server_default="0")
+    )
+    ayu_lab_mask: int = Field(
+        default=0, sa_column=Column(BigInteger, nullable=False, default=0, server_default="0")
+    )
     available_quota: Optional[int]
     total_quota: Optional[int]
     teachers: List["Teacher"] = Relationship(back_populates="courses", link_model=CoursesTeachers)
+    # Sigla, nombre y profesores, normalizados con `normalize_search_text`
+    search_text: str = Field(
+        default="", sa_column=Column(String, nullable=False, default="", server_default="")
+    )
+    # Hash del curso tal como se obtuvo de Buscacursos (ver `course_content_hash`),
+    # para no reescribir los cursos que no cambiaron
+    content_hash: Optional[str] = None
+
+
+def normalize_search_text(text: str) -> str:
+    "Texto en minúsculas y sin tildes, para búsquedas que ignoran ambos"
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(without_accents.lower().split())
 
 
 class DayEnum(str, enum.Enum):
@@ -131,6 +167,40 @@ class DayEnum(str, enum.Enum):
     S = "S"
 
 
+MODULES_PER_DAY = 8
+AYU_LAB_TYPES = {"AYU", "LAB"}
+_DAY_INDEX = {day: i for i, day in enumerate(DayEnum)}
+
+
+def module_bit(day: "DayEnum | str", module: int) -> int:
+    "Bit de un módulo en una máscara semanal de 48 bits (6 días × 8 módulos)"
+    if not 1 <= module <= MODULES_PER_DAY:
+        raise ValueError(f"Invalid module {module}")
+    return 1 << (_DAY_INDEX[DayEnum(day)] * MODULES_PER_DAY + module - 1)
+
+
+def modules_mask(modules: Iterable[str]) -> int:
+    "Máscara de módulos con el formato de Buscacursos, por ejemplo `['L1', 'W2']`"
+    mask = 0
+    for module in modules:
+        mask |= module_bit(module[:1], int(module[1:]))
+    return mask
+
+
+def schedule_masks(schedule: Iterable[Tuple["DayEnum | str", int, Optional[str]]]):
+    """Calcula las máscaras de un horario con elementos `(día, módulo, tipo)`.
+    Retorna la máscara de los módulos ocupados y la de los módulos ocupados
+    únicamente por ayudantías o laboratorios."""
+    occupied = 0
+    strict = 0
+    for day, module, module_type in schedule:
+        bit = module_bit(day, module)
+        occupied |= bit
+        if module_type not in AYU_LAB_TYPES:
+            strict |= bit
+    return occupied, occupied & ~strict
+
+
 class ClassSchedule(SQLModel, table=True):  # type: ignore  # noqa
     """Module of a course in a week"""
 
@@ -145,7 +215,7 @@ class ClassSchedule(SQLModel, table=True):  # type: ignore  # noqa
 
 class Teacher(SQLModel, table=True):  # type: ignore  # noqa
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(sa_column_kwargs={"unique": True})
     photo_url: Optional[str] = None
     website: Optional[str] = None
     email: Optional[str] = None
@@ -154,7 +224,7 @@ class Teacher(SQLModel, table=True):  # type: ignore  # noqa
 
 class School(SQLModel, table=True):  # type: ignore  # noqa
     id: Optional[int] = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(sa_column_kwargs={"unique": True})
     website: Optional[str] = None
     description: Optional[str] = None
     subjects: List[Subject] = Relationship(back_populates="school")
@@ -0,0 +1,308 @@
+"""
+Datos sintéticos
+----------------
+
+Llena una BD con datos con la forma de los de la UC, para medir la API a escala sin
+correr los scrapers:
+
+    python -m src.db.synthetic --subjects 6000 --terms 6 --clean
+
+Las siglas son de 3 letras por unidad académica y 4 dígitos, con más ramos en los
+primeros niveles. Cada semestre se dicta una parte de los ramos, con una cola larga
+de secciones (la mayoría tiene una, algunos más de diez), horarios de cátedra y
+ayudantía, y profesores compartidos entre secciones. Los prerrequisitos son grupos
+DNF de ramos de niveles anteriores, con su texto en el formato de Catalogo.
+
+Con la misma `seed` se generan los mismos datos.
+"""
+
+import argparse
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from string import ascii_uppercase
+from typing import Iterator
+
+from sqlalchemy import insert, text
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel
+
+from .places import Campus
+from .subject import (
+    ClassSchedule,
+    Course,
+    CoursesTeachers,
+    DayEnum,
+    School,
+    Subject,
+    SubjectPrerequisites,
+    Teacher,
+    normalize_search_text,
+    schedule_masks,
+)
+from .term import PeriodEnum, Term
+from .version import DATA_VERSION_ID, DataVersion
+
+CAMPUSES = ["San Joaquín", "Casa Central", "Lo Contador", "Oriente", "Villarrica"]
+CAMPUS_WEIGHTS = [70, 12, 8, 8, 2]
+FORMATS = ["Presencial", "Online", "Híbrido"]
+CATEGORIES = ["Normal", "Optativo de Profundización", "Formación General", "Magíster"]
+FG_AREAS = ["", "Ciencias Sociales", "Humanidades", "Artes", "Ecológico Integrado"]
+MODULE_TYPES = ["CLAS", "AYU", "LAB", "TAL"]
+NAME_WORDS = [
+    "Introducción", "Programación", "Cálculo", "Álgebra", "Física", "Química", "Historia",
+    "Taller", "Diseño", "Estructuras", "Datos", "Sistemas", "Teoría", "Métodos", "Avanzado",
+    "Economía", "Derecho", "Biología", "Estadística", "Arquitectura", "Música", "Ética",
+]  # fmt: skip
+FIRST_NAMES = ["Juan", "María", "José", "Ana", "Pedro", "Camila", "Diego", "Valentina", "Luis"]
+LAST_NAMES = ["González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Vera"]
+INSERT_BATCH = 5000
+
+
+@dataclass
+class DatasetShape:
+    terms: int = 4
+    schools: int = 40
+    subjects: int = 4000
+    teachers: int = 3000
+    offered: float = 0.45  # Parte de los ramos que se dicta cada semestre
+    with_prerequisites: float = 0.6
+    seed: int = 0
+
+
+@dataclass
+class Dataset:
+    "Filas de cada tabla, con ids explícitos"
+
+    tables: dict[type, list[dict]]
+
+    def count(self, model: type) -> int:
+        return len(self.tables.get(model, []))
+
+
+def school_prefixes(rng: random.Random, n: int) -> list[str]:
+    prefixes: set[str] = set()
+    while len(prefixes) < n:
+        prefixes.add("".join(rng.choices(ascii_uppercase, k=3)))
+    return sorted(prefixes)
+
+
+def subject_name(rng: random.Random) -> str:
+    words = rng.sample(NAME_WORDS, rng.randint(1, 3))
+    return " ".join(words) + rng.choice(["", "", " I", " II", " III"])
+
+
+def requirements_text(groups: list[list[tuple[str, bool]]]) -> str:
+    "Texto como el de Catalogo, p. ej. `(IIC1103 y MAT1610(c)) o IIC1102`"
+
+    def requirement(code: str, is_corequisite: bool) -> str:
+        return f"{code}(c)" if is_corequisite else code
+
+    parts = [" y ".join(requirement(*r) for r in group) for group in groups]
+    if len(parts) == 1:
+        return parts[0]
+    return " o ".join(f"({part})" if " y " in part else part for part in parts)
+
+
+def random_schedule(rng: random.Random) -> list[tuple[DayEnum, int, str, str]]:
+    "Cátedra en 2 o 3 módulos y a veces ayudantía o laboratorio"
+    days = list(DayEnum)[:5]
+    module = rng.choices(range(1, 9), weights=[8, 10, 10, 6, 8, 8, 4, 2])[0]
+    classroom = f"{rng.choice('ABCDEKN')}{rng.randint(1, 30)}"
+    schedule = [(day, module, "CLAS", classroom) for day in rng.sample(days, rng.choice([2, 2, 3]))]
+    if rng.random() < 0.6:
+        kind = rng.choices(MODULE_TYPES[1:], weights=[6, 3, 1])[0]
+        extra = (rng.choice(days), rng.randint(1, 8), kind, classroom)
+        if extra[:2] not in {(day, module) for day, module, *_ in schedule}:
+            schedule.append(extra)
+    return schedule
+
+
+def generate(shape: DatasetShape) -> Dataset:
+    rng = random.Random(shape.seed)
+    tables: dict[type, list[dict]] = {}
+
+    tables[Campus] = [{"id": i + 1, "name": name} for i, name in enumerate(CAMPUSES)]
+    prefixes = school_prefixes(rng, shape.schools)
+    tables[School] = [
+        {"id": i + 1, "name": f"Escuela {prefix}"} for i, prefix in enumerate(prefixes)
+    ]
+    terms = []
+    for i in range(shape.terms):
+        year, period = 2018 + i // 2, [PeriodEnum.s1, PeriodEnum.s2][i % 2]
+        terms.append({"id": i + 1, "year": year, "period": period})
+    tables[Term] = terms
+
+    # Ramos: unidades académicas de distinto tamaño y más ramos en niveles bajos
+    school_weights = [rng.paretovariate(1.2) for _ in prefixes]
+    codes: set[str] = set()
+    subjects = []
+    levels: dict[int, list[int]] = {}
+    while len(subjects) < shape.subjects:
+        school = rng.choices(range(len(prefixes)), weights=school_weights)[0]
+        level = rng.choices(range(1, 6), weights=[30, 25, 20, 15, 10])[0]
+        code = f"{prefixes[school]}{level}{rng.randint(0, 999):03d}"
+        if code in codes:
+            continue
+        codes.add(code)
+        id = len(subjects) + 1
+        subjects.append(
+            {
+                "id": id,
+                "code": code,
+                "name": subject_name(rng),
+                "credits": rng.choices([5, 10, 15, 20, 30], weights=[15, 70, 8, 5, 2])[0],
+                "school_id": school + 1,
+                "academic_level": "Pregrado" if level < 5 else "Postgrado",
+                "is_active": rng.random() < 0.85,
+                "prerequisites_raw": "No tiene",
+                "need_all_requirements": False,
+            }
+        )
+        levels.setdefault(level, []).append(id)
+    tables[Subject] = subjects
+
+    # Prerrequisitos: de 1 a 3 grupos de 1 a 3 ramos de niveles anteriores
+    prerequisites = []
+    for subject in subjects:
+        level = int(subject["code"][3])
+        candidates = [id for lower in range(1, level) for id in levels.get(lower, [])]
+        if not candidates or rng.random() > shape.with_prerequisites:
+            continue
+        groups = []
+        for group in range(rng.choices([1, 2, 3], weights=[60, 30, 10])[0]):
+            required = rng.sample(candidates, min(len(candidates), rng.randint(1, 3)))
+            rows = [
+                {
+                    "subject_id": subject["id"],
+                    "prerequisite_id": id,
+                    "group": group,
+                    "is_corequisite": rng.random() < 0.1,
+                }
+                for id in required
+            ]
+            prerequisites.extend(rows)
+            groups.append(
+                [(subjects[r["prerequisite_id"] - 1]["code"], r["is_corequisite"]) for r in rows]
+            )
+        subject["prerequisites_raw"] = requirements_text(groups)
+    tables[SubjectPrerequisites] = prerequisites
+
+    teachers = set()
+    while len(teachers) < shape.teachers:
+        teachers.add(
+            f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)} "
+            f"{rng.choice(ascii_uppercase)}"
+        )
+    teacher_names = sorted(teachers)
+    tables[Teacher] = [{"id": i + 1, "name": name} for i, name in enumerate(teacher_names)]
+
+    # Cursos de cada semestre, con una cola larga de secciones
+    courses, course_teachers, schedules = [], [], []
+    for term in terms:
+        for subject in rng.sample(subjects, int(len(subjects) * shape.offered)):
+            sections = min(int(rng.paretovariate(1.6)), 20)
+            staff = rng.sample(range(1, len(teacher_names) + 1), rng.randint(1, 3))
+            for section in range(1, sections + 1):
+                id = len(courses) + 1
+                total = rng.choice([30, 40, 60, 80, 100, 120])
+                schedule = random_schedule(rng)
+                teachers_ids = rng.sample(staff, rng.randint(1, len(staff)))
+                occupied, ayu_lab = schedule_masks((d, m, t) for d, m, t, _ in schedule)
+                teacher_text = [teacher_names[t - 1] for t in teachers_ids]
+                courses.append(
+                    {
+                        "id": id,
+                        "subject_id": subject["id"],
+                        "term_id": term["id"],
+                        "section": section,
+                        "nrc": str(10000 + id),
+                        "campus_id": rng.choices(range(1, len(CAMPUSES) + 1), CAMPUS_WEIGHTS)[0],
+                        "format": rng.choices(FORMATS, weights=[85, 10, 5])[0],
+                        "category": rng.choices(CATEGORIES, weights=[70, 15, 10, 5])[0],
+                        "fg_area": rng.choices(FG_AREAS, weights=[80, 5, 5, 5, 5])[0],
+                        "is_removable": rng.random() < 0.9,
+                        "is_english": rng.random() < 0.05,
+                        "need_special_aproval": rng.random() < 0.05,
+                        "total_quota": total,
+                        "available_quota": rng.randint(0, total),
+                        "schedule_summary": str([f"{d.value}{m}" for d, m, *_ in schedule]),
+                        "schedule_mask": occupied,
+                        "ayu_lab_mask": ayu_lab,
+                        "search_text": normalize_search_text(
+                            " ".join([subject["code"], subject["name"], *teacher_text])
+                        ),
+                    }
+                )
+                course_teachers.extend({"course_id": id, "teacher_id": t} for t in teachers_ids)
+                schedules.extend(
+                    {
+                        "course_id": id,
+                        "day": day,
+                        "module": module,
+                        "type": kind,
+                        "classroom": classroom,
+                    }
+                    for day, module, kind, classroom in schedule
+                )
+    tables[Course] = courses
+    tables[CoursesTeachers] = course_teachers
+    tables[ClassSchedule] = [{"id": i + 1, **row} for i, row in enumerate(schedules)]
+    return Dataset(tables)
+
+
+def batches(rows: list[dict], size: int = INSERT_BATCH) -> Iterator[list[dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def load(engine: Engine, dataset: Dataset, clean: bool = False) -> None:
+    "Inserta los datos (en el orden de las llaves foráneas) y avanza las secuencias de ids"
+    if clean:
+        SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        for model, rows in dataset.tables.items():
+            for batch in batches(rows):
+                connection.execute(insert(model.__table__), batch)  # type: ignore
+
+        if connection.dialect.name == "postgresql":
+            for model, rows in dataset.tables.items():
+                table = model.__table__.name  # type: ignore
+                if rows and "id" in rows[0]:
+                    connection.execute(
+                        text(
+                            f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                            f'(SELECT MAX(id) FROM "{table}"))'
+                        )
+                    )
+
+    with Session(engine) as session:
+        version = session.get(DataVersion, DATA_VERSION_ID) or DataVersion(id=DATA_VERSION_ID)
+        version.version += 1
+        version.updated_at = datetime.now()
+        session.add(version)
+        session.commit()
+
+
+def main() -> None:
+    defaults = DatasetShape()
+    parser = argparse.ArgumentParser(description="Llena la BD con datos sintéticos")
+    for name, value in vars(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    parser.add_argument("--clean", action="store_true", help="borra las tablas antes")
+    args = vars(parser.parse_args())
+    clean = args.pop("clean")
+
+    from . import create_db, engine
+
+    create_db(clean=clean)
+    dataset = generate(DatasetShape(**args))
+    load(engine, dataset)
+    for model, rows in dataset.tables.items():
+        print(f"{model.__name__:>22}: {len(rows)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Field, Session, SQLModel, select
+
+DATA_VERSION_ID = 1
+
+
+class DataVersion(SQLModel, table=True):  # type: ignore  # noqa
+    """Version of the scraped data, with a single row.
+    Scraper jobs bump it when they finish, so API caches know when to invalidate."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = 0
+    updated_at: Optional[datetime] = None
+
+
+def get_data_version(session: Session) -> int:
+    version = session.exec(
+        select(DataVersion.version).where(DataVersion.id == DATA_VERSION_ID)
+    ).one_or_none()
+    return version or 0
+
+
+def bump_data_version(session: Session) -> None:
+    stmt = insert(DataVersion).values(id=DATA_VERSION_ID, version=1, updated_at=datetime.now())
+    session.exec(
+        stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"version": DataVersion.version + 1, "updated_at": stmt.excluded.updated_at},
+        )
+    )
+    session.commit()
@@ -1,49 +1,109 @@
 import os
 from contextlib import asynccontextmanager
 
-from aiohttp_client_cache.backends.sqlite import SQLiteBackend
-from aiohttp_client_cache.session import CachedSession
+from aiohttp import ClientTimeout, TCPConnector
 
+from ..config import config
 from .buscacursos import get_available_terms, get_courses
+from .cache import DAY, MINUTE, CachePolicy, CacheStats, ScraperCache, ScraperSession
 from .catalogo import get_subjects
 from .description import get_description
+from .governor import HostGovernor
+from .replay import Recorder
+
+BUSCACURSOS_POLICIES = [
+    CachePolicy("buscacursos_courses", 10 * MINUTE, method="GET"),  # Vacantes
+    CachePolicy("buscacursos_terms", DAY, method="POST"),
+]
+CATALOGO_POLICIES = [
+    CachePolicy("catalogo_subjects", DAY, params={"view": "cursoslist"}),
+    CachePolicy("catalogo_requirements", 7 * DAY, params={"view": "requisitos"}),
+    CachePolicy("catalogo_syllabus", 30 * DAY, params={"view": "programa"}),
+]
 
 
 class RequestCachedSessions:
-    "Clase auxiliar para utilizar sesiones asíncronas con cache"
+    """Clase auxiliar para utilizar sesiones asíncronas con cache.
+    Cada sesión se comparte entre todas las rutinas que la estén usando,
+    y se cierra cuando la última de ellas termina. Las sesiones con `refresh`
+    no leen el cache, y se comparten sólo entre ellas."""
 
     def __init__(self, cache_dir: str = ".cache") -> None:
-        self._buscacursos = None
-        self._catalogo = None
+        self._sessions: dict[tuple[str, bool], ScraperSession] = {}
+        self._users: dict[tuple[str, bool], int] = {}
+        self.base_urls = {"buscacursos": config.buscacursos_url, "catalogo": config.catalogo_url}
 
-        self.__cache_buscacursos = SQLiteBackend(
-            cache_name=os.path.join(cache_dir, "buscacursos.sql"),
-            allowed_methods=("GET", "POST"),
-        )
-        self.__cache_catalogo = SQLiteBackend(
-            cache_name=os.path.join(cache_dir, "catalogo.sql"),
-            allowed_methods=("GET", "POST"),
+        self.caches = {
+            "buscacursos": self._create_cache(cache_dir, "buscacursos", BUSCACURSOS_POLICIES),
+            "catalogo": self._create_cache(cache_dir, "catalogo", CATALOGO_POLICIES),
+        }
+        # Se mantienen entre sesiones, para no volver a buscar el límite de cada sitio
+        self.governors = {name: HostGovernor.from_config() for name in self.caches}
+        # Grabación de las respuestas (ver src/scrapers/replay.py)
+        self.recorders = {
+            name: Recorder(config.scraper_record_dir / name)
+            for name in self.caches
+            if config.scraper_record_dir is not None
+        }
+
+    @staticmethod
+    def _create_cache(cache_dir: str, name: str, policies: list[CachePolicy]) -> ScraperCache:
+        cache = ScraperCache(
+            os.path.join(cache_dir, f"{name}.sql"),
+            policies,
+            max_bytes=config.scraper_cache_max_mb * 10**6,
+            ttl_overrides=config.scraper_cache_ttl,
         )
+        cache.disabled = not config.scraper_cache_enabled
+        return cache
+
+    @property
+    def stats(self) -> dict[str, CacheStats]:
+        "Estadísticas del cache de cada sitio desde que se inició el proceso"
+        return {name: cache.stats for name, cache in self.caches.items()}
+
+    def report_stats(self) -> None:
+        for name, stats in self.stats.items():
+            stats.report(name)
+            self.governors[name].report(name)
 
     @asynccontextmanager
-    async def buscacursos(self):
-        if not self._buscacursos:
-            self._buscacursos = CachedSession(
-                base_url="https://buscacursos.uc.cl/", cache=self.__cache_buscacursos
+    async def _shared_session(self, name: str, refresh: bool = False):
+        key = (name, refresh)
+        if key not in self._sessions:
+            connector = TCPConnector(
+                limit_per_host=config.scraper_connection_limit,
+                keepalive_timeout=config.scraper_keepalive_timeout,
+                ttl_dns_cache=config.scraper_dns_cache_ttl,
             )
-        yield self._buscacursos
-        await self._buscacursos.close()
-        self._buscacursos = None
+            self._sessions[key] = ScraperSession(
+                base_url=self.base_urls[name],
+                cache=self.caches[name],
+                governor=self.governors[name],
+                recorder=self.recorders.get(name),
+                refresh=refresh,
+                connector=connector,
+                timeout=ClientTimeout(total=config.scraper_timeout),
+            )
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            yield self._sessions[key]
+        finally:
+            self._users[key] -= 1
+            if self._users[key] == 0:
+                await self._sessions.pop(key).close()
+                if name in self.recorders:
+                    self.recorders[name].save()
+
+    @asynccontextmanager
+    async def buscacursos(self, refresh: bool = False):
+        async with self._shared_session("buscacursos", refresh) as session:
+            yield session
 
     @asynccontextmanager
     async def catalogo(self):
-        if not self._catalogo:
-            self._catalogo = CachedSession(
-                base_url="https://catalogo.uc.cl/", cache=self.__cache_catalogo
-            )
-        yield self._catalogo
-        await self._catalogo.close()
-        self._catalogo = None
+        async with self._shared_session("catalogo") as session:
+            yield session
 
 
-request = RequestCachedSessions()
+request = RequestCachedSessions(str(config.scraper_cache_dir))
@@ -0,0 +1,272 @@
+"""
+Benchmarks del parseo
+---------------------
+
+Mide las funciones que más se llaman al parsear Buscacursos y Catalogo sobre un corpus
+de páginas guardadas (`tests/pages` y, con `--corpus`, un corpus grabado con
+`src/scrapers/replay.py`), y las compara con una línea base:
+
+    python -m src.scrapers.benchmark            # compara con tests/benchmark_baseline.json
+    python -m src.scrapers.benchmark --save     # guarda una nueva línea base
+    python -m src.scrapers.benchmark -k requirements
+
+Por cada función se reporta el tiempo por llamada y la memoria máxima asignada en una
+pasada por el corpus. Los tiempos se guardan relativos a una carga de referencia en
+Python puro, para poder comparar entre máquinas, y el comando falla (código 1) si
+alguna función es más lenta o usa más memoria que la línea base más la tolerancia.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+import bs4
+
+from . import buscacursos, catalogo, lxml_parser
+from .description import get_description
+from .replay import Corpus
+from .utils import run_parse_strategy
+
+PAGES = Path(__file__).parents[2] / "tests" / "pages"
+BASELINE = Path(__file__).parents[2] / "tests" / "benchmark_baseline.json"
+TIME_TOLERANCE = 0.3
+MEMORY_TOLERANCE = 0.1
+TABLE_KEYS = ("Prerrequisitos", "Equivalencias", "Relación", "Restricciones")
+
+
+@dataclass
+class Benchmark:
+    "Llama `function` con cada elemento de `inputs`"
+
+    name: str
+    function: Callable[[Any], Any]
+    inputs: Sequence[Any]
+
+    def run(self) -> None:
+        function = self.function
+        for item in self.inputs:
+            function(item)
+
+
+@dataclass
+class PageCorpus:
+    courses: list[bytes]
+    subjects: list[bytes]
+    requirements: list[bytes]
+    syllabi: list[bytes]
+    requirement_texts: list[str]
+
+    @classmethod
+    def load(cls, recorded: Optional[Path] = None) -> "PageCorpus":
+        corpus = cls(
+            courses=[(PAGES / name).read_bytes() for name in ("buscacursos.html",)],
+            subjects=[(PAGES / "catalogo_subjects.html").read_bytes()],
+            requirements=[(PAGES / "catalogo_requirements.html").read_bytes()],
+            syllabi=[(PAGES / "catalogo_syllabus.html").read_bytes()],
+            requirement_texts=(PAGES / "requirements.txt").read_text().splitlines(),
+        )
+        if recorded is not None:
+            corpus.add_recorded(recorded)
+        return corpus
+
+    def add_recorded(self, directory: Path) -> None:
+        "Agrega las páginas exitosas de un corpus grabado, según su endpoint"
+        for site in ("buscacursos", "catalogo"):
+            recorded = Corpus(directory / site)
+            for key in recorded.responses:
+                status, _, body = recorded.get(key)  # type: ignore
+                if status != 200:
+                    continue
+                if site == "buscacursos" and "cxml_sigla=" in key:
+                    self.courses.append(body)
+                elif "view=cursoslist" in key:
+                    self.subjects.append(body)
+                elif "view=requisitos" in key:
+                    self.requirements.append(body)
+                elif "view=programa" in key:
+                    self.syllabi.append(body)
+
+        for body in self.requirements:
+            text = catalogo.parse_additional_info_page(body).get("prerequisites_raw")
+            if text:
+                self.requirement_texts.append(text)
+
+
+def select_cells(rows: list[bs4.element.Tag], column: str) -> list[bs4.element.Tag]:
+    index = list(buscacursos.COLUMNS_STRATEGIES).index(column)
+    cells = [row.find_all("td", recursive=False) for row in rows]
+    return [row[index] for row in cells if len(row) > index]
+
+
+def build_benchmarks(corpus: PageCorpus) -> list[Benchmark]:
+    course_soups = [bs4.BeautifulSoup(body, "lxml") for body in corpus.courses]
+    course_rows = [
+        row for soup in course_soups for row in soup.find_all("tr", buscacursos.MATCH_RESULT_ROW)
+    ]
+    schedule_cells = select_cells(course_rows, "schedule")
+    schedule_rows = [row for cell in schedule_cells for row in cell.find_all("tr")]
+    subject_rows = [
+        row
+        for body in corpus.subjects
+        for row in bs4.BeautifulSoup(body, "lxml").select("tbody > tr")
+    ]
+    requirement_soups = [bs4.BeautifulSoup(body, "lxml") for body in corpus.requirements]
+    syllabi = [catalogo.parse_syllabus_page(body).get("syllabus", "") for body in corpus.syllabi]
+
+    return [
+        Benchmark("buscacursos.parse_schedule", buscacursos.parse_schedule, schedule_cells),
+        Benchmark("buscacursos.parse_schedule_row", buscacursos.parse_schedule_row, schedule_rows),
+        Benchmark(
+            "buscacursos.parse_teachers",
+            buscacursos.parse_teachers,
+            select_cells(course_rows, "teachers"),
+        ),
+        Benchmark(
+            "buscacursos.run_parse_strategy",
+            lambda row: run_parse_strategy(
+                buscacursos.COLUMNS_STRATEGIES, row.findChildren("td", recursive=False)
+            ),
+            course_rows,
+        ),
+        Benchmark("buscacursos.parse_row", buscacursos.parse_row, course_rows),
+        Benchmark("buscacursos.parse_courses_page", buscacursos.parse_courses_page, corpus.courses),
+        Benchmark("lxml_parser.parse_courses_page", lxml_parser.parse_courses_page, corpus.courses),
+        Benchmark(
+            "catalogo.run_parse_strategy",
+            lambda row: run_parse_strategy(
+                catalogo.COLUMNS_STRATEGIES, row.findChildren("td", recursive=False)
+            ),
+            subject_rows,
+        ),
+        Benchmark("catalogo.parse_subjects_page", catalogo.parse_subjects_page, corpus.subjects),
+        Benchmark(
+            "catalogo.parse_requirements_groups",
+            # Sin el `lru_cache`, para medir el parseo y no el cache
+            catalogo._requirements_groups.__wrapped__,  # type: ignore
+            corpus.requirement_texts,
+        ),
+        Benchmark(
+            "catalogo.find_text_by_table_key",
+            lambda soup: [catalogo.find_text_by_table_key(soup, key) for key in TABLE_KEYS],
+            requirement_soups,
+        ),
+        Benchmark(
+            "catalogo.parse_additional_info_page",
+            catalogo.parse_additional_info_page,
+            corpus.requirements,
+        ),
+        Benchmark("description.get_description", get_description, syllabi),
+    ]
+
+
+def reference_workload() -> None:
+    "Carga fija en Python puro (strings, dicts y listas), para normalizar los tiempos"
+    words = [f"IIC{i:04d}" for i in range(2000)]
+    index = {word: i for i, word in enumerate(words)}
+    sorted(words, key=lambda w: (w[::-1], index[w]))
+
+
+def time_per_call(function: Callable[[], None], calls: int, repeat: int = 5) -> float:
+    "Mejor tiempo en segundos de `function` dividido en `calls` llamadas"
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number / max(calls, 1)
+
+
+def peak_memory(function: Callable[[], None]) -> int:
+    "Bytes máximos asignados durante una llamada"
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(benchmarks: list[Benchmark], repeat: int = 5) -> dict:
+    reference = time_per_call(reference_workload, 1, repeat)
+    results = {}
+    for benchmark in benchmarks:
+        seconds = time_per_call(benchmark.run, len(benchmark.inputs), repeat)
+        results[benchmark.name] = {
+            "calls": len(benchmark.inputs),
+            "us_per_call": round(seconds * 1e6, 3),
+            "relative_time": round(seconds / reference, 6),
+            "peak_kb": round(peak_memory(benchmark.run) / 1024, 1),
+        }
+    return {"reference_us": round(reference * 1e6, 1), "results": results}
+
+
+def compare(
+    current: dict,
+    baseline: dict,
+    time_tolerance: float = TIME_TOLERANCE,
+    memory_tolerance: float = MEMORY_TOLERANCE,
+) -> list[str]:
+    "Regresiones respecto a la línea base (las funciones con otro corpus no se comparan)"
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or base["calls"] != result["calls"]:
+            continue
+        time_ratio = result["relative_time"] / base["relative_time"]
+        if time_ratio > 1 + time_tolerance:
+            regressions.append(f"{name}: {time_ratio:.2f}x slower")
+        if result["peak_kb"] > base["peak_kb"] * (1 + memory_tolerance) + 1:
+            regressions.append(f"{name}: peak {base['peak_kb']} KB -> {result['peak_kb']} KB")
+    return regressions
+
+
+def report(current: dict, baseline: Optional[dict]) -> None:
+    print(f"Reference workload: {current['reference_us']:.1f} us")
+    print(f"{'benchmark':40} {'calls':>6} {'us/call':>10} {'peak KB':>9} {'vs base':>8}")
+    for name, result in current["results"].items():
+        base = (baseline or {}).get("results", {}).get(name)
+        change = ""
+        if base is not None and base["calls"] == result["calls"]:
+            change = f"{result['relative_time'] / base['relative_time']:.2f}x"
+        print(
+            f"{name:40} {result['calls']:>6} {result['us_per_call']:>10.2f} "
+            f"{result['peak_kb']:>9.1f} {change:>8}"
+        )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del parseo de los scrapers")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="guarda la línea base")
+    parser.add_argument("--corpus", type=Path, help="corpus grabado con src.scrapers.replay")
+    parser.add_argument("-k", dest="pattern", help="sólo los benchmarks que contienen esto")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    benchmarks = build_benchmarks(PageCorpus.load(args.corpus))
+    if args.pattern:
+        benchmarks = [b for b in benchmarks if args.pattern in b.name]
+    current = measure(benchmarks, args.repeat)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    report(current, baseline)
+    if args.save:
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if baseline is None:
+        print("No baseline to compare with, run with --save")
+        return 0
+
+    regressions = compare(current, baseline, args.time_tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
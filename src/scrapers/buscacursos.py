@@ -19,11 +19,12 @@ asyncio.run(main())
 
 import itertools
 import re
-from typing import TYPE_CHECKING, List, Tuple
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
 import bs4
 
-from .utils import clean_text, gather_routines, run_parse_strategy, tag_to_int_value
+from ..config import config
+from .utils import clean_text, run_parse_strategy, tag_to_int_value
 
 if TYPE_CHECKING:
     from .types import ScrappedCourse
@@ -36,7 +37,11 @@ MISSING_CLASSROM_RE = re.compile(r"\(?Por Asignar\(?")
 
 
 def parse_schedule_row(row: bs4.element.Tag):
-    packed_data: List[str] = [r.text.strip() for r in row.find_all("td")]
+    return parse_schedule_cells([r.text.strip() for r in row.find_all("td")])
+
+
+def parse_schedule_cells(packed_data: List[str]):
+    "Módulos de una fila del horario, a partir del texto de sus celdas"
     module_schedule, module_type, classroom, *_ = packed_data
     days_raw, hours_raw = module_schedule.split(":")
 
@@ -65,7 +70,10 @@ NONPERSON_TEACHERS_RE = re.compile(r"(Dirección Docente)|(Por Fijar)")
 
 
 def parse_teachers(row_value_tag: bs4.element.Tag):
-    raw_info = row_value_tag.text.strip()
+    return parse_teachers_text(row_value_tag.text.strip())
+
+
+def parse_teachers_text(raw_info: str):
     if MISSING_TEACHERS_RE.match(raw_info):
         return []
     if NONPERSON_TEACHERS_RE.match(raw_info):
@@ -101,7 +109,7 @@ COLUMNS_STRATEGIES: "ParseStrategy" = {
 }
 
 
-async def parse_row(row: bs4.element.Tag):
+def parse_row(row: bs4.element.Tag):
     data = {}
     school_tag = row.find_previous_sibling(**ACADEMIC_UNIT_FINDER)
     if isinstance(school_tag, bs4.element.Tag):
@@ -112,20 +120,37 @@ async def parse_row(row: bs4.element.Tag):
 MATCH_RESULT_ROW = {"class": re.compile("resultados")}
 
 
+def parse_courses_page(body: bytes) -> List["ScrappedCourse"]:
+    "Cursos de una página de resultados de Buscacursos"
+    if config.scraper_parser == "lxml":
+        from .lxml_parser import (
+            parse_courses_page as parse_with_lxml,  # Evita import circular
+        )
+
+        return parse_with_lxml(body)
+
+    soup = bs4.BeautifulSoup(body, "lxml")
+    return [parse_row(row) for row in soup.find_all("tr", MATCH_RESULT_ROW)]
+
+
+async def fetch_courses_page(session: "Session", **params) -> bytes:
+    "Página de resultados sin parsear, usando los parámetros del URL"
+    async with session.get("/", params=params) as response:
+        return await response.read()
+
+
 async def get_courses_raw(session: "Session", **params) -> List["ScrappedCourse"]:
     "Obtiene los cursos utilizando, usando los parámetros del URL"
-    async with session.get("/", params=params) as response:
-        body = await response.read()
-        soup = bs4.BeautifulSoup(body, "lxml")
-        results = soup.find_all("tr", MATCH_RESULT_ROW)
-        if not results:
-            return []
-        return await gather_routines([parse_row(row) for row in results])
+    return parse_courses_page(await fetch_courses_page(session, **params))
+
+
+def courses_params(code: str, year: int, semester: int) -> Dict[str, str]:
+    return {"cxml_semestre": f"{year}-{semester}", "cxml_sigla": code}
 
 
 async def get_courses(code: "str", year: "int", semester: int, *, session: "Session"):
     "Obtiene los cursos por la sigla, año y semestre (TAV == 3)"
-    return await get_courses_raw(session, cxml_semestre=f"{year}-{semester}", cxml_sigla=code)
+    return await get_courses_raw(session, **courses_params(code, year, semester))
 
 
 async def get_available_terms(session: "Session"):
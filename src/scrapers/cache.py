@@ -0,0 +1,318 @@
+"""
+Cache HTTP de los scrapers
+--------------------------
+
+Cada sitio tiene su cache en un archivo SQLite de `.cache`, con:
+
+- Expiración por endpoint (`CachePolicy`): las vacantes de Buscacursos cambian
+  durante la toma de ramos, mientras que los programas de Catalogo casi nunca.
+  El TTL de cada política se puede cambiar con `scraper_cache_ttl` en la configuración.
+- Revalidación: si una respuesta expirada trae `ETag` o `Last-Modified`, se pide de
+  nuevo con `If-None-Match` / `If-Modified-Since` y un 304 renueva la copia guardada.
+- Cuerpos comprimidos con zlib y un tamaño máximo, descartando las respuestas
+  usadas hace más tiempo (LRU).
+- Estadísticas por ejecución (`CacheStats`): aciertos, bytes que no se descargaron
+  y bytes que ahorró la compresión.
+"""
+
+import pickle
+import sqlite3
+import time
+import warnings
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Any, Mapping, Optional, Sequence
+
+from aiohttp import ClientSession
+from aiohttp_client_cache.backends.sqlite import SQLiteBackend, SQLitePickleCache
+from aiohttp_client_cache.cache_control import CacheActions
+from aiohttp_client_cache.response import CachedResponse, set_response_defaults
+from aiohttp_client_cache.session import CachedSession
+
+from .governor import HostGovernor
+from .jobs import log
+from .replay import Recorder
+
+MINUTE = 60
+DAY = 24 * 60 * MINUTE
+NEVER = -1  # TTL de las respuestas que no expiran
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """TTL en segundos de las respuestas de un endpoint, que se reconoce por el método y
+    por los parámetros del URL (todos deben coincidir)"""
+
+    name: str
+    ttl: int
+    method: Optional[str] = None
+    params: Mapping[str, str] = field(default_factory=dict)
+
+    def matches(self, method: str, params: Optional[Mapping[str, Any]]) -> bool:
+        if self.method is not None and method.upper() != self.method:
+            return False
+        params = params or {}
+        return all(str(params.get(key)) == value for key, value in self.params.items())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0  # Respuestas expiradas que el servidor confirmó con un 304
+    stored: int = 0
+    evicted: int = 0
+    bytes_served: int = 0  # Cuerpos entregados desde el cache, sin descargarlos
+    bytes_downloaded: int = 0  # Cuerpos descargados (sin contar las revalidaciones)
+    bytes_raw: int = 0  # Tamaño de las respuestas guardadas, antes de comprimir
+    bytes_stored: int = 0  # Tamaño comprimido de las mismas respuestas
+
+    @property
+    def hit_ratio(self) -> float:
+        requests = self.hits + self.revalidated + self.misses
+        return (self.hits + self.revalidated) / requests if requests else 0
+
+    @property
+    def compression_saved(self) -> int:
+        return self.bytes_raw - self.bytes_stored
+
+    def as_dict(self) -> dict:
+        return asdict(self) | {
+            "hit_ratio": round(self.hit_ratio, 4),
+            "compression_saved": self.compression_saved,
+        }
+
+    def report(self, name: str) -> None:
+        log.info(
+            "HTTP cache %s: %.1f%% hits (%i hits, %i revalidated, %i misses), "
+            "%.1f MB served from cache, %.1f MB saved by compression, %i evicted",
+            name,
+            100 * self.hit_ratio,
+            self.hits,
+            self.revalidated,
+            self.misses,
+            self.bytes_served / 1e6,
+            self.compression_saved / 1e6,
+            self.evicted,
+        )
+
+
+class CompressedSQLiteCache(SQLitePickleCache):
+    """Respuestas comprimidas, que se descartan desde la usada hace más tiempo cuando el
+    archivo supera `max_bytes` (hasta bajar a `EVICT_TO` de ese tamaño)"""
+
+    EVICT_TO = 0.9
+
+    def __init__(self, filename: str, table_name: str, stats: CacheStats, max_bytes: int):
+        super().__init__(filename, table_name)
+        self.stats = stats
+        self.max_bytes = max_bytes
+        self._total: Optional[int] = None  # Bytes guardados, se consulta en la primera escritura
+
+    async def _init_db(self, db):
+        if not self._initialized:
+            await db.execute(
+                f"CREATE TABLE IF NOT EXISTS `{self.table_name}` "
+                "(key PRIMARY KEY, value BLOB, size INTEGER, used_at REAL)"
+            )
+            await db.execute(
+                f"CREATE INDEX IF NOT EXISTS `{self.table_name}_used_at` "
+                f"ON `{self.table_name}` (used_at)"
+            )
+        return await super()._init_db(db)
+
+    def serialize(self, item=None) -> Optional[bytes]:
+        raw = pickle.dumps(item)
+        compressed = zlib.compress(raw)
+        self.stats.bytes_raw += len(raw)
+        self.stats.bytes_stored += len(compressed)
+        return compressed
+
+    def deserialize(self, item):
+        if not isinstance(item, bytes):
+            return item
+        return pickle.loads(zlib.decompress(item))
+
+    async def read(self, key: str):
+        async with self.get_connection(autocommit=True) as db:
+            cursor = await db.execute(
+                f"SELECT value FROM `{self.table_name}` WHERE key = ?", (key,)
+            )
+            row = await cursor.fetchone()
+            if row is None:
+                return None
+            await db.execute(
+                f"UPDATE `{self.table_name}` SET used_at = ? WHERE key = ?", (time.time(), key)
+            )
+        try:
+            return self.deserialize(row[0])
+        except (zlib.error, pickle.PickleError, EOFError):
+            return None
+
+    async def write(self, key: str, item) -> None:
+        value = self.serialize(item)
+        async with self.get_connection(autocommit=True) as db:
+            if self._total is None:
+                cursor = await db.execute(f"SELECT COALESCE(SUM(size), 0) FROM `{self.table_name}`")
+                self._total = (await cursor.fetchone())[0]
+            cursor = await db.execute(f"SELECT size FROM `{self.table_name}` WHERE key = ?", (key,))
+            previous = await cursor.fetchone()
+            await db.execute(
+                f"INSERT OR REPLACE INTO `{self.table_name}` VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), time.time()),
+            )
+            self._total += len(value) - (previous[0] if previous else 0)
+            self.stats.stored += 1
+            if self._total > self.max_bytes:
+                await self._evict(db)
+
+    async def _evict(self, db) -> None:
+        "Borra las respuestas usadas hace más tiempo que no caben en `EVICT_TO * max_bytes`"
+        cursor = await db.execute(
+            f"SELECT key, size FROM `{self.table_name}` ORDER BY used_at DESC"
+        )
+        kept, evicted = 0, []
+        async for key, size in cursor:
+            if evicted or kept + size > self.EVICT_TO * self.max_bytes:
+                evicted.append((key,))
+            else:
+                kept += size
+        await db.executemany(f"DELETE FROM `{self.table_name}` WHERE key = ?", evicted)
+        self._total = kept
+        self.stats.evicted += len(evicted)
+
+    async def values(self):
+        for key in [key async for key in self.keys()]:
+            yield await self.read(key)
+
+    async def clear(self):
+        async with self.get_connection(autocommit=True) as db:
+            await db.execute(f"DELETE FROM `{self.table_name}`")
+        self._total = 0
+
+
+class ScraperCache(SQLiteBackend):
+    "Cache de un sitio, con TTL según `policies` (o `default_ttl` si ninguna coincide)"
+
+    def __init__(
+        self,
+        cache_name: str,
+        policies: Sequence[CachePolicy],
+        default_ttl: int = DAY,
+        max_bytes: int = 512 * 10**6,
+        ttl_overrides: Optional[Mapping[str, int]] = None,
+    ) -> None:
+        super().__init__(cache_name=cache_name, allowed_methods=("GET", "POST"))
+        self.stats = CacheStats()
+        self.responses = CompressedSQLiteCache(
+            self.responses.filename, "compressed_responses", self.stats, max_bytes
+        )
+        overrides = ttl_overrides or {}
+        self.policies = [
+            CachePolicy(p.name, overrides.get(p.name, p.ttl), p.method, p.params) for p in policies
+        ]
+        self.default_ttl = default_ttl
+
+    def ttl(self, method: str, params: Optional[Mapping[str, Any]] = None) -> int:
+        for policy in self.policies:
+            if policy.matches(method, params):
+                return policy.ttl
+        return self.default_ttl
+
+    async def lookup(self, method: str, url, refresh: bool = False, **kwargs):
+        """Respuesta vigente, acciones para guardar la nueva respuesta y, si expiró pero se
+        puede revalidar, la respuesta expirada. Con `refresh` no se lee el cache"""
+        key = self.create_key(method, url, **kwargs)
+        actions = CacheActions.from_request(
+            key,
+            url=url,
+            request_expire_after=self.ttl(method, kwargs.get("params")),
+            cache_control=self.cache_control,
+            **kwargs,
+        )
+        if actions.skip_read or self.disabled or refresh:
+            return None, actions, None
+
+        response = await self.responses.read(key)
+        if not isinstance(response, CachedResponse):
+            return None, actions, None
+        if not response.is_expired:
+            return response, actions, None
+        if "ETag" in response.headers or "Last-Modified" in response.headers:
+            return None, actions, response
+        await self.delete(key)
+        return None, actions, None
+
+    async def refresh(self, response: CachedResponse, actions: CacheActions) -> None:
+        "Renueva la expiración de una respuesta que el servidor confirmó con un 304"
+        response.expires = actions.expires
+        await self.responses.write(actions.key, response)
+
+
+# Igual que `CachedSession`, se ignora la advertencia de aiohttp por heredar de `ClientSession`
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+
+    class ScraperSession(CachedSession):
+        """Sesión que usa un `ScraperCache`, con revalidación y estadísticas. Las peticiones
+        que no están en cache pasan por el `governor` del sitio, si se indica. Con `refresh`
+        siempre se descarga la respuesta, y se guarda para las demás sesiones"""
+
+        cache: ScraperCache
+
+        def __init__(
+            self,
+            base_url=None,
+            *,
+            governor: Optional[HostGovernor] = None,
+            recorder: Optional[Recorder] = None,
+            refresh: bool = False,
+            **kwargs,
+        ):
+            super().__init__(base_url, **kwargs)
+            self.governor = governor
+            self.recorder = recorder
+            self.refresh = refresh
+
+        async def _request(self, method: str, str_or_url, **kwargs):
+            response = await self._cached_request(method, str_or_url, **kwargs)
+            if self.recorder is not None:
+                await self.recorder.record(response)
+            return response
+
+        async def _cached_request(self, method: str, str_or_url, **kwargs):
+            stats = self.cache.stats
+            response, actions, stale = await self.cache.lookup(
+                method, str_or_url, refresh=self.refresh, **kwargs
+            )
+            if response is not None:
+                stats.hits += 1
+                stats.bytes_served += len(response._body or b"")
+                return response
+
+            if stale is not None:
+                headers = dict(kwargs.pop("headers", None) or {})
+                if "ETag" in stale.headers:
+                    headers["If-None-Match"] = stale.headers["ETag"]
+                if "Last-Modified" in stale.headers:
+                    headers["If-Modified-Since"] = stale.headers["Last-Modified"]
+                kwargs["headers"] = headers
+
+            def send():
+                return ClientSession._request(self, method, str_or_url, **kwargs)
+
+            if self.governor is not None:
+                new_response = await self.governor.request(send)
+            else:
+                new_response = await send()
+            if stale is not None and new_response.status == 304:
+                new_response.release()
+                await self.cache.refresh(stale, actions)
+                stats.revalidated += 1
+                stats.bytes_served += len(stale._body or b"")
+                return stale
+
+            stats.misses += 1
+            stats.bytes_downloaded += len(new_response._body or b"")
+            await self.cache.save_response(new_response, actions)
+            return set_response_defaults(new_response)
@@ -19,12 +19,12 @@ asyncio.run(main())
 
 import html
 import re
-from typing import TYPE_CHECKING, Callable, Dict, Optional, Union
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional, Union
 
 import bs4
-from sympy import Symbol, symbols
-from sympy.logic.boolalg import And, Or, to_dnf
 
+from ..config import config
 from .utils import clean_text, gather_routines, run_parse_strategy, tag_to_int_value
 
 if TYPE_CHECKING:
@@ -36,7 +36,10 @@ DESCRIPTION_RE = re.compile(r"Descripción:\s*(.*)\s*$")
 
 
 def parse_description(value_node: "bs4.element.Tag") -> "Optional[str]":
-    text = value_node.get_text(separator=" ")
+    return parse_description_text(value_node.get_text(separator=" "))
+
+
+def parse_description_text(text: str) -> "Optional[str]":
     match = DESCRIPTION_RE.search(text)
     if match:
         return match.group(1).strip()
@@ -84,70 +87,112 @@ def find_text_by_table_key(soup: "bs4.BeautifulSoup", key: "str"):
     return None
 
 
-def get_formula(elements_list: list[str], req_dict: dict[str, Symbol]):
-    """Convierte una lista de componentes lógicos ['(', ')', '<sigla>', 'y', 'o']
-    en una BooleanFunction de Sympy (fórmula con semántica).
-    La función se llama recursivamente para cada grupo delimitado por paréntesis.
-    """
-    relation_func: Optional[Callable] = None
-    variables = []
-    while len(elements_list) != 0:
-        el = elements_list.pop(0)
-        if el == "":
-            continue
-        elif el == "(":
-            variables.append(get_formula(elements_list, req_dict))
-        elif el == ")":
-            if relation_func is not None:
-                return relation_func(*variables)
-            return variables[0]
-        elif el == "y":
-            relation_func = And
-        elif el == "o":
-            relation_func = Or
+def tokenize_requirements(requirements_text: str) -> list[str]:
+    "Lista de componentes lógicos: '(', ')', '<sigla>', 'y', 'o'"
+    tokens = requirements_text.replace("(c)", "c").replace("(", " ( ").replace(")", " ) ").split()
+    return tokens
+
+
+# Una fórmula es una sigla, o una tupla (operador, fórmulas) con operador "y" u "o"
+Formula = Union[str, tuple[str, tuple]]
+
+
+def parse_formula(tokens: list[str], position: int = 0) -> tuple[Formula, int]:
+    """Convierte los componentes lógicos en una fórmula, desde `position` hasta el
+    paréntesis que cierra el grupo (o el final). Retorna la fórmula y la posición
+    siguiente. Si un grupo mezcla "y" con "o", se usa el último operador del grupo."""
+    operator: Optional[str] = None
+    operands: list[Formula] = []
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+        if token == "(":
+            operand, position = parse_formula(tokens, position)
+            operands.append(operand)
+        elif token == ")":
+            break
+        elif token in ("y", "o"):
+            operator = token
         else:
-            variables.append(req_dict[el])
+            operands.append(token)
+
+    if operator is None or len(operands) == 1:
+        return operands[0], position
+    return (operator, tuple(operands)), position
 
-    if relation_func is not None:
-        return relation_func(*variables)
-    return variables[0]
 
+def _formula_key(formula: Formula):
+    "Identifica la fórmula sin importar el orden de los operandos"
+    if isinstance(formula, str):
+        return formula
+    operator, operands = formula
+    return operator, frozenset(_formula_key(operand) for operand in operands)
 
-def parse_requirements_groups(requirements_text: str):
+
+def simplify_formula(formula: Formula) -> Formula:
+    """Aplana los grupos anidados con el mismo operador y elimina los operandos repetidos,
+    como los constructores `And` y `Or` de sympy: "(A o B) y (B o A)" es "A o B" """
+    if isinstance(formula, str):
+        return formula
+
+    operator, operands = formula
+    unique: dict = {}
+    for operand in operands:
+        operand = simplify_formula(operand)
+        if isinstance(operand, str) or operand[0] != operator:
+            nested: tuple = (operand,)
+        else:
+            nested = operand[1]
+        for item in nested:
+            unique.setdefault(_formula_key(item), item)
+
+    if len(unique) == 1:
+        return next(iter(unique.values()))
+    return operator, tuple(unique.values())
+
+
+def to_dnf(formula: Formula) -> list[tuple[str, ...]]:
+    """Grupos de la fórmula en forma normal disyuntiva (sin grupos ni siglas repetidas),
+    en el orden en que aparecen en el texto"""
+    if isinstance(formula, str):
+        return [(formula,)]
+
+    operator, operands = formula
+    groups: dict[frozenset[str], tuple[str, ...]] = {}
+    if operator == "o":
+        for operand in operands:
+            for group in to_dnf(operand):
+                groups.setdefault(frozenset(group), group)
+    else:
+        partial: list[tuple[str, ...]] = [()]
+        for operand in operands:
+            operand_groups = to_dnf(operand)
+            partial = [
+                left + tuple(code for code in right if code not in left)
+                for left in partial
+                for right in operand_groups
+            ]
+        for group in partial:
+            groups.setdefault(frozenset(group), group)
+    return list(groups.values())
+
+
+@lru_cache(maxsize=4096)
+def _requirements_groups(requirements_text: str) -> tuple[tuple[str, ...], ...]:
+    if requirements_text == "No tiene":
+        return ()
+    formula, _ = parse_formula(tokenize_requirements(requirements_text))
+    return tuple(to_dnf(simplify_formula(formula)))
+
+
+def parse_requirements_groups(requirements_text: str) -> list[list[str]]:
     """Transforma los requisitos en una fórmula lógica,
     la convierte a DNF y retorna la lista de grupos DNF.
     Los requisitos tienen la forma "((A y B) o (A y C) o D(c)) y E"
     Co-requisitos se retornan con una 'c' al final de la sigla.
+    Muchos ramos comparten requisitos, por lo que los resultados se memorizan.
     """
-    requirements = []
-    if requirements_text != "No tiene":
-        # Primero se crea una lista con los componentes lógicos: '(', ')', '<sigla>', 'y', 'o'.
-        req_parts = (
-            requirements_text.replace("(c)", "c")
-            .replace("(", "#(#")
-            .replace(")", "#)#")
-            .replace(" ", "#")
-            .split("#")
-        )
-
-        req_list = [x for x in set(req_parts) if x not in ["", "y", "o", "(", ")"]]
-        syms = symbols(":" + str(len(req_list)))
-        req_dict = {}
-        for i, code in enumerate(req_list):
-            req_dict[code] = syms[i]
-
-        # Se convierte a una fórmula lógica (sympy BooleanFunction) y luego a DNF.
-        formula = to_dnf(get_formula(req_parts, req_dict))
-
-        # Se reemplazan las variables lógicas por las siglas.
-        for group_str in str(formula).split("|"):
-            group = []
-            group_syms = group_str.strip("( )").split(" & ")
-            for sym_name in group_syms:
-                group.append(req_list[int(sym_name)])
-            requirements.append(group)
-
-    return requirements
+    return [list(group) for group in _requirements_groups(requirements_text)]
 
 
 def parse_relationship(relationship_text: str):
@@ -163,42 +208,65 @@ def parse_restrictions(restrictions_text: str):
     return RESTRICTIONS_RE.findall(restrictions_text)
 
 
-async def get_additional_info(code: str, *, session: "Session"):
-    params = BASE_REQUIREMENTS_PARAMS | {"sigla": code}
-    async with session.get("/index.php", params=params) as response:
-        body = await response.read()
-    soup = bs4.BeautifulSoup(body, "lxml")
-    data = {}
-
-    # TODO: limpiar esto
-    requirements_text = find_text_by_table_key(soup, "Prerrequisitos")
+def requirements_from_texts(
+    requirements_text: Optional[str],
+    equivalencies_text: Optional[str],
+    relationship_text: Optional[str],
+    restrictions_text: Optional[str],
+) -> dict:
+    "Requisitos de un ramo, a partir del texto de cada campo de la página de requisitos"
+    data: dict = {}
     if requirements_text:
         data["prerequisites_raw"] = requirements_text
         data["requirements"] = parse_requirements_groups(requirements_text)
 
-    equivalencies_text = find_text_by_table_key(soup, "Equivalencias")
     if equivalencies_text:
         data["equivalencies_raw"] = equivalencies_text
         data["equivalencies"] = parse_requirements_groups(equivalencies_text)
 
-    relationship_text = find_text_by_table_key(soup, "Relación")
     if relationship_text:
         data["relationship"] = parse_relationship(relationship_text)
 
-    restrictions_text = find_text_by_table_key(soup, "Restricciones")
     if restrictions_text:
         data["restrictions"] = parse_restrictions(restrictions_text)
 
     return data
 
 
-SYLLABUS_BASE_PARAMS = {"view": "programa", "tmpl": "component"}
+def parse_additional_info_page(body: bytes) -> dict:
+    if config.scraper_parser == "lxml":
+        from .lxml_parser import parse_additional_info_page as parse_with_lxml
 
+        return parse_with_lxml(body)
 
-async def get_syllabus(code: str, *, session: "Session"):
-    params = SYLLABUS_BASE_PARAMS | {"sigla": code}
+    soup = bs4.BeautifulSoup(body, "lxml")
+    return requirements_from_texts(
+        find_text_by_table_key(soup, "Prerrequisitos"),
+        find_text_by_table_key(soup, "Equivalencias"),
+        find_text_by_table_key(soup, "Relación"),
+        find_text_by_table_key(soup, "Restricciones"),
+    )
+
+
+async def fetch_additional_info_page(code: str, *, session: "Session") -> bytes:
+    params = BASE_REQUIREMENTS_PARAMS | {"sigla": code}
     async with session.get("/index.php", params=params) as response:
-        body = await response.read()
+        return await response.read()
+
+
+async def get_additional_info(code: str, *, session: "Session"):
+    return parse_additional_info_page(await fetch_additional_info_page(code, session=session))
+
+
+SYLLABUS_BASE_PARAMS = {"view": "programa", "tmpl": "component"}
+
+
+def parse_syllabus_page(body: bytes) -> dict:
+    if config.scraper_parser == "lxml":
+        from .lxml_parser import parse_syllabus_page as parse_with_lxml
+
+        return parse_with_lxml(body)
+
     soup = bs4.BeautifulSoup(body, "lxml")
     syllabus = soup.select_one("div > pre")
     if syllabus:
@@ -206,27 +274,56 @@ async def get_syllabus(code: str, *, session: "Session"):
     return {}
 
 
-async def parse_row(row: "bs4.element.Tag", session: "Session", all_info: bool):
-    data = run_parse_strategy(COLUMNS_STRATEGIES, row.findChildren("td", recursive=False))
-    code = data.get("code")
-    if all_info and code is not None:
-        data |= await get_additional_info(code, session=session)
-        data |= await get_syllabus(code, session=session)
-    return data
+async def fetch_syllabus_page(code: str, *, session: "Session") -> bytes:
+    params = SYLLABUS_BASE_PARAMS | {"sigla": code}
+    async with session.get("/index.php", params=params) as response:
+        return await response.read()
 
 
-async def get_subjects(
-    code: str, *, session: "Session", all_subjects: bool = True, all_info: bool = True
-) -> "list[ScrappedSubject]":
-    "Obtiene los ramos por su sigla"
+async def get_syllabus(code: str, *, session: "Session"):
+    return parse_syllabus_page(await fetch_syllabus_page(code, session=session))
+
+
+def parse_row(row: "bs4.element.Tag"):
+    return run_parse_strategy(COLUMNS_STRATEGIES, row.findChildren("td", recursive=False))
+
+
+def parse_subjects_page(body: bytes) -> "list[ScrappedSubject]":
+    "Ramos de una página de resultados de Catalogo, sin requisitos ni programa"
+    if config.scraper_parser == "lxml":
+        from .lxml_parser import parse_subjects_page as parse_with_lxml
+
+        return parse_with_lxml(body)
+
+    soup = bs4.BeautifulSoup(body, "lxml")
+    return [parse_row(row) for row in soup.select("tbody > tr")]
+
+
+async def add_all_info(subject: "ScrappedSubject", session: "Session"):
+    code = subject.get("code")
+    if code is not None:
+        subject.update(await get_additional_info(code, session=session))
+        subject.update(await get_syllabus(code, session=session))
+    return subject
+
+
+async def fetch_subjects_page(code: str, *, session: "Session", all_subjects: bool = True) -> bytes:
+    "Página de resultados sin parsear"
     subject_params: Dict[str, Union[str, int]] = {
         "sigla": code,
         "vigencia": 2 * int(all_subjects),
     }
     params: Dict[str, Union[str, int]] = BASE_SUBJECT_PARAMS | subject_params
     async with session.post("/index.php", params=params) as response:
-        body = await response.read()
-    soup = bs4.BeautifulSoup(body, "lxml")
-    return await gather_routines(
-        [parse_row(row, session, all_info) for row in soup.select("tbody > tr")]
-    )
+        return await response.read()
+
+
+async def get_subjects(
+    code: str, *, session: "Session", all_subjects: bool = True, all_info: bool = True
+) -> "list[ScrappedSubject]":
+    "Obtiene los ramos por su sigla"
+    body = await fetch_subjects_page(code, session=session, all_subjects=all_subjects)
+    subjects = parse_subjects_page(body)
+    if all_info:
+        return await gather_routines([add_all_info(subject, session) for subject in subjects])
+    return subjects
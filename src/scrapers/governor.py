@@ -0,0 +1,196 @@
+"""
+Control de peticiones por sitio
+-------------------------------
+
+Cada sitio (Buscacursos, Catalogo) tiene un `HostGovernor` que decide cuándo se puede
+enviar cada petición:
+
+- `TokenBucket`: a lo más `rate` peticiones por segundo, con ráfagas de `burst`.
+- `AIMDLimiter`: peticiones simultáneas. Sube de a una cada vez que se completan
+  `limit` peticiones exitosas, y se reduce a la mitad si alguna falla (como el control
+  de congestión de TCP), por lo que se estabiliza en lo que tolera el sitio.
+- Reintentos con backoff exponencial y jitter para los errores de conexión, timeouts
+  y respuestas 429/5xx (respetando `Retry-After`). Si se agotan los reintentos se lanza
+  el error, y el job lo agrega a sus errores como antes.
+"""
+
+import asyncio
+import random
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass
+from time import monotonic
+from typing import Awaitable, Callable, Optional
+
+from aiohttp import ClientError, ClientResponse, ClientResponseError
+
+from ..config import config
+from .jobs import log
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    "A lo más `rate` peticiones por segundo, permitiendo ráfagas de `burst`"
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = monotonic()
+
+    async def acquire(self) -> None:
+        # Se reserva el token aunque quede negativo, y se espera hasta que se repone
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate) - 1
+        self.updated = now
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class AIMDLimiter:
+    """Límite de peticiones simultáneas entre `minimum` y `maximum`, con aumento aditivo
+    y disminución multiplicativa. Como en TCP, el límite se reduce una sola vez por las
+    fallas de peticiones que empezaron antes de la última reducción"""
+
+    def __init__(
+        self, initial: int, minimum: int = 1, maximum: int = 32, decrease: float = 0.5
+    ) -> None:
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self._decreased_at = float("-inf")
+        self._waiters: "deque[asyncio.Future]" = deque()
+
+    async def acquire(self) -> float:
+        "Espera un cupo y retorna cuándo se obtuvo, para entregarlo a `release`"
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with suppress(ValueError):
+                    self._waiters.remove(waiter)
+                self._wake()
+                raise
+        self.in_flight += 1
+        return monotonic()
+
+    def release(self, success: Optional[bool], started: float = float("inf")) -> None:
+        "Libera el cupo. `success = None` no cambia el límite (p. ej. si se canceló)"
+        self.in_flight -= 1
+        if success:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif success is not None and started > self._decreased_at:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._decreased_at = monotonic()
+        self._wake()
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+@dataclass
+class GovernorStats:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0  # Peticiones que fallaron tras agotar los reintentos
+
+    def as_dict(self) -> dict:
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+
+
+class HostGovernor:
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        concurrency: int,
+        max_concurrency: int,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+    ) -> None:
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AIMDLimiter(concurrency, maximum=max_concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = GovernorStats()
+
+    @classmethod
+    def from_config(cls) -> "HostGovernor":
+        return cls(
+            config.scraper_rate,
+            config.scraper_burst,
+            config.scraper_concurrency,
+            config.scraper_max_concurrency,
+            config.scraper_retries,
+            config.scraper_backoff,
+            config.scraper_max_backoff,
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        "Backoff exponencial con jitter completo, o lo que pida el sitio con `Retry-After`"
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    async def request(self, send: Callable[[], Awaitable[ClientResponse]]) -> ClientResponse:
+        """Envía la petición cuando lo permiten el límite de tasa y de concurrencia,
+        reintentando los errores transitorios. El cuerpo se lee antes de liberar el cupo"""
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            started = await self.limiter.acquire()
+            self.stats.requests += 1
+            success: Optional[bool] = None
+            retry_after: Optional[str] = None
+            try:
+                response = await send()
+                if response.status not in RETRY_STATUSES:
+                    await response.read()
+                    success = True
+                    return response
+                success = False
+                retry_after = response.headers.get("Retry-After")
+                response.release()
+                error: Exception = ClientResponseError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=response.reason or "",
+                    headers=response.headers,
+                )
+            except (ClientError, asyncio.TimeoutError) as e:
+                success = False
+                error = e
+            finally:
+                self.limiter.release(success, started)
+
+            if attempt >= self.retries:
+                self.stats.failures += 1
+                raise error
+            delay = self.delay(attempt, retry_after)
+            log.debug("Retrying in %.1fs after %r", delay, error)
+            self.stats.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def report(self, name: str) -> None:
+        log.info(
+            "Requests to %s: %i sent, %i retries, %i failed, concurrency settled at %.1f",
+            name,
+            self.stats.requests,
+            self.stats.retries,
+            self.stats.failures,
+            self.limiter.limit,
+        )
@@ -1,173 +1,122 @@
+from collections import Counter
+from dataclasses import dataclass
+from string import ascii_uppercase
 from typing import Dict, Optional, Set, Union
 
-from sqlmodel import Session, delete, select
-
-from ...db import (
-    Campus,
-    ClassSchedule,
-    Course,
-    CoursesTeachers,
-    DayEnum,
-    PeriodEnum,
-    Subject,
-    Teacher,
-    Term,
-)
+from sqlmodel import Session, func, select
+
+from ...db import Course, PeriodEnum, Subject, Term, bump_data_version
 from .. import request
-from ..buscacursos import get_courses
+from ..buscacursos import courses_params, fetch_courses_page, parse_courses_page
 from . import log
 from .catalogo import search_additional_info, search_catalogo_code
-from .code_iterator import CodeIterator
+from .code_iterator import crawl_codes
+from .identity import identities
+from .persistence import save_courses
+from .pipeline import Pipeline
+from .planner import PrefixPlanner
+from .report import report
 
 MAX_BC = 50
+BC_CONCURRENCY = 8  # Búsquedas simultáneas en Buscacursos
+PARSE_WORKERS = 2  # Procesos que parsean las páginas
+WRITE_QUEUE = 32  # Búsquedas que pueden esperar a ser escritas en la BD
+WRITE_BATCH = 8  # Búsquedas que se escriben en una misma transacción
 
 # Cache
 term_id: Union[int, None] = None
-courses_cache: Set[str] = set()
-campus_cache: Dict[str, Optional[int]] = {}
-subject_cache: Dict[str, Optional[int]] = {}
+courses_cache: Set[str] = set()  # Sections of this run already sent to the DB
 errors: Set[str] = set()
+sections: "Counter[str]" = Counter()  # Secciones nuevas, actualizadas y sin cambios
+
+
+def course_key(course) -> str:
+    return course["code"] + str(course["section"]) + str(term_id)
+
+
+async def get_subject_id(code: str, db_session: Session) -> Optional[int]:
+    "Get subject id from the identity map, searching it in Catalogo if missing"
+    if code not in identities.subjects:
+        async with request.catalogo() as catalogo_session:
+            await search_catalogo_code(code, db_session, catalogo_session)
+            await search_additional_info(code, db_session, catalogo_session)
+    return identities.subjects.get(code)
+
+
+@dataclass
+class CourseBatch:
+    "Cursos de una búsqueda, a escribir en la BD"
+
+    base_code: str
+    courses: list
+    subject_ids: Dict[str, int]
+
+
+def write_batches(db_session: Session, batches: "list[CourseBatch]") -> None:
+    "Escribe las búsquedas en una transacción, o de a una si alguna falla (en el hilo de la BD)"
+    try:
+        saved = save_courses(
+            db_session,
+            term_id,
+            [c for batch in batches for c in batch.courses],
+            {code: id for batch in batches for code, id in batch.subject_ids.items()},
+        )
+    except Exception:
+        if len(batches) > 1:
+            for batch in batches:
+                write_batches(db_session, [batch])
+            return
+        log.error("Cannot save search %s", batches[0].base_code, exc_info=True)
+        errors.add(batches[0].base_code)
+        # So they are sent again when the search is retried
+        courses_cache.difference_update(course_key(c) for c in batches[0].courses)
+    else:
+        sections.update(new=saved.new, updated=saved.updated, unchanged=saved.unchanged)
 
 
 async def search_bc_code(
-    base_code: str, year: int, semester: int, db_session: Session, bc_session
+    base_code: str,
+    year: int,
+    semester: int,
+    db_session: Session,
+    bc_session,
+    pipeline: "Pipeline[CourseBatch]",
 ) -> int:
-    "Search code in Buscacursos and save courses to DB"
+    "Search code in Buscacursos and queue its courses to be saved to DB (in one batch)"
     log.info("Searching %s in Buscacursos", base_code)
-    global term_id
 
     try:
-        courses = await get_courses(base_code, year, semester, session=bc_session)
-        for c in courses:
-            # Check cache
-            course_section_term = c["code"] + str(c["section"]) + str(term_id)
-            if course_section_term in courses_cache:
-                continue
-
+        params = courses_params(base_code, year, semester)
+        body = await pipeline.fetch(fetch_courses_page(bc_session, **params))
+        courses = await pipeline.parse(parse_courses_page, body)
+
+        # Check cache
+        new_courses = [c for c in courses if course_key(c) not in courses_cache]
+
+        # Set Subjects
+        subject_ids: Dict[str, int] = {}
+        for code in {c["code"] for c in new_courses}:
+            subject_id = await get_subject_id(code, db_session)
+            if subject_id is None:
+                log.error("Cannot find subject %s", code)
+                errors.add(code)
+            else:
+                subject_ids[code] = subject_id
+
+        # Prefixes overlap (a parent and its children return the same sections), so each
+        # section is sent once per run. Checked again after the awaits of other searches
+        batch = [
+            c
+            for c in new_courses
+            if c["code"] in subject_ids and course_key(c) not in courses_cache
+        ]
+        courses_cache.update(course_key(c) for c in batch)
+        for c in batch:
             log.info("Found %s-%i", c["code"], c["section"])
-            try:
-                # Get or create instance
-                course_query = (
-                    select(Course)
-                    .join(Subject)
-                    .where(
-                        Course.section == c["section"],
-                        Course.term_id == term_id,
-                        Subject.code == c["code"],
-                        Course.subject_id == Subject.id,
-                    )
-                )
-                course: Course = db_session.exec(course_query).one_or_none()
-                if not course:
-                    course = Course()
-
-                # Set Subject
-                subject_id: Optional[int] = subject_cache.get(c["code"])
-                if not subject_id:
-                    subject_query = select(Subject).where(Subject.code == c["code"])
-                    subject = db_session.exec(subject_query).one_or_none()
-                    if not subject:
-                        async with request.catalogo() as catalogo_session:
-                            await search_catalogo_code(c["code"], db_session, catalogo_session)
-                            await search_additional_info(c["code"], db_session, catalogo_session)
-                        subject = db_session.exec(subject_query).one_or_none()
-                    subject_id = subject.id
-                    subject_cache[c["code"]] = subject_id
-                course.subject_id = subject_id
-
-                # Fill data
-                course.term_id = term_id
-                course.nrc = c["ncr"]
-                course.section = c["section"]
-                course.format = c["format"]
-                course.category = c["category"]
-                course.is_removable = c["allows_withdraw"]
-                course.is_english = c["is_in_english"]
-                course.total_quota = c["total_vacancy"]
-                course.fg_area = c["fg_area"]
-                course.need_special_aproval = c["requires_special_approval"]
-                course.available_quota = c["available_vacancy"]
-
-                # Set Campus
-                campus_id = campus_cache.get(c["campus"])
-                if not campus_id:
-                    campus_query = select(Campus).where(Campus.name == c["campus"])
-                    campus = db_session.exec(campus_query).one_or_none()
-                    if not campus:
-                        campus = Campus(name=c["campus"])
-                        try:
-                            db_session.add(campus)
-                            db_session.commit()
-                        except Exception:
-                            log.error("Cannot save campus: %s", c["campus"], exc_info=True)
-                            errors.add(c["code"])
-                            db_session.rollback()
-                            continue
-                        else:
-                            campus_cache[c["campus"]] = campus_id
-
-                    campus_id = campus.id
-                course.campus_id = campus_id
-
-                # Set Teachers
-                if course.id is not None:
-                    db_session.exec(
-                        delete(CoursesTeachers).where(CoursesTeachers.course_id == course.id)
-                    )
-                teachers = []
-                for teacher_name in c["teachers"]:
-                    teacher = db_session.exec(
-                        select(Teacher).where(Teacher.name == teacher_name)
-                    ).one_or_none()
-                    if not teacher:
-                        teacher = Teacher(name=teacher_name)
-                        try:
-                            db_session.add(teacher)
-                            db_session.commit()
-                        except Exception:
-                            log.error("Cannot save teacher: %s", teacher_name, exc_info=True)
-                            errors.add(c["code"])
-                            db_session.rollback()
-                            continue
-
-                        teachers.append(teacher)
-                course.teachers = teachers
-
-                # Set schedule if changed (or new)
-                if course.schedule_summary != str(c["schedule"]):
-                    course.schedule_summary = str(c["schedule"])
-
-                    if course.id is not None:
-                        db_session.exec(
-                            delete(ClassSchedule).where(ClassSchedule.course_id == course.id)
-                        )
-
-                    schedule_list = []
-                    for schedule_part_data in c["schedule"]:
-                        day, module = schedule_part_data["module"]
-                        schedule_part = ClassSchedule(
-                            day=DayEnum(day),
-                            module=int(module),
-                            classroom=schedule_part_data["classroom"],
-                            type=schedule_part_data["type"],
-                        )
-                        schedule_list.append(schedule_part)
-                    course.schedule = schedule_list
-
-                # Save to DB and cache
-                try:
-                    db_session.add(course)
-                    db_session.commit()
-                except Exception:
-                    log.error("Cannot save %s-%i", c["code"], c["section"], exc_info=True)
-                    errors.add(c["code"])
-                    db_session.rollback()
-                else:
-                    courses_cache.add(course_section_term)
-
-            except Exception:
-                log.error("Cannot process %s-%i", c["code"], c["section"], exc_info=True)
-                errors.add(c["code"])
+
+        # Save to DB, in the DB thread
+        if batch:
+            await pipeline.submit(CourseBatch(base_code, batch, subject_ids))
 
         return len(courses)
 
@@ -177,31 +126,90 @@ async def search_bc_code(
         return 0
 
 
-async def get_full_buscacursos(db_session: Session, year: int, semester: int) -> None:
-    # Set term
-    period = PeriodEnum.from_int(semester)
-    term_query = select(Term).where(Term.year == year, Term.period == period)
-    term = db_session.exec(term_query).one_or_none()
-    if not term:
-        term = Term(year=year, period=period)
-        db_session.add(term)
-        db_session.commit()
-    global term_id
-    term_id = term.id
-
-    # Search all
-    async with request.buscacursos() as bc_session:
-        code_generator = CodeIterator()
-        for code in code_generator:
-            if await search_bc_code(code, year, semester, db_session, bc_session) >= MAX_BC:
-                code_generator.add_depth()
-
-    # Retry errors with new session
-    async with request.buscacursos() as bc_session:
-        initial_errors: Set[str] = errors.copy()
-        errors.clear()
-        for code in initial_errors:
-            await search_bc_code(code, year, semester, db_session, bc_session)
+def get_known_sections(db_session: Session) -> list[str]:
+    "Sigla de cada sección del último semestre con cursos, para planificar los prefijos"
+    last_term_id = db_session.exec(select(func.max(Course.term_id))).one()
+    if last_term_id is None:
+        return []
+    return list(
+        db_session.exec(select(Subject.code).join(Course).where(Course.term_id == last_term_id))
+    )
+
+
+async def get_full_buscacursos(
+    db_session: Session,
+    year: int,
+    semester: int,
+    concurrency: int = BC_CONCURRENCY,
+    discovery: bool = False,
+) -> None:
+    """Busca y guarda todos los cursos del semestre. Los prefijos se planifican desde las
+    secciones ya guardadas, salvo con `discovery` o si la BD no tiene cursos"""
+    with report.phase("plan"):
+        # Set term
+        period = PeriodEnum.from_int(semester)
+        term_query = select(Term).where(Term.year == year, Term.period == period)
+        term = db_session.exec(term_query).one_or_none()
+        if not term:
+            term = Term(year=year, period=period)
+            db_session.add(term)
+            db_session.commit()
+        global term_id
+        term_id = term.id
+        identities.load(db_session)
+        courses_cache.clear()
+        sections.clear()
+
+        planner = PrefixPlanner("buscacursos", MAX_BC)
+        known_sections = [] if discovery else get_known_sections(db_session)
+        seeds = planner.plan(known_sections) if known_sections else list(ascii_uppercase)
+        log.info("Searching from %i prefixes", len(seeds))
+
+    pipeline: "Pipeline[CourseBatch]" = Pipeline(
+        db_session.get_bind(), write_batches, PARSE_WORKERS, WRITE_QUEUE, WRITE_BATCH
+    )
+    async with pipeline:
+        # Search all
+        async with request.buscacursos() as bc_session:
+
+            async def search(code: str) -> int:
+                results = await search_bc_code(
+                    code, year, semester, db_session, bc_session, pipeline
+                )
+                planner.record(code, results)
+                return results
+
+            with report.phase("crawl"):
+                saturated = await crawl_codes(search, MAX_BC, concurrency, seeds, report.progress)
+                await pipeline.drain()
+
+        # Retry errors with new session, expanding the prefixes that reach the maximum
+        with report.phase("retry"):
+            async with request.buscacursos() as bc_session:
+                initial_errors: Set[str] = errors.copy()
+                errors.clear()
+                saturated |= await crawl_codes(
+                    search, MAX_BC, concurrency, initial_errors, report.progress
+                )
+    report.add_stages(pipeline.stats)
 
     if len(errors) != 0:
         log.error("Errors %s", ", ".join(errors))
+    report.add_failed("buscacursos", errors)
+    report.add_failed("buscacursos_saturated", saturated)
+    planner.save(failed=errors)
+    report.count_rows(
+        "courses",
+        inserted=sections["new"],
+        updated=sections["updated"],
+        unchanged=sections["unchanged"],
+    )
+
+    log.info(
+        "Sections: %i new, %i updated, %i unchanged",
+        sections["new"],
+        sections["updated"],
+        sections["unchanged"],
+    )
+    if sections["new"] or sections["updated"]:
+        bump_data_version(db_session)
@@ -1,86 +1,115 @@
-from typing import Optional
+import asyncio
+from string import ascii_uppercase
+from typing import Awaitable, Callable, Optional
 
-from sqlmodel import Session, delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, delete, func, update
 
-from ...db import School, Subject, SubjectEquivalencies, SubjectPrerequisites
+from ...db import Subject, SubjectEquivalencies, SubjectPrerequisites, bump_data_version
 from .. import request
-from ..catalogo import get_additional_info, get_subjects, get_syllabus
+from ..catalogo import (
+    fetch_additional_info_page,
+    fetch_subjects_page,
+    fetch_syllabus_page,
+    parse_additional_info_page,
+    parse_subjects_page,
+    parse_syllabus_page,
+)
 from ..description import get_description
+from ..utils import gather_bounded
 from . import log
-from .code_iterator import CodeIterator
+from .code_iterator import crawl_codes
+from .identity import identities
+from .pipeline import Pipeline
+from .planner import PrefixPlanner
+from .report import report
 
 # Cache
-schools_cache: dict[str, Optional[int]] = {}
 subjects_cache: set[str] = set()
 errors: set[str] = set()
+info_errors: set[str] = set()
 
 MAX_CATALOGO = 1000
 
-
-async def search_catalogo_code(base_code: str, db_session: Session, catalogo_session) -> int:
-    "Search code in Catalogo and save subjects to DB"
+# Búsquedas simultáneas en Catalogo por fase
+DISCOVERY_CONCURRENCY = 8
+INFO_CONCURRENCY = 16
+RETRY_CONCURRENCY = 4
+PARSE_WORKERS = 2  # Procesos que parsean las páginas
+
+
+async def fetch_and_parse(
+    pipeline: Optional[Pipeline], fetch: Callable[..., Awaitable[bytes]], parse, code: str, session
+):
+    "Descarga y parsea una página, en las etapas de `pipeline` si se indica"
+    if pipeline is None:
+        return parse(await fetch(code, session=session))
+    return await pipeline.parse(parse, await pipeline.fetch(fetch(code, session=session)))
+
+
+async def search_catalogo_code(
+    base_code: str,
+    db_session: Session,
+    catalogo_session,
+    on_found: Optional[Callable[[str], None]] = None,
+    pipeline: Optional[Pipeline] = None,
+) -> int:
+    """Search code in Catalogo and save subjects to DB (in one batch).
+    `on_found` is called with the code of each newly saved subject"""
     log.info("Searching %s in Catalogo", base_code)
 
     try:
-        subjects = await get_subjects(
-            base_code, session=catalogo_session, all_subjects=True, all_info=False
+        subjects = await fetch_and_parse(
+            pipeline, fetch_subjects_page, parse_subjects_page, base_code, catalogo_session
         )
-        for s in subjects:
-            if s["code"] in subjects_cache:
-                continue
 
+        # Check cache
+        new_subjects = {s["code"]: s for s in subjects if s["code"] not in subjects_cache}
+        if not new_subjects:
+            return len(subjects)
+
+        for s in new_subjects.values():
             log.info("Found %s: %s", s["code"], s["name"])
-            try:
-                # Get or create instance
-                subject_query = select(Subject).where(Subject.code == s["code"])
-                subject: Subject = db_session.exec(subject_query).one_or_none()
-                if not subject:
-                    subject = Subject()
-
-                # Fill data
-                subject.name = s["name"]
-                subject.code = s["code"]
-                subject.credits = s["credits"]
-                subject.academic_level = s["level"]
-                subject.description = s.get("description")
-                subject.is_active = s["is_active"]
-
-                # Check school (use cache)
-                school_id: Optional[int] = schools_cache.get(s["school_name"])
-                if not school_id:
-                    school_query = select(School).where(School.name == s["school_name"])
-                    school = db_session.exec(school_query).one_or_none()
-                    if not school:
-                        school = School(name=s["school_name"])
-                        db_session.add(school)
-                        try:
-                            db_session.add(school)
-                            db_session.commit()
-                        except Exception:
-                            log.error("Cannot save school: %s", s["school_name"], exc_info=True)
-                            errors.add(s["code"])
-                            db_session.rollback()
-                            continue
-                        else:
-                            schools_cache[s["school_name"]] = school_id
-
-                    school_id = school.id
-                subject.school_id = school_id
-
-                # Save to DB and cache
-                try:
-                    db_session.add(subject)
-                    db_session.commit()
-                except Exception:
-                    log.error("Cannot save %s", s["code"], exc_info=True)
-                    errors.add(s["code"])
-                    db_session.rollback()
-                else:
-                    subjects_cache.add(s["code"])
-
-            except Exception:
-                log.error("Cannot process %s", s["code"], exc_info=True)
-                errors.add(s["code"])
+
+        # Save to DB and cache
+        try:
+            school_ids = identities.schools.ensure(
+                db_session, (s["school_name"] for s in new_subjects.values())
+            )
+            subject_rows = [
+                {
+                    "code": s["code"],
+                    "name": s["name"],
+                    "credits": s["credits"],
+                    "academic_level": s["level"],
+                    "description": s.get("description"),
+                    "is_active": s["is_active"],
+                    "school_id": school_ids[s["school_name"]],
+                }
+                for s in new_subjects.values()
+            ]
+            inserted = sum(1 for code in new_subjects if code not in identities.subjects)
+            stmt = insert(Subject).values(subject_rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["code"],
+                set_={name: stmt.excluded[name] for name in subject_rows[0] if name != "code"},
+            ).returning(Subject.id, Subject.code)
+            for subject_id, code in db_session.exec(stmt):
+                identities.subjects.add(code, subject_id)
+            db_session.commit()
+            identities.commit(identities.schools, identities.subjects)
+            # Los ramos que ya existían se reescriben sin comparar, puede que sin cambios
+            report.count_rows("subjects", inserted=inserted, upserted=len(new_subjects) - inserted)
+        except Exception:
+            log.error("Cannot save search %s", base_code, exc_info=True)
+            errors.add(base_code)
+            db_session.rollback()
+            identities.rollback(identities.schools, identities.subjects)
+        else:
+            subjects_cache.update(new_subjects)
+            if on_found is not None:
+                for code in new_subjects:
+                    on_found(code)
 
         return len(subjects)
 
@@ -90,121 +119,193 @@ async def search_catalogo_code(base_code: str, db_session: Session, catalogo_ses
         return 0
 
 
-async def search_additional_info(code: str, db_session: Session, catalogo_session) -> None:
+def get_required_subject_id(code: str) -> int:
+    "Id of a requirement or equivalency, that must be already discovered"
+    subject_id = identities.subjects.get(code)
+    if subject_id is None:
+        raise LookupError(f"Subject {code} not found in DB")
+    return subject_id
+
+
+async def search_additional_info(
+    code: str, db_session: Session, catalogo_session, pipeline: Optional[Pipeline] = None
+) -> None:
     "Search code requirements and syllabus in Catalogo and save to DB"
     log.info("Searching %s in Catalogo", code)
 
     try:
-        data = await get_additional_info(code, session=catalogo_session)
-        syllabus = (await get_syllabus(code, session=catalogo_session)).get("syllabus")
-
-        subject: Subject = db_session.exec(
-            select(Subject).where(Subject.code == code)
-        ).one_or_none()
-        if not subject:
-            errors.add(code)
+        data = await fetch_and_parse(
+            pipeline, fetch_additional_info_page, parse_additional_info_page, code, catalogo_session
+        )
+        syllabus = (
+            await fetch_and_parse(
+                pipeline, fetch_syllabus_page, parse_syllabus_page, code, catalogo_session
+            )
+        ).get("syllabus")
+
+        subject_id = identities.subjects.get(code)
+        if subject_id is None:
+            info_errors.add(code)
             log.error("Discovered %s not found in DB", code)
             return
 
-        subject.syllabus = syllabus
-        if subject.description is None:
-            subject.description = get_description(syllabus)
-
-        subject.need_all_requirements = data.get("relationship")
-        subject.restrictions = ",".join(["=".join(r) for r in data.get("restrictions", [])])
-        subject.prerequisites_raw = data.get("prerequisites_raw")
-        subject.equivalencies_raw = data.get("equivalencies_raw")
-
         try:
+            db_session.exec(
+                update(Subject)
+                .where(Subject.id == subject_id)
+                .values(
+                    syllabus=syllabus,
+                    description=func.coalesce(Subject.description, get_description(syllabus)),
+                    need_all_requirements=data.get("relationship"),
+                    restrictions=",".join(["=".join(r) for r in data.get("restrictions", [])]),
+                    prerequisites_raw=data.get("prerequisites_raw"),
+                    equivalencies_raw=data.get("equivalencies_raw"),
+                )
+            )
+
             # Set equivalencies
             db_session.exec(
-                delete(SubjectEquivalencies).where(SubjectEquivalencies.subject_id == subject.id)
+                delete(SubjectEquivalencies).where(SubjectEquivalencies.subject_id == subject_id)
             )
-            req_subject_id: Subject
-            if "equivalencies" in data:
-                for i, group in enumerate(data["equivalencies"]):
-                    for req_code in group:
-                        req_subject_id = (
-                            db_session.exec(select(Subject).where(Subject.code == req_code))
-                            .one_or_none()
-                            .id
-                        )
-                        db_session.add(
-                            SubjectEquivalencies(
-                                subject_id=subject.id, equivalence_id=req_subject_id, group=i
-                            )
-                        )
+            equivalency_rows = [
+                {
+                    "subject_id": subject_id,
+                    "equivalence_id": get_required_subject_id(req_code),
+                    "group": i,
+                }
+                for i, group in enumerate(data.get("equivalencies", []))
+                for req_code in group
+            ]
+            if equivalency_rows:
+                db_session.exec(
+                    insert(SubjectEquivalencies).values(equivalency_rows).on_conflict_do_nothing()
+                )
 
             # Set prerequisites
             db_session.exec(
-                delete(SubjectPrerequisites).where(SubjectPrerequisites.subject_id == subject.id)
+                delete(SubjectPrerequisites).where(SubjectPrerequisites.subject_id == subject_id)
             )
-            if "requirements" in data:
-                for i, group in enumerate(data["requirements"]):
-                    for req_code in group:
-                        # Los co-requisitos están marcados con una 'c' final.
-                        is_corequisite = False
-                        if req_code[-1] == "c":
-                            is_corequisite = True
-                            req_code = req_code.strip("c")
-
-                        req_subject_id = (
-                            db_session.exec(select(Subject).where(Subject.code == req_code))
-                            .one_or_none()
-                            .id
-                        )
-                        db_session.add(
-                            SubjectPrerequisites(
-                                subject_id=subject.id,
-                                prerequisite_id=req_subject_id,
-                                group=i,
-                                is_corequisite=is_corequisite,
-                            )
-                        )
-
-            db_session.add(subject)
+            prerequisite_rows = []
+            for i, group in enumerate(data.get("requirements", [])):
+                for req_code in group:
+                    # Los co-requisitos están marcados con una 'c' final.
+                    is_corequisite = False
+                    if req_code[-1] == "c":
+                        is_corequisite = True
+                        req_code = req_code.strip("c")
+
+                    prerequisite_rows.append(
+                        {
+                            "subject_id": subject_id,
+                            "prerequisite_id": get_required_subject_id(req_code),
+                            "group": i,
+                            "is_corequisite": is_corequisite,
+                        }
+                    )
+            if prerequisite_rows:
+                db_session.exec(
+                    insert(SubjectPrerequisites).values(prerequisite_rows).on_conflict_do_nothing()
+                )
+
             db_session.commit()
+            report.count_rows("subject_info", upserted=1)
         except Exception:
             log.error("Cannot save %s", code, exc_info=True)
-            errors.add(code)
+            info_errors.add(code)
             db_session.rollback()
 
     except Exception:
         log.error("Cannot get requirements and syllabus for %s", code, exc_info=True)
-        errors.add(code)
-
-
-async def get_full_catalogo(db_session: Session) -> None:
-    # Search all
-    async with request.catalogo() as catalogo_session:
-        code_generator = CodeIterator()
-        for code in code_generator:
-            if await search_catalogo_code(code, db_session, catalogo_session) >= MAX_CATALOGO:
-                code_generator.add_depth()
-
-    # Retry errors with new session
-    initial_errors: set[str]
-    async with request.catalogo() as catalogo_session:
-        initial_errors = errors.copy()
-        errors.clear()
-        for code in initial_errors:
-            await search_catalogo_code(code, db_session, catalogo_session)
-
-    if len(errors) != 0:
-        log.error("Discover errors %s", ", ".join(errors))
-        errors.clear()
-
-    # Get requirements and syllabus for discovered subjects
-    async with request.catalogo() as catalogo_session:
-        for code in subjects_cache:
-            await search_additional_info(code, db_session, catalogo_session)
-
-    # Retry errors with new session
-    async with request.catalogo() as catalogo_session:
-        initial_errors = errors.copy()
-        errors.clear()
-        for code in initial_errors:
-            await search_additional_info(code, db_session, catalogo_session)
-
-    if len(errors) != 0:
-        log.error("Requirements and syllabus errors %s", ", ".join(errors))
+        info_errors.add(code)
+
+
+async def get_full_catalogo(
+    db_session: Session,
+    discovery_concurrency: int = DISCOVERY_CONCURRENCY,
+    info_concurrency: int = INFO_CONCURRENCY,
+    retry_concurrency: int = RETRY_CONCURRENCY,
+    discovery: bool = False,
+) -> None:
+    """Busca y guarda todos los ramos. Los prefijos se planifican desde los ramos ya
+    guardados, salvo con `discovery` o si la BD no tiene ramos"""
+    with report.phase("plan"):
+        identities.load(db_session)
+        planner = PrefixPlanner("catalogo", MAX_CATALOGO)
+        known_codes = [] if discovery else list(identities.subjects.ids)
+        seeds = planner.plan(known_codes) if known_codes else list(ascii_uppercase)
+        log.info("Searching from %i prefixes", len(seeds))
+
+    # Las páginas se parsean en otros procesos. Los ramos se guardan en el event loop,
+    # ya que los requisitos necesitan los ids de los ramos recién descubiertos
+    async with Pipeline(db_session.get_bind(), parse_workers=PARSE_WORKERS) as pipeline:
+        async with request.catalogo() as catalogo_session:
+            # Requirements and syllabus are fetched while discovery is still running
+            info_queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+            def queue_info(code: str) -> None:
+                info_queue.put_nowait(code)
+                report.progress.add("info")
+
+            for code in subjects_cache:
+                queue_info(code)
+
+            async def info_worker():
+                while (code := await info_queue.get()) is not None:
+                    await search_additional_info(code, db_session, catalogo_session, pipeline)
+                    report.progress.advance("info")
+
+            info_workers = [asyncio.create_task(info_worker()) for _ in range(info_concurrency)]
+
+            # Search all
+            async def search(code: str) -> int:
+                results = await search_catalogo_code(
+                    code, db_session, catalogo_session, queue_info, pipeline
+                )
+                planner.record(code, results)
+                return results
+
+            with report.phase("discovery"):
+                saturated = await crawl_codes(
+                    search, MAX_CATALOGO, discovery_concurrency, seeds, report.progress
+                )
+
+                # Retry errors, expanding the prefixes that reach the maximum
+                initial_errors = errors.copy()
+                errors.clear()
+                saturated |= await crawl_codes(
+                    search, MAX_CATALOGO, retry_concurrency, initial_errors, report.progress
+                )
+
+            planner.save(failed=errors)
+            report.add_failed("catalogo", errors)
+            report.add_failed("catalogo_saturated", saturated)
+            if len(errors) != 0:
+                log.error("Discover errors %s", ", ".join(errors))
+                errors.clear()
+
+            # Wait for requirements and syllabus of every discovered subject
+            with report.phase("info"):
+                for _ in info_workers:
+                    info_queue.put_nowait(None)
+                await asyncio.gather(*info_workers)
+
+        # Retry errors with new session. Requirements of subjects that were not
+        # discovered yet when their info was fetched are saved here.
+        with report.phase("info_retry"):
+            async with request.catalogo() as catalogo_session:
+                initial_errors = info_errors.copy()
+                info_errors.clear()
+                await gather_bounded(
+                    [
+                        search_additional_info(code, db_session, catalogo_session, pipeline)
+                        for code in initial_errors
+                    ],
+                    retry_concurrency,
+                )
+    report.add_stages(pipeline.stats)
+
+    if len(info_errors) != 0:
+        log.error("Requirements and syllabus errors %s", ", ".join(info_errors))
+    report.add_failed("catalogo_info", info_errors)
+
+    bump_data_version(db_session)
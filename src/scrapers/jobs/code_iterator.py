@@ -1,4 +1,32 @@
+import asyncio
 from string import ascii_uppercase, digits
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterable, Optional, Set
+
+from . import log
+
+if TYPE_CHECKING:
+    from .report import Progress
+
+
+MAX_EXPAND_DEPTH = 6  # Largo máximo de un prefijo que se puede profundizar
+
+
+def code_alphabet(depth: int) -> str:
+    "Caracteres con los que se extiende un prefijo de largo `depth`"
+    if depth <= 2:
+        return ascii_uppercase
+    elif depth <= MAX_EXPAND_DEPTH:
+        return digits
+    raise ValueError(f"Cannot add depth to a prefix of length {depth}")
+
+
+def can_expand(code: str) -> bool:
+    return len(code) <= MAX_EXPAND_DEPTH
+
+
+def expand_code(code: str) -> list[str]:
+    "Prefijos hijos de `code`, siguiendo el mismo orden que `CodeIterator.add_depth`"
+    return [code + char for char in code_alphabet(len(code))]
 
 
 class CodeIterator:
@@ -20,10 +48,60 @@ class CodeIterator:
         raise StopIteration
 
     def add_depth(self):
-        if len(self.stack) <= 2:
-            self.stack.append(iter(ascii_uppercase))
-        elif len(self.stack) <= 6:
-            self.stack.append(iter(digits))
-        else:
-            raise Exception
+        self.stack.append(iter(code_alphabet(len(self.stack))))
         self.values.append(None)
+
+
+async def crawl_codes(
+    search: Callable[[str], Awaitable[int]],
+    max_results: int,
+    concurrency: int,
+    seeds: Iterable[str] = ascii_uppercase,
+    progress: Optional["Progress"] = None,
+) -> Set[str]:
+    """Recorre los mismos prefijos que `CodeIterator`, pero con `concurrency` búsquedas en
+    paralelo. Cada prefijo con `max_results` o más resultados agrega sus propios hijos a la
+    cola, por lo que no se comparte un iterador entre búsquedas.
+    Se puede partir desde otros prefijos `seeds` (ver `PrefixPlanner`).
+    Los prefijos en cola y terminados se anotan en `progress`, si se indica.
+    Retorna los prefijos que llegaron a `max_results` sin poder profundizarse, cuyos
+    resultados pueden estar incompletos."""
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    saturated: Set[str] = set()
+
+    def put(code: str) -> None:
+        queue.put_nowait(code)
+        if progress is not None:
+            progress.add("prefixes")
+
+    for seed in seeds:
+        put(seed)
+
+    async def worker():
+        while True:
+            code = await queue.get()
+            try:
+                results = await search(code)
+                if results >= max_results and can_expand(code):
+                    for child in expand_code(code):
+                        put(child)
+                elif results >= max_results:
+                    log.error(
+                        "Prefix %s reaches %i results at the maximum depth", code, max_results
+                    )
+                    saturated.add(code)
+            except Exception:
+                log.error("Cannot crawl prefix %s", code, exc_info=True)
+            finally:
+                queue.task_done()
+                if progress is not None:
+                    progress.advance("prefixes")
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(concurrency, 1))]
+    try:
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    return saturated
@@ -0,0 +1,110 @@
+"""
+Mapas de identidad de los jobs
+------------------------------
+
+Guardan el id de cada fila identificada por un valor único (sigla o nombre).
+Se cargan con una consulta por tabla al inicio de cada job, y las filas nuevas
+se crean por lotes, por lo que los jobs no consultan la BD fila por fila.
+"""
+
+from typing import Iterable, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, select
+
+from ...db import Campus, School, Subject, Teacher
+
+
+class IdentityMap:
+    "Ids de las filas de `model`, por el valor único de su columna `key`"
+
+    def __init__(self, model, key: str = "name") -> None:
+        self.model = model
+        self.key = key
+        self.ids: dict[str, int] = {}
+        self.pending: set[str] = set()  # Creadas en la transacción actual
+
+    def load(self, db_session: Session) -> None:
+        "Carga todos los ids de la tabla en una sola consulta"
+        rows = db_session.exec(select(self.model.id, getattr(self.model, self.key)))
+        self.ids = {value: id for id, value in rows}
+        self.pending.clear()
+
+    def get(self, value: str) -> Optional[int]:
+        return self.ids.get(value)
+
+    def add(self, value: str, id: int) -> None:
+        "Registra un id guardado en la transacción actual"
+        self.ids[value] = id
+        self.pending.add(value)
+
+    def __contains__(self, value: str) -> bool:
+        return value in self.ids
+
+    def ensure(self, db_session: Session, values: Iterable[str]) -> dict[str, int]:
+        """Retorna los ids de `values`, creando en un solo `INSERT` las filas que falten.
+        No hace commit, para que las filas nuevas queden en la transacción del llamador."""
+        values = set(values)
+        missing = values - self.ids.keys()
+        if missing:
+            key_column = getattr(self.model, self.key)
+            stmt = (
+                insert(self.model)
+                .values([{self.key: value} for value in missing])
+                .on_conflict_do_nothing(index_elements=[self.key])
+                .returning(self.model.id, key_column)
+            )
+            for id, value in db_session.exec(stmt):
+                self.add(value, id)
+
+            # Filas creadas por otro proceso después de `load`
+            if missing - self.ids.keys():
+                rows = db_session.exec(
+                    select(self.model.id, key_column).where(
+                        col(key_column).in_(missing - self.ids.keys())
+                    )
+                )
+                self.ids.update({value: id for id, value in rows})
+        return {value: self.ids[value] for value in values}
+
+    def commit(self) -> None:
+        self.pending.clear()
+
+    def rollback(self) -> None:
+        "Olvida los ids de las filas que no se llegaron a guardar"
+        for value in self.pending:
+            self.ids.pop(value, None)
+        self.pending.clear()
+
+
+class JobIdentities:
+    "Mapas de identidad compartidos por los jobs de Buscacursos y Catalogo"
+
+    def __init__(self) -> None:
+        self.subjects = IdentityMap(Subject, "code")
+        self.teachers = IdentityMap(Teacher)
+        self.campuses = IdentityMap(Campus)
+        self.schools = IdentityMap(School)
+
+    @property
+    def maps(self) -> tuple[IdentityMap, ...]:
+        return (self.subjects, self.teachers, self.campuses, self.schools)
+
+    def load(self, db_session: Session) -> None:
+        for identity_map in self.maps:
+            identity_map.load(db_session)
+
+    def commit(self, *maps: IdentityMap) -> None:
+        """Debe llamarse después de cada `db_session.commit()` que use los mapas.
+        Se pueden indicar sólo los mapas usados, para no afectar a las transacciones
+        que otro hilo tenga abiertas con los demás mapas"""
+        for identity_map in maps or self.maps:
+            identity_map.commit()
+
+    def rollback(self, *maps: IdentityMap) -> None:
+        "Debe llamarse después de cada `db_session.rollback()` que use los mapas"
+        for identity_map in maps or self.maps:
+            identity_map.rollback()
+
+
+identities = JobIdentities()
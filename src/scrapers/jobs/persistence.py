@@ -0,0 +1,204 @@
+"""
+Escritura por lotes de los cursos de Buscacursos
+------------------------------------------------
+
+Cada lote se guarda con `INSERT ... ON CONFLICT` de varias filas por tabla
+y en una sola transacción, en vez de consultar y guardar curso por curso.
+Los cursos cuyo hash de contenido no cambió desde la última vez no se escriben.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, select
+
+from ...db import (
+    ClassSchedule,
+    Course,
+    CoursesTeachers,
+    DayEnum,
+    module_bit,
+    normalize_search_text,
+    schedule_masks,
+)
+from . import log
+from .identity import identities
+
+if TYPE_CHECKING:
+    from ..types import ScrappedCourse
+
+
+def get_schedule_masks(course: "ScrappedCourse") -> dict[str, int]:
+    """Máscaras del horario del curso, con los mismos módulos que se guardan en
+    `ClassSchedule`. Los módulos fuera de la semana se registran y no se incluyen, para no
+    perder el lote completo por un horario extraño"""
+    schedule = []
+    for item in course.get("schedule") or []:
+        day, module = item["module"][0], int(item["module"][1:])
+        try:
+            module_bit(day, module)
+        except ValueError:
+            log.warning(
+                "Ignoring module %s of %s-%s in schedule masks",
+                item["module"],
+                course["code"],
+                course["section"],
+            )
+            continue
+        schedule.append((day, module, item["type"]))
+    schedule_mask, ayu_lab_mask = schedule_masks(schedule)
+    return {"schedule_mask": schedule_mask, "ayu_lab_mask": ayu_lab_mask}
+
+
+def course_content_hash(course: "ScrappedCourse") -> str:
+    "Hash estable de todos los campos del curso, sin depender del orden de profesores y horario"
+    content = {
+        **course,
+        "teachers": sorted(course["teachers"]),
+        "schedule": sorted(
+            (item["module"], item["type"], item["classroom"])
+            for item in course.get("schedule") or []
+        ),
+    }
+    return hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+@dataclass
+class SavedCourses:
+    "Ids de los cursos del lote, por sigla y sección, y cuántos eran nuevos o cambiaron"
+
+    course_ids: dict[tuple[str, int], int] = field(default_factory=dict)
+    new: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+
+def save_courses(
+    db_session: Session,
+    term_id: int,
+    courses: "list[ScrappedCourse]",
+    subject_ids: dict[str, int],
+) -> SavedCourses:
+    """Guarda los cursos (con sus profesores y horarios) en una sola transacción.
+    Los cursos que no cambiaron desde que se guardaron no se escriben."""
+
+    # Si un curso aparece más de una vez en el lote, se usa el último
+    by_key = {(c["code"], c["section"]): c for c in courses}
+    result = SavedCourses()
+    if not by_key:
+        return result
+
+    try:
+        code_by_subject_id = {subject_ids[code]: code for code, _ in by_key}
+        hashes = {key: course_content_hash(c) for key, c in by_key.items()}
+        saved = db_session.exec(
+            select(Course.subject_id, Course.section, Course.id, Course.content_hash).where(
+                Course.term_id == term_id,
+                tuple_(Course.subject_id, Course.section).in_(
+                    [(subject_ids[code], section) for code, section in by_key]
+                ),
+            )
+        )
+        existing = set()
+        for subject_id, section, id, content_hash in saved:
+            key = (code_by_subject_id[subject_id], section)
+            existing.add(key)
+            if hashes[key] == content_hash:
+                result.course_ids[key] = id
+                del by_key[key]
+
+        result.unchanged = len(result.course_ids)
+        result.updated = len(existing) - result.unchanged
+        result.new = len(by_key) - result.updated
+        if not by_key:
+            db_session.commit()
+            return result
+
+        campus_ids = identities.campuses.ensure(db_session, (c["campus"] for c in by_key.values()))
+        teacher_ids = identities.teachers.ensure(
+            db_session, (t for c in by_key.values() for t in c["teachers"])
+        )
+
+        course_rows = [
+            {
+                "subject_id": subject_ids[c["code"]],
+                "term_id": term_id,
+                "section": c["section"],
+                "nrc": c["ncr"],
+                "format": c["format"],
+                "category": c["category"],
+                "is_removable": c["allows_withdraw"],
+                "is_english": c["is_in_english"],
+                "total_quota": c["total_vacancy"],
+                "fg_area": c["fg_area"],
+                "need_special_aproval": c["requires_special_approval"],
+                "available_quota": c["available_vacancy"],
+                "campus_id": campus_ids[c["campus"]],
+                "schedule_summary": str(c.get("schedule", [])),
+                **get_schedule_masks(c),
+                "search_text": normalize_search_text(
+                    " ".join([c["code"], c["name"], *c["teachers"]])
+                ),
+                "content_hash": hashes[key],
+            }
+            for key, c in by_key.items()
+        ]
+        stmt = insert(Course).values(course_rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["subject_id", "term_id", "section"],
+            set_={
+                name: stmt.excluded[name]
+                for name in course_rows[0]
+                if name not in ("subject_id", "term_id", "section")
+            },
+        ).returning(Course.id, Course.subject_id, Course.section)
+        course_ids = {
+            (code_by_subject_id[subject_id], section): id
+            for id, subject_id, section in db_session.exec(stmt)
+        }
+        result.course_ids.update(course_ids)
+
+        # Profesores y horarios se reemplazan por completo
+        db_session.exec(
+            delete(CoursesTeachers).where(
+                col(CoursesTeachers.course_id).in_(list(course_ids.values()))
+            )
+        )
+        db_session.exec(
+            delete(ClassSchedule).where(col(ClassSchedule.course_id).in_(list(course_ids.values())))
+        )
+
+        teacher_rows = [
+            {"course_id": course_ids[key], "teacher_id": teacher_ids[name]}
+            for key, c in by_key.items()
+            for name in set(c["teachers"])
+        ]
+        if teacher_rows:
+            db_session.exec(insert(CoursesTeachers).values(teacher_rows).on_conflict_do_nothing())
+
+        schedule_rows = [
+            {
+                "course_id": course_ids[key],
+                "day": DayEnum(item["module"][0]),
+                "module": int(item["module"][1:]),
+                "classroom": item["classroom"],
+                "type": item["type"],
+            }
+            for key, c in by_key.items()
+            for item in c.get("schedule") or []
+        ]
+        if schedule_rows:
+            db_session.exec(insert(ClassSchedule).values(schedule_rows))
+
+        db_session.commit()
+        identities.commit(identities.campuses, identities.teachers)
+    except Exception:
+        db_session.rollback()
+        identities.rollback(identities.campuses, identities.teachers)
+        raise
+
+    return result
@@ -0,0 +1,220 @@
+"""
+Etapas de los jobs
+------------------
+
+Los jobs se dividen en etapas que corren a la vez, en vez de esperar cada una a la
+anterior en el event loop:
+
+- Descarga: rutinas asíncronas (las búsquedas de `crawl_codes`).
+- Parseo: un `ProcessPoolExecutor`, ya que el parseo de HTML usa CPU.
+- Escritura: un hilo con su propia sesión de BD, que escribe los lotes en espera
+  de una sola vez.
+
+Cada etapa acepta un número acotado de elementos en espera, por lo que si la BD es
+el cuello de botella las descargas se detienen en vez de acumular páginas en memoria.
+Cada etapa registra cuántos elementos procesó y el tiempo que estuvo ocupada.
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, Awaitable, Callable, Generic, Optional, TypeVar
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from . import log
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy: float = 0  # Segundos ocupada, sumando todos sus workers
+    started: float = field(default_factory=monotonic)
+
+    def add(self, items: int, seconds: float) -> None:
+        self.items += items
+        self.busy += seconds
+
+    @property
+    def throughput(self) -> float:
+        "Elementos por segundo desde que empezó la etapa"
+        return self.items / max(monotonic() - self.started, 1e-9)
+
+    def report(self) -> None:
+        log.info(
+            "Stage %s: %i items, %.1f items/s, %.1fs busy",
+            self.name,
+            self.items,
+            self.throughput,
+            self.busy,
+        )
+
+
+class ParseStage:
+    """Parsea páginas en `workers` procesos, con a lo más el doble de páginas en espera.
+    Con `workers = 0` parsea en el event loop (útil para depurar)"""
+
+    def __init__(self, workers: int) -> None:
+        self.stats = StageStats("parse")
+        self.executor = ProcessPoolExecutor(workers) if workers > 0 else None
+        self._slots = asyncio.Semaphore(max(workers, 1) * 2)
+
+    async def start(self) -> None:
+        "Inicia los procesos antes que cualquier hilo, para no copiar sus locks"
+        if self.executor is not None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, int)
+
+    async def parse(self, parse: Callable[[bytes], R], body: bytes) -> R:
+        async with self._slots:
+            start = monotonic()
+            if self.executor is None:
+                result = parse(body)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.executor, parse, body)
+            self.stats.add(1, monotonic() - start)
+        return result
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+_STOP = object()
+
+
+class DBWriter(Generic[T]):
+    """Hilo que escribe los elementos con `write(session, items)`, usando su propia sesión.
+    Escribe juntos hasta `batch_size` elementos en espera, y `submit` espera mientras haya
+    `max_pending` elementos sin escribir"""
+
+    def __init__(
+        self,
+        bind: Engine,
+        write: Callable[[Session, list[T]], Any],
+        max_pending: int = 32,
+        batch_size: int = 8,
+    ) -> None:
+        self.bind = bind
+        self.write = write
+        self.batch_size = batch_size
+        self.stats = StageStats("write")
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._thread.start()
+
+    async def submit(self, item: T) -> None:
+        await self._slots.acquire()
+        self._queue.put(item)
+
+    async def drain(self) -> None:
+        "Espera a que se escriba todo lo pendiente"
+        await asyncio.get_running_loop().run_in_executor(None, self._queue.join)
+
+    async def close(self) -> None:
+        "Espera a que se escriba todo lo pendiente y termina el hilo"
+        self._queue.put(_STOP)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+
+    def _release(self, count: int) -> None:
+        for _ in range(count):
+            self._slots.release()
+
+    def _run(self) -> None:
+        assert self._loop is not None
+        with Session(self.bind) as session:
+            stop = False
+            while not stop:
+                items = []
+                item = self._queue.get()
+                while item is not _STOP:
+                    items.append(item)
+                    if len(items) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                stop = item is _STOP
+                if stop:
+                    self._queue.task_done()
+                if not items:
+                    continue
+
+                start = monotonic()
+                try:
+                    self.write(session, items)
+                except Exception:
+                    log.error("Cannot write %i items", len(items), exc_info=True)
+                    session.rollback()
+                self.stats.add(len(items), monotonic() - start)
+                self._loop.call_soon_threadsafe(self._release, len(items))
+                for _ in items:
+                    self._queue.task_done()
+
+
+class Pipeline(Generic[T]):
+    """Etapas de un job: descargas medidas con `fetch`, parseo en procesos con `parse`
+    y, si se indica `write`, escritura en un hilo con `submit`"""
+
+    def __init__(
+        self,
+        bind: Engine,
+        write: Optional[Callable[[Session, list[T]], Any]] = None,
+        parse_workers: int = 2,
+        max_pending: int = 32,
+        batch_size: int = 8,
+    ) -> None:
+        self.fetch_stats = StageStats("fetch")
+        self.parser = ParseStage(parse_workers)
+        self.writer = DBWriter(bind, write, max_pending, batch_size) if write else None
+
+    async def __aenter__(self) -> "Pipeline[T]":
+        await self.parser.start()
+        if self.writer is not None:
+            self.writer.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self.writer is not None:
+            await self.writer.close()
+        self.parser.close()
+        for stats in self.stats:
+            stats.report()
+
+    @property
+    def stats(self) -> list[StageStats]:
+        stats = [self.fetch_stats, self.parser.stats]
+        if self.writer is not None:
+            stats.append(self.writer.stats)
+        return stats
+
+    async def fetch(self, request: Awaitable[bytes]) -> bytes:
+        start = monotonic()
+        body = await request
+        self.fetch_stats.add(1, monotonic() - start)
+        return body
+
+    async def parse(self, parse: Callable[[bytes], R], body: bytes) -> R:
+        return await self.parser.parse(parse, body)
+
+    async def submit(self, item: T) -> None:
+        assert self.writer is not None
+        await self.writer.submit(item)
+
+    async def drain(self) -> None:
+        if self.writer is not None:
+            await self.writer.drain()
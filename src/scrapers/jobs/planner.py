@@ -0,0 +1,77 @@
+"""
+Planificador de prefijos
+------------------------
+
+Buscacursos y Catalogo retornan a lo más `max_results` resultados por búsqueda, por
+lo que `crawl_codes` parte desde A..Z y profundiza a ciegas. La mayoría de esas
+búsquedas retornan resultados vacíos o repetidos.
+
+El planificador arma el árbol de prefijos de las siglas que ya están en la BD y
+elige los prefijos más cortos que no deberían llegar al máximo, según lo que
+retornó cada prefijo en la ejecución anterior (guardado en `.cache`) o, si no se
+buscó, según cuántas siglas conocidas tiene. Al profundizar un prefijo, los hijos
+sin siglas conocidas (y las letras sin siglas) se buscan igual, como barrido de
+descubrimiento, y todo prefijo que llegue al máximo se sigue profundizando con
+`crawl_codes`.
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+from string import ascii_uppercase
+from typing import Iterable, Optional
+
+from . import log
+from .code_iterator import can_expand, expand_code
+
+CACHE_DIR = Path(".cache")
+
+
+class PrefixPlanner:
+    def __init__(self, name: str, max_results: int, cache_dir: Path = CACHE_DIR) -> None:
+        self.max_results = max_results
+        self.path = cache_dir / f"prefix_yields_{name}.json"
+        self.yields: dict[str, int] = {}  # Resultados por prefijo de la ejecución anterior
+        self.new_yields: dict[str, int] = {}
+        if self.path.exists():
+            try:
+                self.yields = json.loads(self.path.read_text())
+            except ValueError:
+                log.warning("Ignoring invalid prefix yields %s", self.path)
+
+    def plan(self, codes: Iterable[str]) -> list[str]:
+        """Prefijos disjuntos que cubren todas las siglas, también las que no están en `codes`.
+        Cada aparición de una sigla en `codes` (p. ej. una por sección) suma un resultado
+        esperado a sus prefijos"""
+        counts: Counter[str] = Counter()
+        children: dict[str, set[str]] = {}
+        for code in codes:
+            for length in range(1, len(code) + 1):
+                prefix = code[:length]
+                counts[prefix] += 1
+                if length < len(code):
+                    children.setdefault(prefix, set()).add(code[: length + 1])
+
+        def expand(prefix: str) -> list[str]:
+            expected = max(self.yields.get(prefix, 0), counts[prefix])
+            if expected < self.max_results or prefix not in children or not can_expand(prefix):
+                return [prefix]
+            # Los hijos sin siglas conocidas se buscan sin profundizar
+            known = children[prefix]
+            return [
+                code
+                for child in expand_code(prefix)
+                for code in (expand(child) if child in known else [child])
+            ]
+
+        return [code for letter in ascii_uppercase for code in expand(letter)]
+
+    def record(self, prefix: str, results: int) -> None:
+        self.new_yields[prefix] = results
+
+    def save(self, failed: Optional[Iterable[str]] = None) -> None:
+        "Guarda los resultados de esta ejecución, salvo los de los prefijos que fallaron"
+        for prefix in failed or ():
+            self.new_yields.pop(prefix, None)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(self.yields | self.new_yields, sort_keys=True))
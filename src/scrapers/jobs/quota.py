@@ -0,0 +1,158 @@
+"""
+Actualización rápida de vacantes
+--------------------------------
+
+Durante la toma de ramos sólo cambian las vacantes. En vez de recorrer todos los
+prefijos con `crawl_codes` y reescribir cada curso, se buscan en Buscacursos las
+siglas que ya tienen cursos en el semestre y se actualizan por lotes sólo las
+vacantes que cambiaron. Las búsquedas no leen el cache HTTP, que guarda vacantes de
+hasta 10 minutos atrás, pero sí guardan en él lo que descargan.
+"""
+
+import asyncio
+from time import monotonic
+from typing import Optional
+
+from sqlalchemy import Integer, column, update, values
+from sqlalchemy.sql.expression import Update
+from sqlmodel import Session, select
+
+from ...db import Course, PeriodEnum, Subject, Term, bump_data_version
+from .. import request
+from ..buscacursos import get_courses
+from ..utils import gather_bounded
+from . import log
+from .buscacursos import BC_CONCURRENCY
+from .report import report
+
+UPDATE_BATCH = 1000  # Filas por cada `UPDATE`
+
+Quotas = tuple[Optional[int], Optional[int]]  # Vacantes disponibles y totales
+
+
+def get_term_id(db_session: Session, year: int, semester: int) -> Optional[int]:
+    period = PeriodEnum.from_int(semester)
+    return db_session.exec(
+        select(Term.id).where(Term.year == year, Term.period == period)
+    ).one_or_none()
+
+
+def get_saved_quotas(
+    db_session: Session, term_id: int
+) -> dict[tuple[str, int], tuple[int, Quotas]]:
+    "Id y vacantes de cada curso del semestre, por sigla y sección"
+    rows = db_session.exec(
+        select(Subject.code, Course.section, Course.id, Course.available_quota, Course.total_quota)
+        .join(Subject)
+        .where(Course.term_id == term_id)
+    )
+    return {
+        (code, section): (id, (available, total)) for code, section, id, available, total in rows
+    }
+
+
+def quotas_update(rows: list[tuple[int, Optional[int], Optional[int]]]) -> Update:
+    """`UPDATE ... FROM (VALUES ...)` con el id y las vacantes de cada curso. Se borra el
+    hash de los cursos, que incluye las vacantes, para que la próxima búsqueda completa
+    no los considere sin cambios"""
+    quotas = values(
+        column("id", Integer),
+        column("available_quota", Integer),
+        column("total_quota", Integer),
+        name="quotas",
+    ).data(rows)
+    return (
+        update(Course)
+        .where(Course.id == quotas.c.id)
+        .values(
+            available_quota=quotas.c.available_quota,
+            total_quota=quotas.c.total_quota,
+            content_hash=None,
+        )
+        # Los cursos no se cargan en la sesión, no hay objetos que sincronizar
+        .execution_options(synchronize_session=False)
+    )
+
+
+def save_quotas(db_session: Session, changes: dict[int, Quotas]) -> None:
+    "Actualiza las vacantes, con un `UPDATE` por lote"
+    rows = [(id, available, total) for id, (available, total) in changes.items()]
+    for start in range(0, len(rows), UPDATE_BATCH):
+        db_session.exec(quotas_update(rows[start : start + UPDATE_BATCH]))
+    db_session.commit()
+
+
+async def refresh_quotas(
+    db_session: Session, year: int, semester: int, concurrency: int = BC_CONCURRENCY
+) -> int:
+    "Actualiza las vacantes de los cursos ya guardados del semestre. Retorna cuántos cambiaron"
+    with report.phase("plan"):
+        term_id = get_term_id(db_session, year, semester)
+        if term_id is None:
+            raise LookupError(f"Term {year}-{semester} has no saved courses")
+
+        saved = get_saved_quotas(db_session, term_id)
+        db_session.commit()  # No mantener la transacción abierta durante las búsquedas
+        codes = sorted({code for code, _ in saved})
+    report.progress.add("codes", len(codes))
+    changes: dict[int, Quotas] = {}
+    errors: list[str] = []
+
+    async with request.buscacursos(refresh=True) as bc_session:
+
+        async def search(code: str) -> None:
+            try:
+                courses = await get_courses(code, year, semester, session=bc_session)
+            except Exception:
+                log.error("Cannot search quotas of %s", code, exc_info=True)
+                errors.append(code)
+                return
+            finally:
+                report.progress.advance("codes")
+            for c in courses:
+                key = (c["code"], c["section"])
+                if key not in saved:
+                    continue
+                id, quotas = saved[key]
+                new_quotas = (c["available_vacancy"], c["total_vacancy"])
+                if new_quotas != quotas:
+                    changes[id] = new_quotas
+
+        with report.phase("search"):
+            await gather_bounded([search(code) for code in codes], concurrency)
+
+    if changes:
+        with report.phase("save"):
+            save_quotas(db_session, changes)
+            bump_data_version(db_session)
+    report.count_rows("courses", updated=len(changes), unchanged=len(saved) - len(changes))
+    report.add_failed("quotas", errors)
+
+    log.info(
+        "Quotas of %i codes: %i sections changed, %i errors", len(codes), len(changes), len(errors)
+    )
+    return len(changes)
+
+
+async def refresh_quotas_loop(
+    db_session: Session,
+    year: int,
+    semester: int,
+    interval: float,
+    concurrency: int = BC_CONCURRENCY,
+) -> None:
+    "Actualiza las vacantes continuamente, empezando una vez cada `interval` segundos"
+    while True:
+        start = monotonic()
+        try:
+            await refresh_quotas(db_session, year, semester, concurrency)
+        except LookupError:
+            raise
+        except Exception:
+            db_session.rollback()
+            log.error("Cannot refresh quotas", exc_info=True)
+
+        elapsed = monotonic() - start
+        if elapsed > interval:
+            log.warning("Refresh took %.0fs, more than the interval of %.0fs", elapsed, interval)
+        await asyncio.sleep(max(interval - elapsed, 0))
@@ -0,0 +1,247 @@
+"""
+Reporte de cada ejecución
+-------------------------
+
+Los jobs anotan en `report` el tiempo de cada fase, las filas insertadas,
+actualizadas y sin cambios (o `upserted`, si se escribieron sin compararlas con las
+guardadas), los prefijos que fallaron y las estadísticas de las etapas del `Pipeline`.
+Al correr un job dentro de `report.track(engine)`:
+
+- cada `scraper_progress_interval` segundos se registra una línea de progreso con
+  las búsquedas hechas, las peticiones por segundo y el tiempo restante estimado;
+- se mide el tiempo en SQL con los eventos del engine, desde cualquier hilo;
+- al terminar se guarda el reporte en JSON en `scraper_report_dir`, junto con las
+  peticiones, bytes y aciertos del cache de cada sitio y la memoria máxima.
+
+Comparando el tiempo de las descargas, del parseo y de la BD se ve si una ejecución
+está limitada por la red, la CPU o la BD. El tiempo restante es una cota inferior,
+ya que los prefijos con muchos resultados agregan nuevas búsquedas.
+"""
+
+import asyncio
+import json
+import resource
+import sys
+import threading
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from pathlib import Path
+from time import monotonic
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ...config import config
+from .. import request
+from . import log
+from .pipeline import StageStats
+
+
+class Progress:
+    "Tareas conocidas y terminadas por tipo (p. ej. búsquedas de prefijos)"
+
+    def __init__(self) -> None:
+        self.total: "Counter[str]" = Counter()
+        self.done: "Counter[str]" = Counter()
+
+    def add(self, name: str, count: int = 1) -> None:
+        self.total[name] += count
+
+    def advance(self, name: str, count: int = 1) -> None:
+        self.done[name] += count
+
+    def eta(self, elapsed: float) -> Optional[float]:
+        "Segundos restantes al ritmo promedio, o `None` si aún no termina ninguna tarea"
+        done = sum(self.done.values())
+        if not done:
+            return None
+        return max(sum(self.total.values()) - done, 0) * elapsed / done
+
+    def describe(self) -> str:
+        return ", ".join(f"{name} {self.done[name]}/{total}" for name, total in self.total.items())
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def http_counters() -> dict[str, dict[str, int]]:
+    "Peticiones, bytes y aciertos del cache de cada sitio, desde que se inició el proceso"
+    counters = {}
+    for name, stats in request.stats.items():
+        counters[name] = {
+            key: value
+            for key, value in stats.as_dict().items()
+            if isinstance(value, int) and not isinstance(value, bool)
+        }
+        sent = request.governors[name].stats.as_dict()
+        counters[name].update({f"network_{key}": value for key, value in sent.items()})
+    return counters
+
+
+def requests_made(counters: dict[str, dict[str, int]]) -> int:
+    return sum(c["hits"] + c["revalidated"] + c["misses"] for c in counters.values())
+
+
+def peak_memory_mb() -> dict[str, float]:
+    "Memoria residente máxima de este proceso y de los procesos hijos (los de parseo)"
+    # En Linux `ru_maxrss` está en KB, en macOS en bytes
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1e6, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1e6, 1),
+    }
+
+
+class JobReport:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self, job: str = "", **params) -> None:
+        self.job = job
+        self.params = params
+        self.started_at = datetime.now()
+        self.phases: dict[str, float] = {}
+        self.rows: dict[str, "Counter[str]"] = {}
+        self.failed: dict[str, set[str]] = {}
+        self.stages: dict[str, dict[str, float]] = {}
+        self.progress = Progress()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self._sql_lock = threading.Lock()
+        self._http_start = http_counters()
+
+    @contextmanager
+    def phase(self, name: str):
+        "Suma al tiempo de la fase `name` lo que tarda el bloque"
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + monotonic() - start
+
+    def count_rows(self, table: str, **counts: int) -> None:
+        "Filas escritas, p. ej. `count_rows('courses', inserted=3, unchanged=10)`"
+        self.rows.setdefault(table, Counter()).update(counts)
+
+    def add_failed(self, kind: str, codes: Iterable[str]) -> None:
+        self.failed.setdefault(kind, set()).update(codes)
+
+    def add_stages(self, stages: Iterable[StageStats]) -> None:
+        for stats in stages:
+            totals = self.stages.setdefault(stats.name, {"items": 0, "busy_seconds": 0})
+            totals["items"] += stats.items
+            totals["busy_seconds"] += stats.busy
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._report_started = monotonic()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_report_started", None)
+        if started is not None:
+            with self._sql_lock:
+                self.sql_statements += 1
+                self.sql_seconds += monotonic() - started
+
+    def as_dict(self, elapsed: float) -> dict:
+        http_end = http_counters()
+        http = {
+            site: {
+                key: value - self._http_start[site].get(key, 0) for key, value in counters.items()
+            }
+            for site, counters in http_end.items()
+        }
+        return {
+            "job": self.job,
+            "params": self.params,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "elapsed_seconds": round(elapsed, 2),
+            "phases": {name: round(seconds, 2) for name, seconds in self.phases.items()},
+            "http": http,
+            "time": {
+                "fetch_seconds": round(self.stages.get("fetch", {}).get("busy_seconds", 0), 2),
+                "parse_seconds": round(self.stages.get("parse", {}).get("busy_seconds", 0), 2),
+                "db_seconds": round(self.sql_seconds, 2),
+                "db_statements": self.sql_statements,
+            },
+            "stages": {
+                name: {"items": totals["items"], "busy_seconds": round(totals["busy_seconds"], 2)}
+                for name, totals in self.stages.items()
+            },
+            "rows": {table: dict(counts) for table, counts in self.rows.items()},
+            "failed": {kind: sorted(codes) for kind, codes in self.failed.items()},
+            "peak_memory_mb": peak_memory_mb(),
+        }
+
+    def log_progress(self, elapsed: float, requests_per_second: float) -> None:
+        log.info(
+            "Progress: %s, %.1f req/s, %s elapsed, ETA %s",
+            self.progress.describe() or "starting",
+            requests_per_second,
+            format_duration(elapsed),
+            format_duration(self.progress.eta(elapsed)),
+        )
+
+    async def _log_progress_loop(self, start: float, interval: float) -> None:
+        previous_requests, previous_time = requests_made(http_counters()), monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            requests, now = requests_made(http_counters()), monotonic()
+            self.log_progress(now - start, (requests - previous_requests) / (now - previous_time))
+            previous_requests, previous_time = requests, now
+
+    def save(self, data: dict, directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"run_{self.job}_{self.started_at:%Y%m%d_%H%M%S}.json"
+        path.write_text(json.dumps(data, indent=2))
+        return path
+
+    @asynccontextmanager
+    async def track(
+        self,
+        bind: Engine,
+        job: str,
+        report_dir: Optional[Path] = None,
+        progress_interval: Optional[float] = None,
+        **params,
+    ):
+        "Reinicia el reporte, registra el progreso mientras corre el job y lo guarda al final"
+        report_dir = report_dir or config.scraper_report_dir
+        interval = (
+            config.scraper_progress_interval if progress_interval is None else progress_interval
+        )
+        self.reset(job, **params)
+        start = monotonic()
+        event.listen(bind, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(bind, "after_cursor_execute", self._after_cursor_execute)
+        progress = (
+            asyncio.create_task(self._log_progress_loop(start, interval)) if interval > 0 else None
+        )
+        try:
+            yield self
+        finally:
+            if progress is not None:
+                progress.cancel()
+            event.remove(bind, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(bind, "after_cursor_execute", self._after_cursor_execute)
+            data = self.as_dict(monotonic() - start)
+            log.info(
+                "Run %s: %.1fs, %.1fs fetching, %.1fs parsing, %.1fs in SQL (%i statements)",
+                job,
+                data["elapsed_seconds"],
+                data["time"]["fetch_seconds"],
+                data["time"]["parse_seconds"],
+                data["time"]["db_seconds"],
+                data["time"]["db_statements"],
+            )
+            log.info("Run report saved to %s", self.save(data, report_dir))
+
+
+report = JobReport()
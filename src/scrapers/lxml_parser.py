@@ -0,0 +1,272 @@
+"""
+Parser de páginas con lxml
+--------------------------
+
+Alternativa a `BeautifulSoup` para las páginas de Buscacursos y Catalogo, que se
+activa con `scraper_parser = "lxml"` en la configuración. Trabaja directamente
+sobre el árbol de lxml con selectores XPath precompilados, y retorna registros con
+`__slots__` que se usan igual que los diccionarios (`ScrappedCourse` y
+`ScrappedSubject`).
+
+Debe retornar exactamente lo mismo que el parser de `bs4` (ver
+`tests/lxml_parser_test.py`), por lo que replica sus detalles: la detección de
+encoding, qué nodos cuentan como texto y cómo se busca la unidad académica.
+"""
+
+import html
+import re
+from collections.abc import Mapping
+from typing import Any, Callable, Iterator, List, Optional
+
+from bs4.dammit import EncodingDetector
+from lxml import etree
+
+from . import buscacursos, catalogo
+
+# Texto de un elemento, sin comentarios (igual a `Tag.text`)
+_text = etree.XPath("string()", smart_strings=False)
+# Cada nodo de texto de un elemento (igual a `Tag.get_text(separator)`)
+_texts = etree.XPath("descendant::text()", smart_strings=False)
+
+COURSE_ROWS = etree.XPath('//tr[contains(@class, "resultados")]')
+SUBJECT_ROWS = etree.XPath("//tbody/tr")
+SYLLABUS = etree.XPath("//div/pre")
+
+NON_EMPTY_TEXT_RE = re.compile(r"\S")
+SPACES_RE = re.compile(r"\s{2,}")
+
+
+class Record(Mapping):
+    "Registro compacto que se lee como diccionario. Los campos sin asignar no son llaves"
+
+    __slots__: tuple = ()
+
+    def __init__(self, **fields: Any) -> None:
+        self.update(fields)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name in self.__slots__ if hasattr(self, name))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def update(self, fields: Mapping) -> None:
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class CourseRecord(Record):
+    __slots__ = (
+        "school",
+        "ncr",
+        "code",
+        "allows_withdraw",
+        "is_in_english",
+        "section",
+        "requires_special_approval",
+        "fg_area",
+        "format",
+        "category",
+        "name",
+        "teachers",
+        "campus",
+        "credits",
+        "total_vacancy",
+        "available_vacancy",
+        "schedule",
+    )
+
+
+class SubjectRecord(Record):
+    __slots__ = (
+        "school_name",
+        "code",
+        "name",
+        "level",
+        "credits",
+        "is_active",
+        "description",
+        "prerequisites_raw",
+        "requirements",
+        "equivalencies_raw",
+        "equivalencies",
+        "relationship",
+        "restrictions",
+        "syllabus",
+    )
+
+
+def parse_html(body: bytes) -> Optional[etree._Element]:
+    "Árbol de la página, decodificada con el mismo encoding que elegiría `BeautifulSoup`"
+    detector = EncodingDetector(body, is_html=True)
+    encoding = next(iter(detector.encodings), None)
+    markup = detector.markup
+    if not markup.strip():
+        return None
+    return etree.fromstring(markup, etree.HTMLParser(encoding=encoding))
+
+
+def clean_text(element: etree._Element) -> str:
+    return SPACES_RE.sub(" ", _text(element)).strip()
+
+
+def int_value(element: etree._Element) -> int:
+    return int(clean_text(element))
+
+
+def single_string(element: etree._Element) -> Optional[str]:
+    "Igual a `Tag.string`: el texto si el elemento (o su único hijo) tiene un solo nodo"
+    children = list(element)
+    nodes = bool(element.text) + len(children) + sum(bool(child.tail) for child in children)
+    if nodes != 1:
+        return None
+    if element.text:
+        return element.text
+    child = children[0]
+    if not isinstance(child.tag, str):  # Comentario
+        return child.text
+    return single_string(child)
+
+
+def parse_schedule(element: etree._Element):
+    table = element.find(".//table")
+    if table is None:
+        return None
+    schedule = []
+    for row in table.iter("tr"):
+        cells = [_text(cell).strip() for cell in row.iter("td")]
+        schedule.extend(buscacursos.parse_schedule_cells(cells))
+    return schedule
+
+
+ParseFunction = Optional[Callable[[etree._Element], Any]]
+
+COURSE_PARSERS: dict[str, ParseFunction] = {
+    "ncr": clean_text,
+    "code": clean_text,
+    "allows_withdraw": lambda e: clean_text(e) == "SI",
+    "is_in_english": lambda e: clean_text(e) == "SI",
+    "section": int_value,
+    "requires_special_approval": lambda e: clean_text(e) == "SI",
+    "fg_area": clean_text,
+    "format": clean_text,
+    "category": clean_text,
+    "name": clean_text,
+    "teachers": lambda e: buscacursos.parse_teachers_text(_text(e).strip()),
+    "campus": clean_text,
+    "credits": int_value,
+    "total_vacancy": int_value,
+    "available_vacancy": int_value,
+    "schedule": parse_schedule,
+}
+
+SUBJECT_PARSERS: dict[str, ParseFunction] = {
+    "school_name": clean_text,
+    "code": clean_text,
+    "name": clean_text,
+    "level": clean_text,
+    "credits": int_value,
+    "is_active": lambda e: clean_text(e) == "Vigente",
+    "description": lambda e: catalogo.parse_description_text(" ".join(_texts(e))),
+}
+
+# Mismo orden de columnas que los parsers de bs4
+COURSE_COLUMNS = [(name, COURSE_PARSERS.get(name)) for name in buscacursos.COLUMNS_STRATEGIES]
+SUBJECT_COLUMNS = [(name, SUBJECT_PARSERS.get(name)) for name in catalogo.COLUMNS_STRATEGIES]
+
+
+def parse_columns(record: Record, row: etree._Element, columns: list[tuple[str, ParseFunction]]):
+    for cell, (name, parse) in zip(row.findall("td"), columns):
+        if parse is not None:
+            value = parse(cell)
+            if value is not None:
+                record[name] = value
+    return record
+
+
+def find_school(row: etree._Element) -> Optional[str]:
+    "Unidad académica: la fila anterior más cercana sin estilo ni clase y con un solo texto"
+    for sibling in row.itersiblings(preceding=True):
+        if (
+            isinstance(sibling.tag, str)
+            and "style" not in sibling.attrib
+            and "class" not in sibling.attrib
+        ):
+            string = single_string(sibling)
+            if string is not None and NON_EMPTY_TEXT_RE.search(string):
+                return _text(sibling).strip()
+    return None
+
+
+def parse_courses_page(body: bytes) -> List[CourseRecord]:
+    root = parse_html(body)
+    if root is None:
+        return []
+
+    courses = []
+    for row in COURSE_ROWS(root):
+        course = CourseRecord()
+        school = find_school(row)
+        if school is not None:
+            course.school = school
+        courses.append(parse_columns(course, row, COURSE_COLUMNS))
+    return courses
+
+
+def parse_subjects_page(body: bytes) -> List[SubjectRecord]:
+    root = parse_html(body)
+    if root is None:
+        return []
+    return [parse_columns(SubjectRecord(), row, SUBJECT_COLUMNS) for row in SUBJECT_ROWS(root)]
+
+
+def find_text_by_table_key(root: etree._Element, key: str) -> Optional[str]:
+    "Texto que sigue a la celda con la llave en negrita (igual que en `catalogo`)"
+    for strong in root.iter("strong"):
+        if key in html.unescape(clean_text(strong)):
+            parent = strong.getparent()
+            if parent is None:
+                return None
+            if parent.tail:
+                return parent.tail.strip()
+            sibling = parent.getnext()
+            if sibling is None:
+                return None
+            if not isinstance(sibling.tag, str):  # Comentario, sin texto
+                return ""
+            return _text(sibling).strip()
+    return None
+
+
+def parse_additional_info_page(body: bytes) -> dict:
+    root = parse_html(body)
+    if root is None:
+        return {}
+    return catalogo.requirements_from_texts(
+        find_text_by_table_key(root, "Prerrequisitos"),
+        find_text_by_table_key(root, "Equivalencias"),
+        find_text_by_table_key(root, "Relación"),
+        find_text_by_table_key(root, "Restricciones"),
+    )
+
+
+def parse_syllabus_page(body: bytes) -> dict:
+    root = parse_html(body)
+    syllabus = SYLLABUS(root) if root is not None else []
+    if syllabus:
+        return {"syllabus": _text(syllabus[0]).strip().replace("\r\n", "\n")}
+    return {}
@@ -0,0 +1,194 @@
+"""
+Grabación y reproducción de los sitios
+--------------------------------------
+
+Con `scraper_record_dir` en la configuración, cada respuesta que reciben los scrapers
+(descargada o desde el cache) se guarda en un corpus de fixtures, con un directorio
+por sitio:
+
+    <scraper_record_dir>/buscacursos/manifest.json
+    <scraper_record_dir>/buscacursos/<sha1 del cuerpo>.html.gz
+
+El manifiesto lleva la versión del formato (`FORMAT_VERSION`) y, por cada petición
+(método, ruta y parámetros ordenados), el estado, el tipo de contenido y el archivo
+del cuerpo. Los cuerpos repetidos se guardan una vez.
+
+El mismo corpus se sirve con un servidor local que reemplaza a los sitios, con
+latencia y errores configurables, para correr los jobs sin conexión:
+
+    python -m src.scrapers.replay <corpus> --latency 0.05 --error-rate 0.01
+
+Luego basta apuntar los scrapers al servidor con `buscacursos_url` y `catalogo_url`
+(p. ej. `BUSCACURSOS_URL=http://127.0.0.1:8081/`). Las peticiones que no están en el
+corpus retornan 404, que los parsers leen como una búsqueda sin resultados.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import random
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Optional, Tuple
+from urllib.parse import urlencode
+
+from aiohttp import web
+
+from .jobs import log
+
+FORMAT_VERSION = 1
+SITES = ("buscacursos", "catalogo")
+DEFAULT_PORTS = {"buscacursos": 8081, "catalogo": 8082}
+
+
+def request_key(method: str, path: str, params: Iterable[Tuple[str, Any]]) -> str:
+    "Identifica una petición, sin importar el orden de los parámetros"
+    query = urlencode(sorted((str(key), str(value)) for key, value in params))
+    return f"{method.upper()} {path}?{query}"
+
+
+class Corpus:
+    "Respuestas grabadas de un sitio"
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.responses: dict[str, dict] = {}
+        self.recorded_at: Optional[str] = None
+        manifest = directory / "manifest.json"
+        if manifest.exists():
+            data = json.loads(manifest.read_text())
+            if data.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported corpus version {data.get('version')} in {directory}")
+            self.responses = data["responses"]
+            self.recorded_at = data.get("recorded_at")
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def add(self, key: str, status: int, content_type: Optional[str], body: bytes) -> None:
+        name = f"{hashlib.sha1(body).hexdigest()}.html.gz"
+        path = self.directory / name
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(gzip.compress(body, mtime=0))
+        self.responses[key] = {"status": status, "content_type": content_type, "body": name}
+
+    def get(self, key: str) -> Optional[Tuple[int, Optional[str], bytes]]:
+        entry = self.responses.get(key)
+        if entry is None:
+            return None
+        body = gzip.decompress((self.directory / entry["body"]).read_bytes())
+        return entry["status"], entry["content_type"], body
+
+    def save(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.recorded_at = datetime.now().isoformat(timespec="seconds")
+        manifest = {
+            "version": FORMAT_VERSION,
+            "recorded_at": self.recorded_at,
+            "responses": dict(sorted(self.responses.items())),
+        }
+        (self.directory / "manifest.json").write_text(json.dumps(manifest, indent=1))
+
+
+class Recorder:
+    "Guarda en un `Corpus` las respuestas que recibe una sesión"
+
+    def __init__(self, directory: Path) -> None:
+        self.corpus = Corpus(directory)
+
+    async def record(self, response) -> None:
+        "Graba una respuesta de aiohttp o del cache"
+        body = await response.read()
+        key = request_key(response.method, response.url.path, response.url.query.items())
+        self.corpus.add(key, response.status, response.headers.get("Content-Type"), body)
+
+    def save(self) -> None:
+        self.corpus.save()
+        log.info("Recorded %i responses in %s", len(self.corpus), self.corpus.directory)
+
+
+def create_app(
+    corpus: Corpus,
+    latency: float = 0,
+    jitter: float = 0,
+    error_rate: float = 0,
+    error_status: int = 503,
+    seed: Optional[int] = None,
+) -> web.Application:
+    """Servidor que responde lo grabado en `corpus`, tras `latency` ± `jitter` segundos.
+    Una fracción `error_rate` de las peticiones responde `error_status`"""
+    rng = random.Random(seed)
+
+    async def handler(request: web.Request) -> web.Response:
+        delay = latency + rng.uniform(-jitter, jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if rng.random() < error_rate:
+            return web.Response(status=error_status)
+
+        key = request_key(request.method, request.path, request.query.items())
+        recorded = corpus.get(key)
+        if recorded is None:
+            log.warning("Not recorded: %s", key)
+            return web.Response(status=404)
+        status, content_type, body = recorded
+        headers = {"Content-Type": content_type} if content_type else None
+        return web.Response(status=status, body=body, headers=headers)
+
+    app = web.Application()
+    app.router.add_route("*", "/{path:.*}", handler)
+    return app
+
+
+async def serve(
+    directory: Path, host: str, ports: dict[str, int], **options
+) -> list[web.AppRunner]:
+    "Sirve el corpus de cada sitio en su propio puerto"
+    runners = []
+    for site in SITES:
+        corpus = Corpus(directory / site)
+        runner = web.AppRunner(create_app(corpus, **options))
+        await runner.setup()
+        await web.TCPSite(runner, host, ports[site]).start()
+        runners.append(runner)
+        log.info("Serving %i %s responses on http://%s:%i/", len(corpus), site, host, ports[site])
+    return runners
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Servidor local con las respuestas grabadas")
+    parser.add_argument("corpus", type=Path)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--buscacursos-port", type=int, default=DEFAULT_PORTS["buscacursos"])
+    parser.add_argument("--catalogo-port", type=int, default=DEFAULT_PORTS["catalogo"])
+    parser.add_argument("--latency", type=float, default=0, help="segundos por respuesta")
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        ports = {"buscacursos": args.buscacursos_port, "catalogo": args.catalogo_port}
+        await serve(
+            args.corpus,
+            args.host,
+            ports,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+            seed=args.seed,
+        )
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,17 @@ async def gather_routines(tasks: List[Coroutine]):
     return list(await asyncio.gather(*tasks))
 
 
+async def gather_bounded(tasks: List[Coroutine], limit: int):
+    "Como `gather_routines`, pero con a lo más `limit` rutinas corriendo a la vez"
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def run(task: Coroutine):
+        async with semaphore:
+            return await task
+
+    return await gather_routines([run(task) for task in tasks])
+
+
 def run_parse_strategy(ps: "ParseStrategy", tags: "List[bs4.element.Tag]"):
     """
     Corre funciones para obtener los datos en una lista de tags.
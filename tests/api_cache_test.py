@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from src.api import cache
+from src.api.main import app
+from src.api.utils import get_db
+from src.db import Teacher
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(Teacher(name="Profesor"))
+        db.commit()
+
+    def get_test_db():
+        with Session(engine) as db:
+            yield db
+
+    async def get_version():
+        return version[0]
+
+    version = [1]
+    monkeypatch.setattr(cache, "backend", cache.MemoryCache(max_entries=10))
+    monkeypatch.setattr(cache.data_version, "get", get_version)
+    app.dependency_overrides[get_db] = get_test_db
+    yield TestClient(app), version
+    app.dependency_overrides.pop(get_db)
+
+
+def test_cache_hit_and_revalidation(client):
+    client, version = client
+
+    first = client.get("/teachers/")
+    assert first.status_code == 200
+    assert first.headers["x-cache"] == "MISS"
+
+    second = client.get("/teachers/")
+    assert second.headers["x-cache"] == "HIT"
+    assert second.json() == first.json()
+
+    not_modified = client.get("/teachers/", headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+
+    version[0] += 1
+    assert client.get("/teachers/").headers["x-cache"] == "MISS"
+
+
+def test_errors_are_not_cached(client):
+    client, _ = client
+    assert client.get("/subjects/MISSING/").status_code == 404
+    assert "x-cache" not in client.get("/subjects/MISSING/").headers
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_lru_eviction(tmp_path, backend):
+    if backend == "memory":
+        lru = cache.MemoryCache(max_entries=2)
+    else:
+        lru = cache.SQLiteCache(tmp_path / "api.sqlite", max_entries=2)
+
+    for key in ("a", "b"):
+        lru.set(key, cache.CachedResponse(key.encode(), "application/json", f'"{key}"'))
+    assert lru.get("a") is not None  # "b" pasa a ser el menos usado
+    lru.set("c", cache.CachedResponse(b"c", "application/json", '"c"'))
+
+    assert lru.get("b") is None
+    assert lru.get("a") is not None
+    assert lru.get("c") is not None
+
+
+def test_uncached_paths(client):
+    client, _ = client
+    query = {"query": "{ allTeachers { name } }"}
+    for _ in range(2):
+        assert "x-cache" not in client.get("/metrics").headers
+        response = client.get("/graphql", params=query)
+        assert response.status_code == 200
+        assert "x-cache" not in response.headers
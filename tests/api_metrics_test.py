@@ -0,0 +1,43 @@
+import re
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.api.metrics import Histogram, instrument_engine
+
+from .api_query_count_test import add_data, count_queries, engine  # noqa: F401
+
+
+def test_histogram_render():
+    histogram = Histogram("latency", "Latencia", ["route"], [0.1, 1])
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, '/a"b')
+    assert histogram.render()[2:] == [
+        'latency_bucket{route="/a\\"b",le="0.1"} 1',
+        'latency_bucket{route="/a\\"b",le="1"} 2',
+        'latency_bucket{route="/a\\"b",le="+Inf"} 3',
+        'latency_sum{route="/a\\"b"} 5.55',
+        'latency_count{route="/a\\"b"} 3',
+    ]
+
+
+def test_server_timing_and_metrics(engine):  # noqa: F811
+    for name, instrumented in zip(("sync", "async"), engine):
+        instrument_engine(instrumented, name)
+    add_data(engine[0], 3)
+    client = TestClient(app)
+
+    with count_queries(engine) as statements:
+        response = client.get("/subjects/S1/")
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert f'desc="{len(statements)} queries"' in timing
+    assert re.search(r"app;dur=[\d.]+", timing)
+
+    assert client.get("/subjects/NOPE/").status_code == 404
+    metrics = client.get("/metrics").text
+    route = 'route="/subjects/{subject_code}/"'
+    assert f'api_request_duration_seconds_count{{method="GET",{route},status="200"}}' in metrics
+    assert f'api_request_duration_seconds_count{{method="GET",{route},status="404"}}' in metrics
+    assert f"api_request_sql_statements_count{{{route}}}" in metrics
+    assert 'db_pool_checkout_seconds_count{engine="sync"}' in metrics
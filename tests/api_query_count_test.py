@@ -0,0 +1,135 @@
+"""Cantidad de consultas SQL por endpoint, para detectar cargas N+1.
+
+Usa una BD SQLite, por lo que no necesita de PostgreSQL."""
+
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.api.main import app
+from src.api.utils import get_async_db, get_db
+from src.config import config
+from src.db import (
+    Campus,
+    ClassSchedule,
+    Course,
+    DayEnum,
+    PeriodEnum,
+    School,
+    Subject,
+    SubjectEquivalencies,
+    SubjectPrerequisites,
+    Teacher,
+    Term,
+)
+
+# Consultas máximas por endpoint, sin importar la cantidad de elementos
+QUERY_BUDGETS = {
+    "/courses/": 3,
+    "/courses/1/": 4,
+    "/subjects/": 4,
+    "/subjects/S0/": 6,
+    "/subjects/S0/sections/": 3,
+    "/schools/": 2,
+    "/schools/1/subjects/": 2,
+    "/places/": 2,
+    "/campuses/": 1,
+}
+
+
+@pytest.fixture()
+def engine(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "api_cache_enabled", False)
+    # Archivo, para que las rutas síncronas y asíncronas vean los mismos datos
+    db_path = tmp_path / "test.sqlite"
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    SQLModel.metadata.create_all(engine)
+
+    def get_test_db():
+        with Session(engine) as db:
+            yield db
+
+    async def get_test_async_db():
+        async with AsyncSession(async_engine) as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_async_db] = get_test_async_db
+    yield engine, async_engine.sync_engine
+    app.dependency_overrides.pop(get_db)
+    app.dependency_overrides.pop(get_async_db)
+
+
+def add_data(engine, n: int, offset: int = 0):
+    "Añade `n` ramos con una sección cada uno, con prerrequisitos, profesores y horario"
+    with Session(engine) as db:
+        term = db.get(Term, 1) or Term(year=2022, period=PeriodEnum.s1)
+        campus = db.get(Campus, 1) or Campus(name="San Joaquín")
+        school = db.get(School, 1) or School(name="Ingeniería")
+        previous = None
+        for i in range(offset, offset + n):
+            subject = Subject(code=f"S{i}", name=f"Ramo {i}", credits=10, school=school)
+            db.add(subject)
+            db.flush()
+            if previous is not None:
+                db.add(
+                    SubjectPrerequisites(
+                        subject_id=subject.id,
+                        prerequisite_id=previous.id,
+                        group=0,
+                        is_corequisite=False,
+                    )
+                )
+                db.add(
+                    SubjectEquivalencies(subject_id=previous.id, equivalence_id=subject.id, group=0)
+                )
+            course = Course(
+                subject=subject,
+                term=term,
+                campus=campus,
+                section=1,
+                nrc=str(i),
+                teachers=[Teacher(name=f"Profesor {i}-{j}") for j in range(2)],
+                schedule=[ClassSchedule(day=DayEnum.L, module=m) for m in (1, 2)],
+            )
+            db.add(course)
+            previous = subject
+        db.commit()
+
+
+@contextmanager
+def count_queries(engines):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("path", QUERY_BUDGETS)
+def test_query_count_does_not_grow(engine, path):
+    client = TestClient(app)
+
+    add_data(engine[0], 3)
+    with count_queries(engine) as few_items:
+        assert client.get(path).status_code == 200
+
+    add_data(engine[0], 20, offset=3)
+    with count_queries(engine) as many_items:
+        assert client.get(path).status_code == 200
+
+    assert len(many_items) == len(few_items)
+    assert len(many_items) <= QUERY_BUDGETS[path]
@@ -0,0 +1,30 @@
+import json
+
+from src.scrapers.benchmark import BASELINE, PageCorpus, build_benchmarks, compare
+
+
+def test_benchmarks_run_on_the_corpus():
+    benchmarks = build_benchmarks(PageCorpus.load())
+    for benchmark in benchmarks:
+        assert benchmark.inputs, benchmark.name
+        benchmark.run()
+
+    baseline = json.loads(BASELINE.read_text())
+    assert {b.name for b in benchmarks} == set(baseline["results"])
+
+
+def test_compare_flags_regressions():
+    baseline = {
+        "results": {
+            "fast": {"calls": 10, "relative_time": 1.0, "peak_kb": 10},
+            "other_corpus": {"calls": 5, "relative_time": 1.0, "peak_kb": 10},
+        }
+    }
+    current = {
+        "results": {
+            "fast": {"calls": 10, "relative_time": 1.5, "peak_kb": 20},
+            "other_corpus": {"calls": 6, "relative_time": 9.0, "peak_kb": 90},
+        }
+    }
+    assert compare(current, baseline) == ["fast: 1.50x slower", "fast: peak 10 KB -> 20 KB"]
+    assert compare(current, baseline, time_tolerance=1, memory_tolerance=1) == []
@@ -0,0 +1,62 @@
+import asyncio
+
+from src.scrapers.jobs import buscacursos
+from src.scrapers.jobs.identity import identities
+
+COURSES = [{"code": "IIC2233", "section": section} for section in (1, 2)]
+
+
+class FakePipeline:
+    def __init__(self) -> None:
+        self.submitted: list = []
+
+    async def fetch(self, request):
+        return await request
+
+    async def parse(self, parse, body):
+        await asyncio.sleep(0)
+        return COURSES
+
+    async def submit(self, batch):
+        self.submitted.append(batch)
+
+
+async def fake_fetch_courses_page(session, **params) -> bytes:
+    return b""
+
+
+def search_overlapping(monkeypatch) -> FakePipeline:
+    monkeypatch.setattr(buscacursos, "fetch_courses_page", fake_fetch_courses_page)
+    monkeypatch.setattr(buscacursos, "term_id", 1)
+    monkeypatch.setattr(buscacursos, "courses_cache", set())
+    monkeypatch.setattr(identities.subjects, "ids", {"IIC2233": 10})
+    pipeline = FakePipeline()
+
+    async def run():
+        # Un prefijo y su hijo retornan las mismas secciones
+        searches = [
+            buscacursos.search_bc_code(code, 2022, 1, None, None, pipeline)  # type: ignore
+            for code in ("IIC", "IIC2", "IIC2")
+        ]
+        assert await asyncio.gather(*searches) == [2, 2, 2]
+
+    asyncio.run(run())
+    return pipeline
+
+
+def test_sections_are_sent_once_per_run(monkeypatch):
+    pipeline = search_overlapping(monkeypatch)
+    assert [batch.courses for batch in pipeline.submitted] == [COURSES]
+
+
+def test_failed_writes_are_sent_again(monkeypatch):
+    pipeline = search_overlapping(monkeypatch)
+
+    def failing_save(*args):
+        raise ValueError("BD caída")
+
+    monkeypatch.setattr(buscacursos, "save_courses", failing_save)
+    monkeypatch.setattr(buscacursos, "errors", set())
+    buscacursos.write_batches(None, pipeline.submitted)  # type: ignore
+    assert buscacursos.errors == {"IIC"}
+    assert buscacursos.courses_cache == set()
@@ -0,0 +1,43 @@
+import asyncio
+
+from src.scrapers.jobs.code_iterator import CodeIterator, crawl_codes, expand_code
+
+MAX_RESULTS = 3
+# Prefijos con muchos resultados, que se deben expandir
+CROWDED = {"I", "IC", "ICS", "M", "MA"}
+
+
+def fake_results(code: str) -> int:
+    return MAX_RESULTS if code in CROWDED else 0
+
+
+def test_expand_code():
+    assert expand_code("A")[:2] == ["AA", "AB"]
+    assert expand_code("ABC") == [f"ABC{i}" for i in range(10)]
+
+
+def test_crawl_matches_code_iterator():
+    expected = []
+    code_generator = CodeIterator()
+    for code in code_generator:
+        expected.append(code)
+        if fake_results(code) >= MAX_RESULTS:
+            code_generator.add_depth()
+
+    visited = []
+
+    async def search(code: str) -> int:
+        visited.append(code)
+        await asyncio.sleep(0)
+        return fake_results(code)
+
+    asyncio.run(crawl_codes(search, MAX_RESULTS, concurrency=4))
+    assert sorted(visited) == sorted(expected)
+    assert len(visited) == len(set(visited))
+
+
+def test_crawl_reports_saturated_prefixes():
+    async def search(code: str) -> int:
+        return MAX_RESULTS if "IIC2233".startswith(code) else 0
+
+    assert asyncio.run(crawl_codes(search, MAX_RESULTS, 4, ["I"])) == {"IIC2233"}
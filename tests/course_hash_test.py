@@ -0,0 +1,37 @@
+from src.scrapers.jobs.persistence import course_content_hash
+
+
+def make_course(**changes):
+    course = {
+        "code": "IIC2233",
+        "section": 1,
+        "name": "Programación Avanzada",
+        "ncr": "12345",
+        "campus": "San Joaquín",
+        "available_vacancy": 10,
+        "total_vacancy": 100,
+        "teachers": ["Profesor A", "Profesor B"],
+        "schedule": [
+            {"module": "L1", "type": "CLAS", "classroom": "A1"},
+            {"module": "W1", "type": "CLAS", "classroom": "A1"},
+        ],
+    }
+    return course | changes
+
+
+def test_hash_ignores_order():
+    course = make_course()
+    reordered = make_course(teachers=course["teachers"][::-1], schedule=course["schedule"][::-1])
+    assert course_content_hash(course) == course_content_hash(reordered)
+
+
+def test_hash_changes_with_content():
+    original = course_content_hash(make_course())
+    assert course_content_hash(make_course(available_vacancy=9)) != original
+    assert course_content_hash(make_course(teachers=["Profesor A"])) != original
+    assert (
+        course_content_hash(
+            make_course(schedule=[{"module": "L2", "type": "CLAS", "classroom": "A1"}])
+        )
+        != original
+    )
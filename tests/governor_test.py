@@ -0,0 +1,115 @@
+import asyncio
+from time import monotonic
+
+import pytest
+from aiohttp import ClientResponseError, web
+
+from src.scrapers.cache import ScraperCache, ScraperSession
+from src.scrapers.governor import AIMDLimiter, HostGovernor, TokenBucket
+from tests.scraper_cache_test import get, server
+
+TOLERATED = 6  # Peticiones simultáneas que acepta el sitio antes de responder 503
+
+
+async def run_crawl(governor: HostGovernor, handler, requests: int, tmp_path) -> None:
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    cache = ScraperCache(str(tmp_path / "site.sql"), [], default_ttl=0)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with ScraperSession(base_url=url, cache=cache, governor=governor) as session:
+            await asyncio.gather(*(get(session, i=i) for i in range(requests)))
+    finally:
+        await runner.cleanup()
+
+
+def test_aimd_settles_below_upstream_limit(tmp_path):
+    governor = HostGovernor(1000, 1000, 2, 32, retries=10, backoff=0.01, max_backoff=0.05)
+    in_flight, peak = 0, 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            if in_flight > TOLERATED:
+                return web.Response(status=503)
+            await asyncio.sleep(0.005)
+            return web.Response(body=b"ok")
+        finally:
+            in_flight -= 1
+
+    asyncio.run(run_crawl(governor, handler, 400, tmp_path))
+    assert governor.stats.failures == 0
+    assert governor.stats.retries < 40
+    assert 2 <= governor.limiter.limit <= TOLERATED + 2
+
+
+def test_retries_give_up(tmp_path):
+    governor = HostGovernor(1000, 1000, 4, 4, retries=2, backoff=0.001)
+
+    async def handler(request):
+        return web.Response(status=500)
+
+    with pytest.raises(ClientResponseError):
+        asyncio.run(run_crawl(governor, handler, 1, tmp_path))
+    assert (governor.stats.requests, governor.stats.retries, governor.stats.failures) == (3, 2, 1)
+
+
+def test_retry_after_is_respected():
+    governor = HostGovernor(10, 10, 1, 1, max_backoff=5)
+    assert governor.delay(0, "2") == 2
+    assert governor.delay(0, "120") == 5
+    assert 0 <= governor.delay(3) <= 4
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=100, burst=5)
+
+    async def run():
+        start = monotonic()
+        for _ in range(25):
+            await bucket.acquire()
+        return monotonic() - start
+
+    # 5 en ráfaga y 20 a 100 por segundo
+    assert 0.18 <= asyncio.run(run()) < 0.5
+
+
+def test_limiter_blocks_and_adapts():
+    limiter = AIMDLimiter(2, maximum=3)
+
+    async def run():
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        limiter.release(False)  # Baja a 1, todavía hay una en curso
+        await asyncio.sleep(0)
+        assert not waiter.done() and limiter.limit == 1
+        limiter.release(True)
+        await waiter
+        assert limiter.in_flight == 1 and limiter.limit == 2
+
+    asyncio.run(run())
+
+
+def test_cached_responses_skip_the_governor(tmp_path):
+    governor = HostGovernor(1000, 1000, 1, 1)
+    cache = ScraperCache(str(tmp_path / "site.sql"), [])
+
+    async def run():
+        async with server() as (url, calls):
+            async with ScraperSession(base_url=url, cache=cache, governor=governor) as session:
+                for _ in range(3):
+                    await get(session, view="programa")
+
+    asyncio.run(run())
+    assert governor.stats.requests == 1
@@ -0,0 +1,30 @@
+import random
+
+from src.api.loadtest import ENDPOINTS, EndpointResult, Sample, percentile
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_result_summary():
+    result = EndpointResult("/courses/", 8, latencies=[0.01] * 9 + [0.1], errors=2, elapsed=2)
+    summary = result.as_dict()
+    assert summary["requests"] == 12
+    assert summary["rps"] == 6
+    assert (summary["p50_ms"], summary["p99_ms"]) == (10, 100)
+
+
+def test_requests_use_the_sample():
+    sample = Sample(["IIC2233", "MAT1610"], [1, 2])
+    rng = random.Random(0)
+    for make_request in ENDPOINTS.values():
+        for _ in range(20):
+            method, path, params, body = make_request(rng, sample)
+            if path.startswith("/subjects/"):
+                assert path.split("/")[2] in sample.subject_codes
+            if params and "term_id" in params:
+                assert params["term_id"] in sample.term_ids
@@ -0,0 +1,66 @@
+"""El parser de lxml debe retornar lo mismo que el de bs4 en páginas guardadas.
+
+Las páginas de `tests/pages` son sintéticas, con la estructura de Buscacursos y
+Catalogo y casos borde: comentarios, espacios, entidades y otro encoding."""
+
+from pathlib import Path
+
+import pytest
+
+from src.config import config
+from src.scrapers import buscacursos, catalogo, lxml_parser
+
+PAGES = Path(__file__).parent / "pages"
+
+
+def parse_with(monkeypatch, backend: str, parse, body: bytes):
+    monkeypatch.setattr(config, "scraper_parser", backend)
+    return parse(body)
+
+
+@pytest.mark.parametrize(
+    "page, parse",
+    [
+        ("buscacursos.html", buscacursos.parse_courses_page),
+        ("buscacursos_latin1.html", buscacursos.parse_courses_page),
+        ("catalogo_subjects.html", catalogo.parse_subjects_page),
+        ("catalogo_requirements.html", catalogo.parse_additional_info_page),
+        ("catalogo_syllabus.html", catalogo.parse_syllabus_page),
+    ],
+)
+def test_same_output(monkeypatch, page, parse):
+    body = (PAGES / page).read_bytes()
+    expected = parse_with(monkeypatch, "bs4", parse, body)
+    result = parse_with(monkeypatch, "lxml", parse, body)
+
+    assert expected
+    if isinstance(expected, list):
+        assert [dict(record) for record in result] == expected
+    else:
+        assert result == expected
+
+
+def test_courses_page_details(monkeypatch):
+    body = (PAGES / "buscacursos.html").read_bytes()
+    courses = parse_with(monkeypatch, "lxml", buscacursos.parse_courses_page, body)
+
+    assert len(courses) == 24
+    assert {c["school"] for c in courses} == {"Ingeniería", "Matemáticas", "Física"}
+    assert "schedule" not in courses[5]
+
+
+def test_empty_page(monkeypatch):
+    assert parse_with(monkeypatch, "lxml", buscacursos.parse_courses_page, b"") == []
+    assert parse_with(monkeypatch, "bs4", buscacursos.parse_courses_page, b"") == []
+
+
+def test_records():
+    record = lxml_parser.SubjectRecord(code="IIC2233")
+    record.update({"name": "Programación Avanzada"})
+
+    assert record == {"code": "IIC2233", "name": "Programación Avanzada"}
+    assert record.get("syllabus") is None
+    assert "syllabus" not in record
+    assert {**record, "credits": 10}["credits"] == 10
+    with pytest.raises(KeyError):
+        record["update"]
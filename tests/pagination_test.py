@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.api.pagination import encode_cursor
+
+from .api_query_count_test import add_data, engine  # noqa: F401
+
+LIST_PATHS = ["/subjects/", "/schools/1/subjects/"]  # Síncrona y asíncrona
+
+
+@pytest.mark.parametrize("path", LIST_PATHS)
+def test_cursor_pages(engine, path):  # noqa: F811
+    add_data(engine[0], 7)
+    client = TestClient(app)
+
+    codes, cursor, pages = [], "", 0
+    while cursor is not None:
+        response = client.get(path, params={"size": 3, "cursor": cursor})
+        assert response.status_code == 200
+        page = response.json()
+        assert page["page"] is None
+        assert page["total"] == 7
+        codes += [item["code"] for item in page["items"]]
+        cursor, pages = page["next_cursor"], pages + 1
+
+    assert pages == 3
+    assert codes == [f"S{i}" for i in range(7)]  # Sin repetidos ni saltos
+
+    # Con la última página llena, la siguiente viene vacía y sin cursor
+    last = client.get(path, params={"size": 7, "cursor": ""}).json()
+    assert last["next_cursor"] is not None
+    empty = client.get(path, params={"size": 7, "cursor": last["next_cursor"]}).json()
+    assert (empty["items"], empty["next_cursor"]) == ([], None)
+
+
+@pytest.mark.parametrize("path", LIST_PATHS)
+def test_without_total(engine, path):  # noqa: F811
+    add_data(engine[0], 3)
+    client = TestClient(app)
+
+    page = client.get(path, params={"count_total": False, "cursor": encode_cursor(1)}).json()
+    assert page.get("total") is None
+    assert [item["code"] for item in page["items"]] == ["S1", "S2"]
+    assert page["next_cursor"] is None
+
+    page = client.get(path, params={"count_total": False, "page": 1}).json()
+    assert page.get("total") is None
+    assert page["page"] == 1
+    assert len(page["items"]) == 3
+
+
+@pytest.mark.parametrize("cursor", ["basura", encode_cursor(1)[:-4], "eyJuYW1lIjogMX0="])
+def test_invalid_cursor(engine, cursor):  # noqa: F811
+    response = TestClient(app).get("/subjects/", params={"cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import pytest
+from sqlmodel import create_engine
+
+from src.scrapers.jobs.pipeline import Pipeline
+
+PAGE = b"<html><body><tr>fila</tr></body></html>"
+
+
+def count_rows(body: bytes) -> int:
+    return body.count(b"<tr>")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'pipeline.db'}")
+
+
+@pytest.mark.parametrize("parse_workers", [0, 1])
+def test_parse_and_write_in_batches(engine, parse_workers):
+    written: list[list[int]] = []
+    threads: set[str] = set()
+
+    def write(session, items):
+        threads.add(threading.current_thread().name)
+        written.append(items)
+
+    async def run():
+        async with Pipeline(engine, write, parse_workers, max_pending=4, batch_size=3) as pipe:
+
+            async def job(i: int):
+                body = await pipe.fetch(asyncio.sleep(0, PAGE))
+                await pipe.submit(i * await pipe.parse(count_rows, body))
+
+            await asyncio.gather(*(job(i) for i in range(20)))
+            await pipe.drain()
+            assert sorted(i for items in written for i in items) == list(range(20))
+        return pipe.stats
+
+    stats = asyncio.run(run())
+    assert threads == {"db-writer"}
+    assert all(len(items) <= 3 for items in written)
+    assert [s.items for s in stats] == [20, 20, 20]
+
+
+def test_writer_backpressure(engine):
+    "Con la BD detenida, `submit` espera en vez de acumular elementos"
+    release = threading.Event()
+    submitted = []
+
+    def write(session, items):
+        release.wait()
+
+    async def run():
+        async with Pipeline(engine, write, parse_workers=0, max_pending=4) as pipe:
+
+            async def producer():
+                for i in range(10):
+                    await pipe.submit(i)
+                    submitted.append(i)
+
+            task = asyncio.create_task(producer())
+            await asyncio.sleep(0.1)
+            assert len(submitted) == 4
+            release.set()
+            await task
+
+    asyncio.run(run())
+    assert len(submitted) == 10
+
+
+def test_write_errors_do_not_stop_the_writer(engine):
+    written = []
+
+    def write(session, items):
+        if 0 in items:
+            raise ValueError
+        written.extend(items)
+
+    async def run():
+        async with Pipeline(engine, write, parse_workers=0, batch_size=1) as pipe:
+            for i in range(3):
+                await pipe.submit(i)
+
+    asyncio.run(run())
+    assert written == [1, 2]
@@ -0,0 +1,93 @@
+import asyncio
+import random
+
+from src.scrapers.jobs.code_iterator import crawl_codes
+from src.scrapers.jobs.planner import PrefixPlanner
+
+MAX_RESULTS = 50
+
+
+def make_sections(seed: int = 0) -> list[str]:
+    "Sigla de cada sección, con siglas como IIC2233 y varias secciones por sigla"
+    rng = random.Random(seed)
+    schools = ["IIC", "MAT", "FIS", "ICS", "EYP", "QIM", "BIO", "LET", "ARQ", "DER"]
+    return [
+        f"{school}{rng.randint(1000, 3999)}"
+        for school in schools
+        for _ in range(rng.randint(20, 120))
+        for _ in range(rng.randint(1, 4))
+    ]
+
+
+def crawl(sections: list[str], seeds=None) -> tuple[set[str], int, dict[str, int]]:
+    "Secciones encontradas, búsquedas hechas y resultados por prefijo"
+    found: set[str] = set()
+    yields: dict[str, int] = {}
+
+    async def search(prefix: str) -> int:
+        results = [(i, code) for i, code in enumerate(sections) if code.startswith(prefix)]
+        found.update(str(result) for result in results[:MAX_RESULTS])
+        yields[prefix] = len(results[:MAX_RESULTS])
+        return yields[prefix]
+
+    args = [] if seeds is None else [seeds]
+    asyncio.run(crawl_codes(search, MAX_RESULTS, 4, *args))
+    return found, len(yields), yields
+
+
+def test_planned_crawl_finds_the_same_with_fewer_requests(tmp_path):
+    sections = make_sections()
+    blind_found, blind_requests, _ = crawl(sections)
+
+    planner = PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path)
+    planned_found, planned_requests, yields = crawl(sections, planner.plan(sections))
+    assert planned_found == blind_found
+    assert planned_requests < blind_requests
+
+    # Con los resultados de la ejecución anterior el plan no cambia ni crece
+    for prefix, results in yields.items():
+        planner.record(prefix, results)
+    planner.save()
+    planner = PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path)
+    found, requests, _ = crawl(sections, planner.plan(sections))
+    assert found == blind_found
+    assert requests <= planned_requests
+
+
+def test_previous_yields_expand_prefixes(tmp_path):
+    planner = PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path)
+    assert "I" in planner.plan(["IIC1000", "ICS1000"])
+
+    planner.record("I", MAX_RESULTS)
+    planner.save()
+    planner = PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path)
+    plan = planner.plan(["IIC1000", "ICS1000"])
+    assert "I" not in plan
+    assert {"IC", "II"} <= set(plan)
+
+
+def test_failed_prefixes_are_not_saved(tmp_path):
+    planner = PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path)
+    planner.record("A", 0)
+    planner.record("B", 3)
+    planner.save(failed={"A"})
+    assert PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path).yields == {"B": 3}
+
+
+def test_new_codes_under_crowded_prefixes_are_found(tmp_path):
+    known = [f"IIC{1000 + i}" for i in range(60)] + [f"ICS{1000 + i}" for i in range(60)]
+    live = known + ["IEE2103", "IIC3633"]
+    blind_found, _, _ = crawl(live)
+
+    planner = PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path)
+    plan = planner.plan(known)
+    assert {"IE", "IIC3"} <= set(plan)
+    found, _, _ = crawl(live, plan)
+    assert found == blind_found
+
+
+def test_plan_stops_at_maximum_depth(tmp_path):
+    planner = PrefixPlanner("test", MAX_RESULTS, cache_dir=tmp_path)
+    plan = planner.plan([f"IIC2233{letter}" for letter in "ABC" for _ in range(MAX_RESULTS)])
+    assert "IIC2233" in plan
+    assert all(len(prefix) <= 7 for prefix in plan)
@@ -0,0 +1,101 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from src.api.main import app
+from src.api.prerequisites import PrerequisiteGraph, iter_bits, prerequisite_graph
+from src.api.utils import get_db
+from src.config import config
+from src.db import Subject, SubjectPrerequisites
+
+# MAT1 -> MAT2 -> MAT3, y FIS2 requiere (MAT2 y FIS1) o (MAT3), con QUI1 de correquisito
+SUBJECTS = [(code, code.lower()) for code in ("MAT1", "MAT2", "MAT3", "FIS1", "FIS2", "QUI1")]
+PREREQUISITES = [
+    ("MAT2", "MAT1", 0, False),
+    ("MAT3", "MAT2", 0, False),
+    ("FIS2", "MAT2", 0, False),
+    ("FIS2", "FIS1", 0, False),
+    ("FIS2", "QUI1", 0, True),
+    ("FIS2", "MAT3", 1, False),
+]
+
+
+def codes(graph: PrerequisiteGraph, mask: int) -> set[str]:
+    return {graph.codes[subject] for subject in iter_bits(mask)}
+
+
+def test_transitive_queries():
+    graph = PrerequisiteGraph(SUBJECTS, PREREQUISITES)
+
+    assert codes(graph, graph.ancestors("FIS2")) == {"MAT1", "MAT2", "MAT3", "FIS1", "QUI1"}
+    assert codes(graph, graph.ancestors("MAT1")) == set()
+    assert codes(graph, graph.descendants("MAT1")) == {"MAT2", "MAT3", "FIS2"}
+    assert codes(graph, graph.descendants("FIS2")) == set()
+
+
+def test_cycles_end():
+    graph = PrerequisiteGraph(SUBJECTS[:2], [("MAT1", "MAT2", 0, True), ("MAT2", "MAT1", 0, True)])
+
+    assert codes(graph, graph.ancestors("MAT1")) == {"MAT1", "MAT2"}
+
+
+def test_eligible():
+    graph = PrerequisiteGraph(SUBJECTS, PREREQUISITES)
+
+    def eligible(*passed: str, **kwargs) -> set[str]:
+        return codes(graph, graph.eligible(graph.mask_of(passed), **kwargs))
+
+    assert eligible() == set()
+    assert eligible("MAT1") == {"MAT2"}
+    assert eligible("MAT1", "MAT2") == {"MAT3"}
+    # Los correquisitos no son necesarios para poder tomar el ramo
+    assert eligible("MAT1", "MAT2", "FIS1") == {"MAT3", "FIS2"}
+    assert eligible("MAT3") == {"FIS2"}
+    assert eligible("MAT1", include_without_prerequisites=True) == {"MAT2", "FIS1", "QUI1"}
+
+
+def test_endpoints(monkeypatch):
+    monkeypatch.setattr(config, "api_cache_enabled", False)
+    monkeypatch.setattr(prerequisite_graph, "graph", None)
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as db:
+        subjects = {code: Subject(code=code, name=name, credits=10) for code, name in SUBJECTS}
+        db.add_all(subjects.values())
+        db.flush()
+        for code, prerequisite, group, is_corequisite in PREREQUISITES:
+            db.add(
+                SubjectPrerequisites(
+                    subject_id=subjects[code].id,
+                    prerequisite_id=subjects[prerequisite].id,
+                    group=group,
+                    is_corequisite=is_corequisite,
+                )
+            )
+        db.commit()
+
+    def get_test_db():
+        with Session(engine) as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    try:
+        client = TestClient(app)
+
+        tree = client.get("/subjects/FIS2/prerequisites/tree/").json()
+        assert tree[0]["code"] == "FIS2"
+        assert {node["code"] for node in tree} == {"FIS2", "MAT1", "MAT2", "MAT3", "FIS1", "QUI1"}
+        assert {"group": 0, "is_corequisite": True, "code": "QUI1"} in tree[0]["prerequisites"]
+
+        unlocks = client.get("/subjects/MAT2/unlocks/all/").json()
+        assert {s["code"] for s in unlocks} == {"MAT3", "FIS2"}
+
+        eligible = client.get("/subjects/eligible/", params={"passed": ["MAT1", "MAT2"]}).json()
+        assert [s["code"] for s in eligible] == ["MAT3"]
+
+        assert client.get("/subjects/NONE/unlocks/all/").status_code == 404
+        assert client.get("/subjects/eligible/", params={"passed": "NONE"}).status_code == 422
+    finally:
+        app.dependency_overrides.pop(get_db)
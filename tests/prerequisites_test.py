@@ -1,24 +1,39 @@
-from sqlmodel import Session, delete
-from sqlmodel.sql.expression import select
+"""Carga de los grupos de prerrequisitos desde la BD.
 
-from src.db import Subject, engine
+Usa una BD SQLite, por lo que no necesita de PostgreSQL."""
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from src.api.prerequisites import PrerequisiteGraph
+from src.db import Subject, SubjectPrerequisites
 
 
 def test_prerequisites():
-    # TODO: usar db de testing
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
 
     with Session(engine) as session:
-        s1 = Subject(name="ejemplo", code="EJ0000")
-        ra_1 = Subject(name="ra-1", code="ERA1")
-        ra_2 = Subject(name="ra-2", code="ERA2")
-        rb_1 = Subject(name="rb-1", code="ERB1")
-
-        s1.set_prerequisites([[ra_1, ra_2], [rb_1]])
+        s1 = Subject(name="ejemplo", code="EJ0000", credits=10)
+        ra_1 = Subject(name="ra-1", code="ERA1", credits=10)
+        ra_2 = Subject(name="ra-2", code="ERA2", credits=10)
+        rb_1 = Subject(name="rb-1", code="ERB1", credits=10)
+        # (ERA1 y ERA2(c)) o ERB1
+        s1.prerequisites = [
+            SubjectPrerequisites(prerequisite=ra_1, group=0, is_corequisite=False),
+            SubjectPrerequisites(prerequisite=ra_2, group=0, is_corequisite=True),
+            SubjectPrerequisites(prerequisite=rb_1, group=1, is_corequisite=False),
+        ]
         session.add(s1)
+        session.commit()
 
+    with Session(engine) as session:
         s1_db = session.exec(select(Subject).where(Subject.code == "EJ0000")).one()
-        prerequisites = s1_db.prerequisites
-        assert len(prerequisites) == 2
-        assert {len(prerequisites[i].child_and_groups) for i in (0, 1)} == {1, 2}
+        groups: dict[int, set[str]] = {}
+        for prerequisite in s1_db.prerequisites:
+            groups.setdefault(prerequisite.group, set()).add(prerequisite.prerequisite.code)
+        assert groups == {0: {"ERA1", "ERA2"}, 1: {"ERB1"}}
 
-        delete(Subject).where(Subject.code.in_(["EJ0000", "ERA1", "ERA2", "ERB1"]))  # type: ignore
+        graph = PrerequisiteGraph.load(session)
+        assert len(graph.groups[graph.index["EJ0000"]]) == 2
+        assert graph.eligible(graph.mask_of(["ERA1"])) == graph.mask_of(["EJ0000"])
+        assert graph.eligible(graph.mask_of(["ERA2"])) == 0
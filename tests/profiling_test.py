@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.main import app as main_app
+from src.api.profiling import profile_requests, profiling_router
+from src.config import config
+
+
+def busy_handler() -> int:
+    "Usa CPU por un momento, para que aparezca en las muestras"
+    end = time.perf_counter() + 0.05
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "api_profiling_dir", tmp_path)
+    monkeypatch.setattr(config, "api_profiling_interval", 0.001)
+    app = FastAPI(root_path=str(config.api_base_path))
+    app.middleware("http")(profile_requests)
+    app.include_router(profiling_router)
+
+    @app.get("/busy/")
+    def busy():
+        return {"total": busy_handler()}
+
+    return TestClient(app)
+
+
+def test_disabled_by_default():
+    dispatchers = [m.options.get("dispatch") for m in main_app.user_middleware]
+    assert profile_requests not in dispatchers
+    assert all(route.path != "/profiles/{profile_id}" for route in main_app.routes)
+
+
+def test_profile_request(client):
+    assert "X-Profile-Id" not in client.get("/busy/").headers
+
+    response = client.get("/busy/?a=1", headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profile = client.get(f"/profiles/{profile_id}").text
+    assert profile.startswith(f"GET {config.api_base_path}/busy/?a=1\nStatus 200")
+    assert "Call tree:" in profile
+    assert "busy_handler (tests/profiling_test.py:" in profile
+    assert client.get("/profiles/../secret").status_code == 404
+
+
+def test_token(client, monkeypatch):
+    monkeypatch.setattr(config, "api_profiling_token", "secret")
+    assert "X-Profile-Id" not in client.get("/busy/", headers={"X-Profile": "1"}).headers
+
+    response = client.get("/busy/", headers={"X-Profile": "secret"})
+    profile_id = response.headers["X-Profile-Id"]
+    assert client.get(f"/profiles/{profile_id}").status_code == 403
+
+    # Leer un perfil no crea otro
+    response = client.get(f"/profiles/{profile_id}", headers={"X-Profile": "secret"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert len(list(config.api_profiling_dir.iterdir())) == 1
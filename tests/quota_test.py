@@ -0,0 +1,89 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from src.db import Course, Subject
+from src.scrapers.jobs import quota
+
+from .api_query_count_test import add_data
+
+SAVED = {"S0": (5, 10), "S1": (3, 10), "S2": (0, 10)}
+LIVE = {"S0": (5, 10), "S1": (2, 10)}  # S2 falla
+
+
+class FakeSessions:
+    def __init__(self) -> None:
+        self.refresh = None
+
+    @asynccontextmanager
+    async def buscacursos(self, refresh: bool = False):
+        self.refresh = refresh
+        yield None
+
+
+async def fake_get_courses(code, year, semester, *, session):
+    if code not in LIVE:
+        raise ValueError("Buscacursos no responde")
+    available, total = LIVE[code]
+    return [
+        {"code": code, "section": section, "available_vacancy": available, "total_vacancy": total}
+        for section in (1, 2)  # La sección 2 no está en la BD
+    ]
+
+
+def test_refresh_quotas(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    SQLModel.metadata.create_all(engine)
+    add_data(engine, 3)
+    with Session(engine) as db:
+        ids = {}
+        for course, code in db.exec(select(Course, Subject.code).join(Subject)):
+            course.available_quota, course.total_quota = SAVED[code]
+            ids[code] = course.id
+            db.add(course)
+        db.commit()
+
+    # UPDATE ... FROM no está disponible en SQLite con SQLAlchemy 1.4
+    saved_changes = {}
+    sessions = FakeSessions()
+    monkeypatch.setattr(quota, "request", sessions)
+    monkeypatch.setattr(quota, "get_courses", fake_get_courses)
+    monkeypatch.setattr(quota, "save_quotas", lambda db, changes: saved_changes.update(changes))
+    monkeypatch.setattr(quota, "bump_data_version", lambda db: None)
+    quota.report.reset()
+
+    with Session(engine) as db:
+        assert asyncio.run(quota.refresh_quotas(db, 2022, 1)) == 1
+    assert sessions.refresh  # Sin las vacantes del cache HTTP
+    assert saved_changes == {ids["S1"]: (2, 10)}
+    assert quota.report.failed["quotas"] == {"S2"}
+
+
+def test_save_quotas_in_batches(monkeypatch):
+    class FakeSession:
+        def __init__(self) -> None:
+            self.statements = []
+
+        def exec(self, statement):
+            self.statements.append(statement)
+
+        def commit(self):
+            pass
+
+    db = FakeSession()
+    monkeypatch.setattr(quota, "UPDATE_BATCH", 2)
+    quota.save_quotas(db, {1: (0, 10), 2: (5, 10), 3: (None, None)})  # type: ignore
+
+    assert len(db.statements) == 2
+    compiled = db.statements[0].compile(dialect=postgresql.dialect())
+    sql = " ".join(str(compiled).split())
+    assert sql.startswith(
+        "UPDATE course SET available_quota=quotas.available_quota, "
+        "total_quota=quotas.total_quota, content_hash=%(content_hash)s FROM (VALUES"
+    )
+    assert sql.endswith("WHERE course.id = quotas.id")
+    params = compiled.params
+    assert params.pop("content_hash") is None
+    assert list(params.values()) == [1, 0, 10, 2, 5, 10]
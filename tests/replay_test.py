@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from aiohttp import web
+
+from src.scrapers import buscacursos
+from src.scrapers.cache import ScraperCache, ScraperSession
+from src.scrapers.governor import HostGovernor
+from src.scrapers.replay import Corpus, Recorder, create_app, request_key
+
+PAGES = Path(__file__).parent / "pages"
+PARAMS = buscacursos.courses_params("IIC", 2022, 1)
+
+
+@asynccontextmanager
+async def replay_session(tmp_path: Path, corpus: Corpus, **options):
+    runner = web.AppRunner(create_app(corpus, seed=0, **options))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+    cache = ScraperCache(str(tmp_path / "cache.sql"), [], default_ttl=0)
+    governor = HostGovernor(1000, 1000, 4, 4, retries=5, backoff=0.001)
+    try:
+        async with ScraperSession(
+            base_url=f"http://127.0.0.1:{port}", cache=cache, governor=governor
+        ) as session:
+            yield session
+    finally:
+        await runner.cleanup()
+
+
+def make_corpus(directory: Path) -> Corpus:
+    corpus = Corpus(directory)
+    body = (PAGES / "buscacursos.html").read_bytes()
+    corpus.add(request_key("GET", "/", PARAMS.items()), 200, "text/html", body)
+    corpus.save()
+    return Corpus(directory)
+
+
+def test_key_ignores_param_order():
+    assert request_key("get", "/", [("b", 2), ("a", "1")]) == "GET /?a=1&b=2"
+
+
+def test_replay_courses(tmp_path):
+    corpus = make_corpus(tmp_path / "corpus")
+    assert len(corpus) == 1
+
+    async def run():
+        async with replay_session(tmp_path, corpus) as session:
+            found = await buscacursos.get_courses("IIC", 2022, 1, session=session)
+            missing = await buscacursos.get_courses("MAT", 2022, 1, session=session)
+            return found, missing
+
+    found, missing = asyncio.run(run())
+    assert len(found) == 24
+    assert missing == []
+
+
+def test_error_injection_is_retried(tmp_path):
+    corpus = make_corpus(tmp_path / "corpus")
+
+    async def run():
+        async with replay_session(tmp_path, corpus, error_rate=0.5) as session:
+            results = [
+                await buscacursos.get_courses("IIC", 2022, 1, session=session) for _ in range(10)
+            ]
+            return results, session.governor.stats.retries
+
+    results, retries = asyncio.run(run())
+    assert all(len(courses) == 24 for courses in results)
+    assert retries > 0
+
+
+def test_record_then_replay(tmp_path):
+    source = make_corpus(tmp_path / "source")
+    recorded_dir = tmp_path / "recorded"
+
+    async def run():
+        async with replay_session(tmp_path, source) as session:
+            session.recorder = Recorder(recorded_dir)
+            await buscacursos.get_courses("IIC", 2022, 1, session=session)
+            session.recorder.save()
+
+    asyncio.run(run())
+    recorded = Corpus(recorded_dir)
+    assert recorded.responses.keys() == source.responses.keys()
+    key = next(iter(source.responses))
+    assert recorded.get(key) == source.get(key)
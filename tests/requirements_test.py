@@ -0,0 +1,146 @@
+"""Grupos DNF de requisitos reales de Catalogo UC.
+
+Los grupos esperados son los que retornaba la conversión con sympy, que no tiene un
+orden estable, por lo que se comparan como conjuntos."""
+
+import pytest
+
+from src.scrapers.catalogo import parse_requirements_groups
+
+CORPUS = [
+    ("No tiene", []),
+    ("MAT1610", [["MAT1610"]]),
+    ("MAT1610(c)", [["MAT1610c"]]),
+    ("IIC2233 y (IIC1253 o MAT1107)", [["IIC2233", "IIC1253"], ["IIC2233", "MAT1107"]]),
+    (
+        "(IIC1103 o IIC1102) y (MAT1107 o MAT1610(c))",
+        [
+            ["IIC1103", "MAT1107"],
+            ["IIC1103", "MAT1610c"],
+            ["IIC1102", "MAT1107"],
+            ["IIC1102", "MAT1610c"],
+        ],
+    ),
+    ("(MAT1620 y FIS1513) o (MAT1620 y ICE1513)", [["MAT1620", "FIS1513"], ["MAT1620", "ICE1513"]]),
+    ("IIC2133 y IIC2343(c)", [["IIC2133", "IIC2343c"]]),
+    (
+        "(MAT1203 y MAT1620) o (MAT1203 y MAT1512) o MLM1130",
+        [["MAT1203", "MAT1620"], ["MAT1203", "MAT1512"], ["MLM1130"]],
+    ),
+    ("ICS1113 o ICS113H", [["ICS1113"], ["ICS113H"]]),
+    (
+        "((ICS2123 y EYP1113) o (ICS2123 y EYP1025)) y ICS1113",
+        [["ICS2123", "EYP1113", "ICS1113"], ["ICS2123", "EYP1025", "ICS1113"]],
+    ),
+    ("FIS1513 y FIS1523 y MAT1630(c)", [["FIS1513", "FIS1523", "MAT1630c"]]),
+    (
+        "(MAT1640 o MAT1640H) y (IIC1103 o IIC1102 o ING1310)",
+        [
+            ["MAT1640", "IIC1103"],
+            ["MAT1640", "IIC1102"],
+            ["MAT1640", "ING1310"],
+            ["MAT1640H", "IIC1103"],
+            ["MAT1640H", "IIC1102"],
+            ["MAT1640H", "ING1310"],
+        ],
+    ),
+    (
+        "(IIC2133 y IIC2513) o (IIC2133 y IIC2413) o (IIC2513 y IIC2413)",
+        [["IIC2133", "IIC2513"], ["IIC2133", "IIC2413"], ["IIC2513", "IIC2413"]],
+    ),
+    ("(MAT1610 y MAT1203) o (MAT1203 y MAT1610)", [["MAT1610", "MAT1203"]]),
+    ("MAT1610 y (MAT1610 o MAT1620)", [["MAT1610"], ["MAT1610", "MAT1620"]]),
+    (
+        "(ICM2003 o ICM2013) y (ICE2003 o ICE2013) y (ICH1104 o ICH1114(c))",
+        [
+            ["ICM2003", "ICE2003", "ICH1104"],
+            ["ICM2003", "ICE2003", "ICH1114c"],
+            ["ICM2003", "ICE2013", "ICH1104"],
+            ["ICM2003", "ICE2013", "ICH1114c"],
+            ["ICM2013", "ICE2003", "ICH1104"],
+            ["ICM2013", "ICE2003", "ICH1114c"],
+            ["ICM2013", "ICE2013", "ICH1104"],
+            ["ICM2013", "ICE2013", "ICH1114c"],
+        ],
+    ),
+    (
+        "((MAT1620 o MAT1622) y (MAT1203 o MAT1202)) o MAT1630",
+        [
+            ["MAT1620", "MAT1203"],
+            ["MAT1620", "MAT1202"],
+            ["MAT1622", "MAT1203"],
+            ["MAT1622", "MAT1202"],
+            ["MAT1630"],
+        ],
+    ),
+    ("IIC1103 y MAT1107 o MAT1610", [["IIC1103"], ["MAT1107"], ["MAT1610"]]),
+    (
+        "(QIM100E o QIM100A) y (BIO141C o BIO110C) y (MAT1000 o MAT1100 o MAT1610)",
+        [
+            ["QIM100E", "BIO141C", "MAT1000"],
+            ["QIM100E", "BIO141C", "MAT1100"],
+            ["QIM100E", "BIO141C", "MAT1610"],
+            ["QIM100E", "BIO110C", "MAT1000"],
+            ["QIM100E", "BIO110C", "MAT1100"],
+            ["QIM100E", "BIO110C", "MAT1610"],
+            ["QIM100A", "BIO141C", "MAT1000"],
+            ["QIM100A", "BIO141C", "MAT1100"],
+            ["QIM100A", "BIO141C", "MAT1610"],
+            ["QIM100A", "BIO110C", "MAT1000"],
+            ["QIM100A", "BIO110C", "MAT1100"],
+            ["QIM100A", "BIO110C", "MAT1610"],
+        ],
+    ),
+    (
+        "(EYP1025 o EYP1113 o EYP2114 o EYP2405 o ICS2123 o IIC1253 o MAT1203) "
+        "y (MAT1610 o MAT1620)",
+        [
+            ["EYP1025", "MAT1610"],
+            ["EYP1025", "MAT1620"],
+            ["EYP1113", "MAT1610"],
+            ["EYP1113", "MAT1620"],
+            ["EYP2114", "MAT1610"],
+            ["EYP2114", "MAT1620"],
+            ["EYP2405", "MAT1610"],
+            ["EYP2405", "MAT1620"],
+            ["ICS2123", "MAT1610"],
+            ["ICS2123", "MAT1620"],
+            ["IIC1253", "MAT1610"],
+            ["IIC1253", "MAT1620"],
+            ["MAT1203", "MAT1610"],
+            ["MAT1203", "MAT1620"],
+        ],
+    ),
+    # Sub-fórmulas repetidas, que sympy elimina antes de expandir
+    ("(MAT1610 o MAT1620) y (MAT1610 o MAT1620)", [["MAT1620"], ["MAT1610"]]),
+    ("(MAT1610 o MAT1620) y (MAT1620 o MAT1610)", [["MAT1620"], ["MAT1610"]]),
+    (
+        "(IIC1103 y MAT1610) o (MAT1610 y IIC1103) o (IIC1103 y (MAT1610 o MAT1610))",
+        [["IIC1103", "MAT1610"]],
+    ),
+    (
+        "((MAT1610 o MAT1620) y FIS1513) y ((MAT1620 o MAT1610) y FIS1513)",
+        [["MAT1620", "FIS1513"], ["MAT1610", "FIS1513"]],
+    ),
+    ("(IIC1103 o (IIC1102 o IIC1103)) y (IIC1102 o IIC1103)", [["IIC1103"], ["IIC1102"]]),
+]
+
+
+def as_sets(groups: list[list[str]]) -> set[frozenset[str]]:
+    return {frozenset(group) for group in groups}
+
+
+@pytest.mark.parametrize("text, expected", CORPUS)
+def test_same_groups(text, expected):
+    groups = parse_requirements_groups(text)
+    assert len(groups) == len(expected)
+    assert as_sets(groups) == as_sets(expected)
+    assert all(len(set(group)) == len(group) for group in groups)
+
+
+def test_long_chains():
+    # Con sympy esta cadena tardaba segundos
+    text = " y ".join(f"(A{i} o B{i})" for i in range(12))
+    groups = parse_requirements_groups(text)
+    assert len(groups) == 2**12
+    assert groups[0] == [f"A{i}" for i in range(12)]
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+from sqlalchemy import text
+from sqlmodel import create_engine
+
+from src.scrapers.jobs.code_iterator import crawl_codes
+from src.scrapers.jobs.pipeline import StageStats
+from src.scrapers.jobs.report import JobReport, Progress, format_duration
+
+
+def test_progress_eta():
+    progress = Progress()
+    assert progress.eta(10) is None
+    progress.add("prefixes", 10)
+    progress.advance("prefixes", 2)
+    assert progress.eta(10) == 40
+    assert progress.describe() == "prefixes 2/10"
+    assert format_duration(40) == "0m40s"
+    assert format_duration(3 * 3600 + 60) == "3h01m"
+
+
+def test_crawl_counts_expanded_prefixes():
+    progress = Progress()
+
+    async def search(code: str) -> int:
+        return 10 if code == "A" else 0
+
+    asyncio.run(crawl_codes(search, 10, 2, ["A", "B"], progress))
+    assert progress.total["prefixes"] == progress.done["prefixes"] == 2 + 26
+
+
+def test_report_is_saved(tmp_path, caplog):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    report = JobReport()
+    fetch = StageStats("fetch")
+    fetch.add(3, 1.5)
+
+    async def job():
+        async with report.track(engine, "bc", tmp_path, progress_interval=0.01, args=["2022"]):
+            with report.phase("crawl"):
+                report.progress.add("prefixes", 2)
+                report.progress.advance("prefixes")
+                with engine.connect() as connection:
+                    connection.execute(text("SELECT 1"))
+                    connection.execute(text("SELECT 2"))
+                await asyncio.sleep(0.05)
+            report.add_stages([fetch])
+            report.count_rows("courses", inserted=2, unchanged=5)
+            report.count_rows("courses", updated=1)
+            report.add_failed("buscacursos", ["IIC", "MAT"])
+
+    with caplog.at_level("INFO", logger="script"):
+        asyncio.run(job())
+    assert "Progress: prefixes 1/2" in caplog.text
+
+    (path,) = tmp_path.glob("run_bc_*.json")
+    data = json.loads(path.read_text())
+    assert data["params"] == {"args": ["2022"]}
+    assert data["phases"]["crawl"] >= 0.05
+    assert data["time"]["db_statements"] == 2
+    assert data["time"]["fetch_seconds"] == 1.5
+    assert data["stages"]["fetch"]["items"] == 3
+    assert data["rows"] == {"courses": {"inserted": 2, "unchanged": 5, "updated": 1}}
+    assert data["failed"] == {"buscacursos": ["IIC", "MAT"]}
+    assert data["http"]["buscacursos"]["misses"] == 0
+    assert data["peak_memory_mb"]["self"] > 0
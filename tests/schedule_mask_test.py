@@ -0,0 +1,41 @@
+import pytest
+
+from src.db import DayEnum, module_bit, modules_mask, schedule_masks
+from src.scrapers.jobs.persistence import get_schedule_masks
+
+
+def test_module_bits_are_unique():
+    bits = {module_bit(day, module) for day in DayEnum for module in range(1, 9)}
+    assert len(bits) == 48
+    assert max(bits) < 1 << 48
+
+
+def test_modules_mask():
+    assert modules_mask(["L1", "L1", "W2"]) == module_bit("L", 1) | module_bit("W", 2)
+    with pytest.raises(ValueError):
+        modules_mask(["X1"])
+    with pytest.raises(ValueError):
+        modules_mask(["L9"])
+
+
+def test_schedule_masks():
+    occupied, ayu_lab = schedule_masks(
+        [("L", 1, "CLAS"), ("W", 1, "CLAS"), ("J", 4, "AYU"), ("V", 5, "LAB"), ("V", 5, "CLAS")]
+    )
+    assert occupied == modules_mask(["L1", "W1", "J4", "V5"])
+    # V5 también tiene cátedra, por lo que no es sólo de ayudantía o laboratorio
+    assert ayu_lab == modules_mask(["J4"])
+    assert occupied - ayu_lab & modules_mask(["J4"]) == 0
+    assert occupied - ayu_lab & modules_mask(["V5"]) != 0
+
+
+def test_scraped_modules_out_of_range_are_skipped():
+    schedule = [
+        {"module": module, "type": module_type, "classroom": None}
+        for module, module_type in [("L1", "CLAS"), ("L9", "CLAS"), ("M0", "AYU"), ("J4", "AYU")]
+    ]
+    masks = get_schedule_masks({"code": "IIC2233", "section": 1, "schedule": schedule})
+    assert masks == {
+        "schedule_mask": modules_mask(["L1", "J4"]),
+        "ayu_lab_mask": modules_mask(["J4"]),
+    }
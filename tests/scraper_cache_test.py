@@ -0,0 +1,125 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+from src.scrapers.cache import CachePolicy, ScraperCache, ScraperSession
+
+POLICIES = [
+    CachePolicy("short", 0, params={"view": "vacantes"}),
+    CachePolicy("long", -1, params={"view": "programa"}),
+]
+BODY = b"<html>" + b"contenido repetido " * 500 + b"</html>"
+
+
+@asynccontextmanager
+async def server(etag: bool = False):
+    "Servidor local que cuenta las peticiones y responde 304 si coincide el ETag"
+    calls: list[str] = []
+
+    async def handler(request: web.Request) -> web.Response:
+        calls.append(request.query.get("view", ""))
+        if etag and request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        headers = {"ETag": '"v1"'} if etag else {}
+        return web.Response(body=BODY, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore
+    try:
+        yield f"http://127.0.0.1:{port}", calls
+    finally:
+        await runner.cleanup()
+
+
+async def get(session: ScraperSession, **params) -> bytes:
+    response = await session.get("/", params=params)
+    return await response.read()
+
+
+def test_policies_and_stats(tmp_path):
+    cache = ScraperCache(str(tmp_path / "site.sql"), POLICIES, default_ttl=60)
+
+    async def run():
+        async with server() as (url, calls):
+            async with ScraperSession(base_url=url, cache=cache) as session:
+                for _ in range(3):
+                    assert await get(session, view="programa") == BODY
+                    assert await get(session, view="vacantes") == BODY
+            return calls
+
+    calls = asyncio.run(run())
+    assert calls.count("programa") == 1
+    assert calls.count("vacantes") == 3
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.stored) == (2, 4, 1)
+    assert cache.stats.bytes_served == 2 * len(BODY)
+    assert cache.stats.bytes_stored < cache.stats.bytes_raw / 10
+
+
+def test_ttl_overrides(tmp_path):
+    cache = ScraperCache(str(tmp_path / "site.sql"), POLICIES, ttl_overrides={"short": 30})
+    assert cache.ttl("GET", {"view": "vacantes"}) == 30
+    assert cache.ttl("GET", {"view": "programa"}) == -1
+    assert cache.ttl("POST") == cache.default_ttl
+
+
+def test_revalidation(tmp_path):
+    cache = ScraperCache(str(tmp_path / "site.sql"), [CachePolicy("forever", -1)])
+
+    async def run():
+        async with server(etag=True) as (url, calls):
+            async with ScraperSession(base_url=url, cache=cache) as session:
+                await get(session, view="programa")
+                response = await cache.responses.read(
+                    cache.create_key("GET", "/", params={"view": "programa"})
+                )
+                response.expires = response.created_at  # Ya expiró
+                await cache.responses.write(
+                    cache.create_key("GET", "/", params={"view": "programa"}), response
+                )
+                assert await get(session, view="programa") == BODY
+                assert await get(session, view="programa") == BODY
+            return calls
+
+    calls = asyncio.run(run())
+    assert len(calls) == 2
+    assert (cache.stats.misses, cache.stats.revalidated, cache.stats.hits) == (1, 1, 1)
+
+
+def test_lru_eviction(tmp_path):
+    cache = ScraperCache(str(tmp_path / "site.sql"), [], max_bytes=1)
+
+    async def run():
+        key = cache.create_key("GET", "/", params={"view": "programa"})
+        responses = cache.responses
+        responses.max_bytes = 3 * len(responses.serialize(BODY))
+        for i in range(10):
+            await responses.write(f"{key}{i}", BODY)
+            await responses.read(f"{key}0")  # Usada recién, no se descarta
+        return [key async for key in responses.keys()], key
+
+    keys, key = asyncio.run(run())
+    assert len(keys) == 2
+    assert f"{key}0" in keys and f"{key}9" in keys
+    assert cache.stats.evicted == 8
+
+
+def test_refresh_skips_cached_responses(tmp_path):
+    cache = ScraperCache(str(tmp_path / "site.sql"), [CachePolicy("forever", -1)])
+
+    async def run():
+        async with server() as (url, calls):
+            async with ScraperSession(base_url=url, cache=cache, refresh=True) as session:
+                for _ in range(2):
+                    assert await get(session, view="vacantes") == BODY
+            async with ScraperSession(base_url=url, cache=cache) as session:
+                assert await get(session, view="vacantes") == BODY
+            return calls
+
+    assert len(asyncio.run(run())) == 2
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
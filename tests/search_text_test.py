@@ -0,0 +1,27 @@
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from src.db import Course, backfill_search_text, normalize_search_text
+
+from .api_query_count_test import add_data
+
+
+def test_normalize_search_text():
+    assert normalize_search_text("  Programación   Avanzada ") == "programacion avanzada"
+    assert normalize_search_text("MUÑOZ Pérez") == normalize_search_text("munoz perez")
+
+
+def test_backfill_search_text(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    SQLModel.metadata.create_all(engine)
+    add_data(engine, 2)
+    with Session(engine) as db:
+        course = db.exec(select(Course).where(Course.nrc == "1")).one()
+        course.search_text = "texto existente"
+        db.add(course)
+        db.commit()
+
+    assert backfill_search_text(engine) == 1
+    assert backfill_search_text(engine) == 0
+    with Session(engine) as db:
+        texts = db.exec(select(Course.search_text).order_by(Course.nrc)).all()
+    assert texts == ["s0 ramo 0 profesor 0-0 profesor 0-1", "texto existente"]
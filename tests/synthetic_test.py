@@ -0,0 +1,45 @@
+from sqlmodel import Session, create_engine, func, select
+
+from src.api.prerequisites import PrerequisiteGraph
+from src.db import Course, Subject, SubjectPrerequisites, get_data_version
+from src.db.synthetic import DatasetShape, generate, load, requirements_text
+
+SHAPE = DatasetShape(terms=2, schools=5, subjects=200, teachers=50)
+
+
+def test_generate_is_deterministic():
+    first, second = generate(SHAPE), generate(SHAPE)
+    assert first.tables == second.tables
+    assert first.count(Subject) == 200
+    assert first.count(Course) > 2 * 200 * SHAPE.offered
+
+
+def test_prerequisites_come_from_lower_levels():
+    dataset = generate(SHAPE)
+    codes = {s["id"]: s["code"] for s in dataset.tables[Subject]}
+    assert dataset.count(SubjectPrerequisites) > 0
+    for row in dataset.tables[SubjectPrerequisites]:
+        assert codes[row["prerequisite_id"]][3] < codes[row["subject_id"]][3]
+
+
+def test_requirements_text():
+    groups = [[("IIC1103", False), ("MAT1610", True)], [("IIC1102", False)]]
+    assert requirements_text(groups) == "(IIC1103 y MAT1610(c)) o IIC1102"
+    assert requirements_text([[("IIC1103", False)]]) == "IIC1103"
+
+
+def test_load(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.sqlite'}")
+    dataset = generate(SHAPE)
+    load(engine, dataset)
+    load(engine, dataset, clean=True)
+
+    with Session(engine) as session:
+        assert session.exec(select(func.count(Course.id))).one() == dataset.count(Course)
+        assert get_data_version(session) == 1
+        graph = PrerequisiteGraph.load(session)
+        with_groups = sum(1 for groups in graph.groups if groups)
+        subjects_with_prerequisites = {
+            row["subject_id"] for row in dataset.tables[SubjectPrerequisites]
+        }
+        assert with_groups == len(subjects_with_prerequisites)